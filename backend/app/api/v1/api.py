@@ -4,7 +4,10 @@ Main API router for v1 endpoints.
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import games, chat, planning, health, config
+from app.api.v1.endpoints import (
+    games, chat, planning, health, config, ingestion, assets,
+    knowledge, admin
+)
 
 api_router = APIRouter()
 
@@ -13,4 +16,8 @@ api_router.include_router(health.router, prefix="/health", tags=["health"])
 api_router.include_router(config.router, prefix="/config", tags=["configuration"])
 api_router.include_router(games.router, prefix="/games", tags=["games"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
-api_router.include_router(planning.router, prefix="/planning", tags=["planning"])
\ No newline at end of file
+api_router.include_router(planning.router, prefix="/planning", tags=["planning"])
+api_router.include_router(ingestion.router, prefix="/ingestion", tags=["ingestion"])
+api_router.include_router(assets.router, prefix="/assets", tags=["assets"])
+api_router.include_router(knowledge.router, prefix="/knowledge", tags=["knowledge"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
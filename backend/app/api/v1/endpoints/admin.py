@@ -0,0 +1,68 @@
+"""
+Administrative endpoints (usage accounting, corpus maintenance).
+"""
+
+import asyncio
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+import structlog
+
+from app.core.config import settings
+from app.services.corpus_store import CorpusStoreBusyError, corpus_store
+from app.services.usage_accounting import DIMENSIONS, usage_accounting
+
+logger = structlog.get_logger()
+
+
+def require_admin(x_admin_key: Optional[str] = Header(None)) -> None:
+    """
+    Require the X-Admin-Key header once ADMIN_API_KEY is set.
+
+    Without the setting only DEBUG allows access; an empty value (as in
+    .env.example) keeps the endpoints closed even in DEBUG.
+    """
+    if not settings.ADMIN_API_KEY:
+        if settings.ADMIN_API_KEY is not None or not settings.DEBUG:
+            raise HTTPException(status_code=403, detail="Admin-Zugang ist nicht konfiguriert")
+        return
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Ungültiger Admin-Schlüssel")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/usage")
+async def get_usage(
+    dimension: Optional[str] = Query(None, description="conversation, user, feature or deployment"),
+    limit: int = Query(20, ge=1, le=500, description="Entries per dimension, biggest consumers first")
+):
+    """Today's token, cost and latency aggregates per conversation, user, feature and deployment."""
+    
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Dimension: {dimension}")
+    
+    return {
+        **usage_accounting.get_report(dimension=dimension, limit=limit),
+        "accounting": usage_accounting.get_stats()
+    }
+
+
+@router.post("/usage/flush")
+async def flush_usage():
+    """Write pending usage counters to the database now."""
+    
+    await usage_accounting.flush()
+    return {"flushed": True, "accounting": usage_accounting.get_stats()}
+
+
+@router.post("/corpus/compact")
+async def compact_corpus():
+    """Compact the packed corpus store inside the server process, so no open file goes stale."""
+    
+    try:
+        result = await asyncio.to_thread(corpus_store.compact, False)
+    except CorpusStoreBusyError:
+        raise HTTPException(status_code=409, detail="Der Korpus wird gerade von einem anderen Prozess geschrieben")
+    return {**result, "corpus": corpus_store.get_stats()}
@@ -0,0 +1,72 @@
+"""
+Static asset endpoints for precomputed image thumbnails.
+"""
+
+import re
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from app.services.image_assets import THUMBNAIL_FORMAT, image_asset_service
+
+router = APIRouter()
+
+# Thumbnails are content-addressed (named by perceptual hash) and never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+THUMBNAIL_NAME = re.compile(r"^[0-9a-f]{16}\.[a-z]+$")
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range 'bytes=start-end' header into inclusive offsets."""
+    match = RANGE_HEADER.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start_str, end_str = match.groups()
+    if start_str == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(end_str)), size - 1
+    else:
+        start = int(start_str)
+        end = min(int(end_str), size - 1) if end_str else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+@router.get("/thumbnails/{name}")
+async def get_thumbnail(name: str, request: Request):
+    """Serve a thumbnail with long-lived cache headers and byte-range support."""
+
+    path = image_asset_service.get_thumbnail_path(name) if THUMBNAIL_NAME.match(name) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    etag = f'"{name}"'
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    content = path.read_bytes()
+    media_type = f"image/{THUMBNAIL_FORMAT}"
+    range_header = request.headers.get("range")
+    if not range_header:
+        return Response(content=content, media_type=media_type, headers=headers)
+
+    byte_range = _parse_range(range_header, len(content))
+    if byte_range is None:
+        return Response(
+            status_code=416,
+            headers={**headers, "Content-Range": f"bytes */{len(content)}"},
+        )
+    start, end = byte_range
+    return Response(
+        content=content[start:end + 1],
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(content)}"},
+    )
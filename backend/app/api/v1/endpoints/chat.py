@@ -2,14 +2,17 @@
 Chatbot endpoints for conversational AI interactions.
 """
 
+import json
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
 import structlog
 
 from app.core.config import settings
 from app.services.chat_service import pfadi_chat_service
+from app.services.usage_accounting import BUDGET_EXCEEDED_MESSAGE, BudgetExceededError, usage_accounting
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -38,6 +41,7 @@ class ChatResponse(BaseModel):
     message: str
     conversation_id: str
     data: Optional[dict] = None
+    references: dict = {}  # Full objects referenced by ID in data and suggested actions
     suggested_actions: List[SuggestedAction] = []
     timestamp: datetime
     usage: Optional[dict] = None
@@ -48,15 +52,46 @@ class ChatStatus(BaseModel):
     azure_openai_available: bool
     features_enabled: dict
     deployment_info: dict
+    answer_cache: dict = {}
+    embedding_batching: dict = {}
+    rate_limits: dict = {}
+    circuit_breakers: dict = {}
+    streaming: dict = {}
+    conversations: dict = {}
+    summaries: dict = {}
+    search_prefetch: dict = {}
+    conversation_locks: dict = {}
+
+
+def _usage_user(http_request: Request) -> str:
+    """
+    Key for usage accounting and budgets: the client address.
+
+    There is no authentication yet, and a user ID from the request body
+    would let clients reset their budget by sending a new one.
+    """
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+
+async def _check_budget(user: str) -> None:
+    """Refuse the request up front if the user's daily hard budget is used up."""
+    with usage_accounting.attribute(user=user):
+        try:
+            await usage_accounting.check_budget()
+        except BudgetExceededError:
+            raise HTTPException(status_code=429, detail=BUDGET_EXCEEDED_MESSAGE)
 
 
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """Main chat endpoint for conversational AI powered by Azure OpenAI."""
     
     if not settings.ENABLE_CHATBOT:
         raise HTTPException(status_code=501, detail="Chatbot feature is disabled")
     
+    user = _usage_user(http_request)
+    await _check_budget(user)
+    
     logger.info(
         "Processing chat request",
         message_length=len(request.message),
@@ -66,11 +101,12 @@ async def chat(request: ChatRequest):
     
     try:
         # Process the message using our chat service
-        response = await pfadi_chat_service.process_message(
-            user_message=request.message,
-            conversation_id=request.conversation_id,
-            user_context=request.user_context
-        )
+        with usage_accounting.attribute(user=user, feature="chat"):
+            response = await pfadi_chat_service.process_message(
+                user_message=request.message,
+                conversation_id=request.conversation_id,
+                user_context=request.user_context
+            )
         
         # Convert suggested actions to the correct format
         suggested_actions = [
@@ -89,6 +125,7 @@ async def chat(request: ChatRequest):
             message=response["message"],
             conversation_id=response["conversation_id"],
             data=response.get("data"),
+            references=response.get("references", {}),
             suggested_actions=suggested_actions,
             timestamp=response["timestamp"],
             usage=response.get("usage"),
@@ -103,11 +140,57 @@ async def chat(request: ChatRequest):
         )
 
 
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+    
+    Emits start, token, function_call, function_result and error events while
+    the answer is generated and a final done event with the complete message,
+    referenced objects, suggested actions, usage and timings (ttft_ms, total_ms).
+    """
+    
+    if not settings.ENABLE_CHATBOT:
+        raise HTTPException(status_code=501, detail="Chatbot feature is disabled")
+    
+    user = _usage_user(http_request)
+    await _check_budget(user)
+    
+    logger.info(
+        "Processing streaming chat request",
+        message_length=len(request.message),
+        has_conversation_id=bool(request.conversation_id)
+    )
+    
+    async def event_stream():
+        with usage_accounting.attribute(user=user, feature="chat"):
+            async for event in pfadi_chat_service.process_message_stream(
+                user_message=request.message,
+                conversation_id=request.conversation_id,
+                user_context=request.user_context
+            ):
+                event_type = event.pop("type")
+                yield f"event: {event_type}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/status", response_model=ChatStatus)
 async def get_chat_status():
     """Get the current status of the chat service and Azure integrations."""
     
+    from app.services.answer_cache import answer_cache
     from app.services.azure_openai import azure_openai_service
+    from app.services.circuit_breaker import circuit_breakers
+    from app.services.conversation_locks import conversation_locks
+    from app.services.conversation_summary import conversation_summarizer
+    from app.services.embedding_dispatcher import embedding_dispatcher
+    from app.services.rate_limiter import rate_limit_scheduler
+    from app.services.search_prefetch import game_search_prefetcher
     
     return ChatStatus(
         azure_openai_available=azure_openai_service.is_available(),
@@ -123,7 +206,16 @@ async def get_chat_status():
             "embedding_model": settings.AZURE_EMBEDDING_DEPLOYMENT_NAME,
             "endpoint_configured": bool(settings.AZURE_OPENAI_ENDPOINT),
             "api_key_configured": bool(settings.AZURE_OPENAI_API_KEY)
-        }
+        },
+        answer_cache=answer_cache.get_stats(),
+        embedding_batching=embedding_dispatcher.get_stats(),
+        rate_limits=rate_limit_scheduler.get_stats(),
+        circuit_breakers=circuit_breakers.get_status(),
+        streaming=pfadi_chat_service.get_stream_stats(),
+        conversations=pfadi_chat_service.store.get_stats(),
+        summaries=conversation_summarizer.get_stats(),
+        search_prefetch=game_search_prefetcher.get_stats(),
+        conversation_locks=conversation_locks.get_stats()
     )
 
 
@@ -132,7 +224,7 @@ async def get_conversation_history(conversation_id: str):
     """Get conversation history for a specific conversation."""
     
     try:
-        history = pfadi_chat_service.get_conversation_history(conversation_id)
+        history = await pfadi_chat_service.get_conversation_history(conversation_id)
         
         # Convert to response format
         chat_messages = []
@@ -140,7 +232,7 @@ async def get_conversation_history(conversation_id: str):
             chat_messages.append(ChatMessage(
                 role=message["role"],
                 content=message["content"],
-                timestamp=datetime.utcnow()  # TODO: Store actual timestamps
+                timestamp=message.get("timestamp")
             ))
         
         logger.info(
@@ -164,7 +256,7 @@ async def delete_conversation(conversation_id: str):
     """Delete a conversation and its history."""
     
     try:
-        success = pfadi_chat_service.clear_conversation(conversation_id)
+        success = await pfadi_chat_service.clear_conversation(conversation_id)
         
         if success:
             logger.info("Conversation deleted", conversation_id=conversation_id)
@@ -194,7 +286,7 @@ async def export_conversation(conversation_id: str):
     """Export conversation history for download."""
     
     try:
-        history = pfadi_chat_service.get_conversation_history(conversation_id)
+        history = await pfadi_chat_service.get_conversation_history(conversation_id)
         
         if not history:
             raise HTTPException(
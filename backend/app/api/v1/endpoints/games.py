@@ -41,6 +41,7 @@ class Game(BaseModel):
     rating: Optional[float] = None
     semantic_score: Optional[float] = None
     search_score: Optional[float] = None
+    thumbnails: List[str] = []
 
 
 class GameSearchResponse(BaseModel):
@@ -51,6 +52,16 @@ class GameSearchResponse(BaseModel):
     azure_openai_used: bool
 
 
+class GameBatchResponse(BaseModel):
+    games: List[Game]
+    missing: List[str] = []
+
+
+def _to_game(game_data: dict) -> Game:
+    """Game model without the embedding."""
+    return Game(**{k: v for k, v in game_data.items() if k != "embedding"})
+
+
 @router.get("/search", response_model=GameSearchResponse)
 async def search_games(
     q: Optional[str] = Query(None, description="Search query for semantic search"),
@@ -100,11 +111,7 @@ async def search_games(
         )
         
         # Convert to Game objects
-        games = []
-        for game_data in search_result["games"]:
-            # Remove embedding from response
-            game_dict = {k: v for k, v in game_data.items() if k != "embedding"}
-            games.append(Game(**game_dict))
+        games = [_to_game(game_data) for game_data in search_result["games"]]
         
         query_time_ms = int((time.time() - start_time) * 1000)
         
@@ -139,30 +146,40 @@ async def search_games(
     )
 
 
+@router.get("/batch", response_model=GameBatchResponse)
+async def get_games_batch(
+    ids: str = Query(..., description="Comma-separated game IDs")
+):
+    """
+    Get several games by ID in one request.
+    
+    Chat responses reference games by ID; clients resolve the IDs they do not
+    have yet with this endpoint.
+    """
+    
+    game_ids = [game_id.strip() for game_id in ids.split(",") if game_id.strip()]
+    if len(game_ids) > settings.GAME_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximal {settings.GAME_BATCH_MAX_IDS} Spiele pro Anfrage"
+        )
+    
+    games = game_search_service.get_games(game_ids)
+    found = {game["gameId"] for game in games}
+    return GameBatchResponse(
+        games=[_to_game(game) for game in games],
+        missing=[game_id for game_id in dict.fromkeys(game_ids) if game_id not in found]
+    )
+
+
 @router.get("/{game_id}", response_model=Game)
 async def get_game(game_id: str):
     """Get a specific game by ID."""
     
-    # TODO: Implement actual game retrieval
-    # For now, return a mock game or 404
-    if game_id == "game_001":
-        return Game(
-            gameId="game_001",
-            name="Vertrauenskreis",
-            description="Die Teilnehmer stehen im Kreis und lassen sich rückwärts fallen, vertrauen darauf, dass sie aufgefangen werden.",
-            materials=["Keine besonderen Materialien"],
-            durationMinutes=15,
-            minParticipants=8,
-            maxParticipants=15,
-            ageGroup="10-13",
-            location="both",
-            weatherDependency="low",
-            tags=["vertrauen", "teambuilding", "kreis"],
-            pedagogicalValue="Fördert Vertrauen und Gruppenzusammenhalt",
-            rating=4.2
-        )
-    
-    raise HTTPException(status_code=404, detail="Game not found")
+    game = game_search_service.get_game(game_id)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return _to_game(game)
 
 
 @router.get("/", response_model=GameSearchResponse)
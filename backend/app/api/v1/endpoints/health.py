@@ -8,6 +8,7 @@ from datetime import datetime
 import structlog
 
 from app.core.config import settings
+from app.services.circuit_breaker import circuit_breakers
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -19,6 +20,7 @@ class HealthResponse(BaseModel):
     version: str
     services: dict
     environment: str
+    circuit_breakers: dict = {}
 
 
 @router.get("/", response_model=HealthResponse)
@@ -29,7 +31,9 @@ async def health_check():
     azure_openai_status = "not_configured"
     try:
         from app.services.azure_openai import azure_openai_service
-        if azure_openai_service.is_available():
+        if azure_openai_service.is_available() and circuit_breakers.any_open():
+            azure_openai_status = "circuit_open"
+        elif azure_openai_service.is_available():
             azure_openai_status = "healthy"
         elif settings.AZURE_OPENAI_ENDPOINT and settings.AZURE_OPENAI_API_KEY:
             azure_openai_status = "configured_but_unavailable"
@@ -57,7 +61,7 @@ async def health_check():
     
     # Overall status
     overall_status = "healthy"
-    if azure_openai_status == "error":
+    if azure_openai_status in ("error", "circuit_open"):
         overall_status = "degraded"
     
     return HealthResponse(
@@ -65,7 +69,8 @@ async def health_check():
         timestamp=datetime.utcnow(),
         version=settings.VERSION,
         services=services,
-        environment=settings.ENVIRONMENT
+        environment=settings.ENVIRONMENT,
+        circuit_breakers=circuit_breakers.get_status()
     )
 
 
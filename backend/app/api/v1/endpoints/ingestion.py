@@ -0,0 +1,76 @@
+"""
+Document ingestion endpoints for web data and local document folders.
+"""
+
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+import structlog
+
+from app.services.file_watcher import file_watcher_service
+from app.services.image_assets import image_asset_service
+from app.services.ingestion import ingestion_service
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+class IngestionRunResponse(BaseModel):
+    source: str
+    documents: int
+    removed: int
+    pages: int
+    duration_seconds: float
+    catalog_version: int
+    formats: Optional[Dict[str, dict]] = None
+
+
+class IngestionStatus(BaseModel):
+    catalog_version: int
+    documents: int
+    documents_by_source: Dict[str, int]
+    last_run: dict
+    extraction: Dict[str, dict]
+    corpus: dict
+    images: dict
+    watcher: dict
+
+
+@router.get("/status", response_model=IngestionStatus)
+async def get_ingestion_status():
+    """Catalog version, document counts and per-format extraction throughput."""
+    return IngestionStatus(
+        **ingestion_service.get_status(),
+        images=image_asset_service.get_status(),
+        watcher=file_watcher_service.get_status()
+    )
+
+
+@router.post("/web", response_model=IngestionRunResponse)
+async def ingest_web_data():
+    """Ingest the crawled pages in data/web_data."""
+    try:
+        return IngestionRunResponse(**await ingestion_service.ingest_web_data())
+    except Exception as e:
+        logger.error("Web data ingestion failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Fehler beim Einlesen der Webdaten")
+
+
+@router.post("/local", response_model=IngestionRunResponse)
+async def ingest_local_documents():
+    """Extract and ingest PDF, DOCX and XLSX files from data/local and data/google_drive."""
+    try:
+        return IngestionRunResponse(**await ingestion_service.ingest_local_documents())
+    except Exception as e:
+        logger.error("Local document ingestion failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Fehler beim Einlesen der lokalen Dokumente")
+
+
+@router.post("/images")
+async def process_images():
+    """Deduplicate crawled images and precompute thumbnails for all catalog pages."""
+    try:
+        return await image_asset_service.process_catalog_images()
+    except Exception as e:
+        logger.error("Image pipeline failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Fehler bei der Bildverarbeitung")
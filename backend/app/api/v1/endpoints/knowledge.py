@@ -0,0 +1,63 @@
+"""
+Knowledge base endpoints: build status, rebuild and retrieval.
+"""
+
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+import structlog
+
+from app.services.knowledge_base import knowledge_base_service
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+class KnowledgeBaseStatus(BaseModel):
+    version: int
+    embedder: Optional[str] = None
+    dimensions: int
+    documents: int
+    chunks: int
+    store_bytes: int
+    build: dict
+    queries: int
+    avg_query_ms: float
+    last_query_ms: float
+
+
+class KnowledgePassage(BaseModel):
+    chunk_id: str
+    document_id: str
+    title: Optional[str] = None
+    heading: str
+    text: str
+    source_url: Optional[str] = None
+    source_path: Optional[str] = None
+    collection: Optional[str] = None
+    score: float
+
+
+@router.get("/status", response_model=KnowledgeBaseStatus)
+async def get_knowledge_base_status():
+    """Size, embedder, build time and query latency of the knowledge base."""
+    return KnowledgeBaseStatus(**knowledge_base_service.get_status())
+
+
+@router.post("/rebuild", response_model=KnowledgeBaseStatus)
+async def rebuild_knowledge_base():
+    """Re-chunk and re-embed all documents of the configured collections."""
+    try:
+        return KnowledgeBaseStatus(**await knowledge_base_service.rebuild())
+    except Exception as e:
+        logger.error("Knowledge base rebuild failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Fehler beim Aufbau der Wissensdatenbank")
+
+
+@router.get("/search", response_model=List[KnowledgePassage])
+async def search_knowledge_base(
+    q: str = Query(..., min_length=2, description="Frage oder Suchbegriff"),
+    top_k: int = Query(4, ge=1, le=20)
+):
+    """Retrieve the passages most relevant to a question."""
+    return await knowledge_base_service.search(q, top_k=top_k)
@@ -2,13 +2,18 @@
 Planning endpoints for creating and managing activity plans.
 """
 
+import json
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime, date
-import uuid
 
 from app.core.config import settings
+from app.services.plan_repository import plan_repository
+from app.services.planning_service import planning_service
+from app.services.semester_planning import semester_planner
+from app.services.suggestion_cache import suggestion_cache, suggestion_features
 
 router = APIRouter()
 
@@ -26,6 +31,7 @@ class ScheduleItem(BaseModel):
     description: str
     materials: List[str] = []
     notes: Optional[str] = None
+    game_id: Optional[str] = None
 
 
 class PlanningRequest(BaseModel):
@@ -38,6 +44,22 @@ class PlanningRequest(BaseModel):
     location: str = "indoor"  # "indoor", "outdoor", "flexible"
     pedagogical_goals: List[PedagogicalGoal] = []
     special_requirements: Optional[str] = None
+    polish: bool = False  # Let the model write an introduction
+
+
+class SemesterPlanningRequest(BaseModel):
+    start_date: date
+    end_date: date
+    participant_count: int
+    age_group: str = "10-13"
+    location: str = "indoor"
+    themes: List[str] = []  # Worked through in order, each for a block of weeks
+    pedagogical_goals: List[PedagogicalGoal] = []
+    weekday: Optional[int] = None  # 0 = Monday; defaults to the configured meeting day
+    start_time: Optional[str] = None  # "HH:MM"
+    duration: Optional[int] = None  # Minutes
+    no_repeat_weeks: Optional[int] = None
+    polish: bool = False
 
 
 class ActivityPlan(BaseModel):
@@ -55,6 +77,13 @@ class ActivityPlan(BaseModel):
     preparation_notes: List[str]
     created_at: datetime
     updated_at: datetime
+    introduction: Optional[str] = None
+    optimization: Optional[dict] = None  # Game selection summary (score, goals, search time)
+
+
+class PlanListResponse(BaseModel):
+    plans: List[ActivityPlan]
+    next_cursor: Optional[str] = None  # Pass as cursor for the next page; None on the last page
 
 
 class PlanSuggestion(BaseModel):
@@ -71,178 +100,144 @@ async def create_heimstunde_plan(request: PlanningRequest):
     if not settings.ENABLE_PLANNING:
         raise HTTPException(status_code=501, detail="Planning feature is disabled")
     
-    plan_id = str(uuid.uuid4())
-    
-    # TODO: Implement actual AI-powered planning logic
-    # For now, create a mock plan
-    
-    # Generate a simple schedule based on duration
-    schedule = []
-    current_time = "19:00"  # Default start time
-    remaining_duration = request.duration
-    
-    # Opening (10 minutes)
-    if remaining_duration >= 10:
-        schedule.append(ScheduleItem(
-            start_time=current_time,
-            duration=10,
-            activity_name="Begrüßung und Eröffnung",
-            activity_type="opening",
-            description="Gemeinsame Begrüßung, kurze Runde zum Befinden",
-            materials=["Kluft", "eventuell Fahne"]
-        ))
-        remaining_duration -= 10
-        current_time = _add_minutes_to_time(current_time, 10)
-    
-    # Main activities (60-70% of remaining time)
-    main_activity_time = int(remaining_duration * 0.7)
-    if main_activity_time >= 15:
-        activity_name = "Teambuilding-Spiel"
-        activity_description = "Spiel zur Stärkung des Gruppengefühls"
-        
-        if request.theme:
-            activity_name = f"Aktivität zum Thema '{request.theme}'"
-            activity_description = f"Kreative Aktivität passend zum Thema {request.theme}"
-        
-        schedule.append(ScheduleItem(
-            start_time=current_time,
-            duration=main_activity_time,
-            activity_name=activity_name,
-            activity_type="main_activity",
-            description=activity_description,
-            materials=["Je nach gewähltem Spiel"],
-            notes="Spiel an Gruppengröße anpassen"
-        ))
-        remaining_duration -= main_activity_time
-        current_time = _add_minutes_to_time(current_time, main_activity_time)
-    
-    # Reflection/discussion (15-20% of remaining time)
-    if remaining_duration >= 10:
-        reflection_time = min(remaining_duration - 5, int(remaining_duration * 0.7))
-        schedule.append(ScheduleItem(
-            start_time=current_time,
-            duration=reflection_time,
-            activity_name="Reflexion und Gespräch",
-            activity_type="reflection",
-            description="Gemeinsame Reflexion über die Aktivitäten und Erfahrungen",
-            materials=["Sitzkreis"]
-        ))
-        remaining_duration -= reflection_time
-        current_time = _add_minutes_to_time(current_time, reflection_time)
-    
-    # Closing
-    if remaining_duration >= 5:
-        schedule.append(ScheduleItem(
-            start_time=current_time,
-            duration=remaining_duration,
-            activity_name="Abschluss",
-            activity_type="closing",
-            description="Gemeinsamer Abschluss, Termine und Verabschiedung",
-            materials=[]
-        ))
-    
-    # Aggregate materials
-    all_materials = []
-    for item in schedule:
-        all_materials.extend(item.materials)
-    unique_materials = list(set(all_materials))
-    
-    # Generate preparation notes
-    preparation_notes = [
-        "Raum/Platz entsprechend der geplanten Aktivitäten vorbereiten",
-        "Alle Materialien im Voraus bereitlegen",
-        f"Aktivitäten für {request.participant_count} Teilnehmer anpassen"
-    ]
-    
-    if request.location == "outdoor":
-        preparation_notes.append("Wetterbericht prüfen und Backup-Plan für schlechtes Wetter")
-    
-    plan = ActivityPlan(
-        plan_id=plan_id,
-        title=request.title or f"Heimstunde {request.date.strftime('%d.%m.%Y')}",
-        date=request.date,
+    plan = await planning_service.create_heimstunde_plan(
         duration=request.duration,
         participant_count=request.participant_count,
-        age_group=request.age_group,
         theme=request.theme,
         location=request.location,
-        pedagogical_goals=request.pedagogical_goals,
-        schedule=schedule,
-        material_list=unique_materials,
-        preparation_notes=preparation_notes,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        pedagogical_goals=[goal.model_dump() for goal in request.pedagogical_goals],
+        age_group=request.age_group,
+        plan_date=request.date,
+        title=request.title or f"Heimstunde {request.date.strftime('%d.%m.%Y')}",
+        polish=request.polish
     )
     
-    return plan
+    return ActivityPlan(**plan)
 
 
-@router.post("/heimstunde/suggestions", response_model=PlanSuggestion)
-async def get_plan_suggestions(request: PlanningRequest):
-    """Get AI-powered suggestions for a Heimstunde plan."""
+@router.post("/semester")
+async def plan_semester(request: SemesterPlanningRequest):
+    """
+    Plan all Heimstunden in a date range (Server-Sent Events).
     
-    # TODO: Implement actual AI suggestion logic
-    # For now, return mock suggestions
+    Skips school holidays, does not repeat games within no_repeat_weeks and
+    works through the themes in order. Emits a start event with the meeting
+    and skipped dates (and a warning if no holiday calendar was found), a plan event per finished plan (with done/total), error
+    events for failed plans and a final done event with the games per week.
+    """
     
-    suggested_schedule = [
-        ScheduleItem(
-            start_time="19:00",
-            duration=10,
-            activity_name="Energizer: Namen-Ball",
-            activity_type="game",
-            description="Schnelles Kennenlernspiel mit Ball",
-            materials=["Softball"]
-        ),
-        ScheduleItem(
-            start_time="19:10",
-            duration=25,
-            activity_name="Hauptaktivität: Vertrauensparcours",
-            activity_type="team_activity", 
-            description="Parcours mit verbundenen Augen zur Stärkung des Vertrauens",
-            materials=["Augenbinden", "Hindernisse", "Seile"]
-        ),
-        ScheduleItem(
-            start_time="19:35",
-            duration=15,
-            activity_name="Reflexionsrunde",
-            activity_type="discussion",
-            description="Gespräch über Vertrauen und Zusammenhalt",
-            materials=["Sitzkreis"]
+    if not settings.ENABLE_PLANNING:
+        raise HTTPException(status_code=501, detail="Planning feature is disabled")
+    if request.end_date < request.start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (request.end_date - request.start_date).days >= 7 * settings.SEMESTER_MAX_WEEKS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SEMESTER_MAX_WEEKS} weeks can be planned at once"
         )
-    ]
     
-    return PlanSuggestion(
-        suggested_schedule=suggested_schedule,
-        alternative_activities=[
-            {"name": "Kooperationsspiele", "type": "alternative_main"},
-            {"name": "Kreative Gestaltung", "type": "alternative_main"},
-            {"name": "Outdoor-Aktivität", "type": "weather_alternative"}
-        ],
-        estimated_preparation_time=20,
-        difficulty_level="medium"
+    async def event_stream():
+        async for event in semester_planner.plan_semester(
+            start=request.start_date,
+            end=request.end_date,
+            participant_count=request.participant_count,
+            themes=request.themes,
+            location=request.location,
+            pedagogical_goals=[goal.model_dump() for goal in request.pedagogical_goals],
+            age_group=request.age_group,
+            weekday=request.weekday,
+            start_time=request.start_time,
+            duration=request.duration,
+            no_repeat_weeks=request.no_repeat_weeks,
+            polish=request.polish
+        ):
+            event_type = event.pop("type")
+            yield f"event: {event_type}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
-@router.get("/{plan_id}", response_model=ActivityPlan)
-async def get_plan(plan_id: str):
-    """Get a specific activity plan by ID."""
+@router.post("/heimstunde/suggestions", response_model=PlanSuggestion)
+async def get_plan_suggestions(request: PlanningRequest, response: Response):
+    """
+    Get suggestions for a Heimstunde plan.
     
-    # TODO: Implement actual plan retrieval from database
-    raise HTTPException(status_code=404, detail="Plan not found")
-
-
-@router.get("/", response_model=List[ActivityPlan])
-async def list_plans(limit: int = 20, offset: int = 0):
-    """List all activity plans with pagination."""
+    Similar requests share their game selection (see suggestion_cache); the
+    schedule is timed for this request. The X-Suggestion-Cache header tells
+    whether the selection was a hit, a stale hit being refreshed in the
+    background, or a miss.
+    """
     
-    # TODO: Implement actual plan listing from database
-    return []
+    if not settings.ENABLE_PLANNING:
+        raise HTTPException(status_code=501, detail="Planning feature is disabled")
+    
+    features = suggestion_features(
+        duration=request.duration,
+        participant_count=request.participant_count,
+        location=request.location,
+        age_group=request.age_group,
+        goal_types=[goal.type for goal in request.pedagogical_goals],
+        theme=request.theme
+    )
+    games, cache_status = await suggestion_cache.get(
+        features["key"],
+        lambda: planning_service.suggestion_games(
+            duration=features["duration"],
+            participant_range=features["participants"],
+            location=features["location"],
+            goal_types=features["goal_types"],
+            age_group=features["age_group"],
+            theme=features["theme"]
+        )
+    )
+    suggestion = await planning_service.suggest_plan(
+        games,
+        duration=request.duration,
+        participant_count=request.participant_count,
+        location=request.location,
+        pedagogical_goals=[goal.model_dump() for goal in request.pedagogical_goals],
+        age_group=request.age_group,
+        theme=request.theme
+    )
+    response.headers["X-Suggestion-Cache"] = cache_status
+    return PlanSuggestion(**suggestion)
 
 
-def _add_minutes_to_time(time_str: str, minutes: int) -> str:
-    """Helper function to add minutes to a time string."""
-    from datetime import datetime, timedelta
+@router.get("/{plan_id}", response_model=ActivityPlan)
+async def get_plan(plan_id: str):
+    """Get a specific activity plan by ID."""
     
-    time_obj = datetime.strptime(time_str, "%H:%M")
-    new_time = time_obj + timedelta(minutes=minutes)
-    return new_time.strftime("%H:%M")
\ No newline at end of file
+    plan = await plan_repository.get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return ActivityPlan(**plan)
+
+
+@router.get("/", response_model=PlanListResponse)
+async def list_plans(
+    limit: int = Query(20, ge=1, le=settings.PLAN_LIST_MAX_LIMIT, description="Plans per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    order: str = Query("date", description="date (Heimstunde date, oldest first) or created (newest first)"),
+    date_from: Optional[date] = Query(None, description="Only plans on or after this date"),
+    date_to: Optional[date] = Query(None, description="Only plans on or before this date"),
+    theme: Optional[str] = Query(None, description="Only plans with this theme")
+):
+    """List activity plans page by page (keyset pagination)."""
+    
+    try:
+        page = await plan_repository.list_plans(
+            limit=limit,
+            cursor=cursor,
+            order=order,
+            date_from=date_from,
+            date_to=date_to,
+            theme=theme
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PlanListResponse(plans=[ActivityPlan(**plan) for plan in page["plans"]], next_cursor=page["next_cursor"])
+
@@ -2,7 +2,7 @@
 Configuration settings for the Pfadi AI Assistant application.
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import AnyHttpUrl, validator
 from pydantic_settings import BaseSettings
 import os
@@ -56,6 +56,35 @@ class Settings(BaseSettings):
     AZURE_OPENAI_DEPLOYMENT_NAME: str = "gpt-4"
     AZURE_EMBEDDING_DEPLOYMENT_NAME: str = "text-embedding-ada-002"
     
+    # Azure OpenAI quotas per deployment and retry policy
+    AZURE_CHAT_RPM: int = 60
+    AZURE_CHAT_TPM: int = 40000
+    AZURE_EMBEDDING_RPM: int = 300
+    AZURE_EMBEDDING_TPM: int = 120000
+    AZURE_MAX_RETRIES: int = 4
+    AZURE_RETRY_BASE_DELAY: float = 0.5  # Seconds, doubled per attempt
+    AZURE_RETRY_MAX_DELAY: float = 20.0
+    CHAT_COMPLETION_TOKEN_ESTIMATE: int = 500  # Assumed completion length without max_tokens
+    
+    # Shared HTTP connection pool for Azure OpenAI
+    AZURE_HTTP2: bool = True  # Used when the h2 package is installed
+    AZURE_HTTP_MAX_CONNECTIONS: int = 20
+    AZURE_HTTP_MAX_KEEPALIVE: int = 10
+    AZURE_HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    AZURE_HTTP_CONNECT_TIMEOUT: float = 5.0
+    AZURE_CHAT_READ_TIMEOUT: float = 60.0
+    AZURE_EMBEDDING_READ_TIMEOUT: float = 15.0
+    AZURE_WARM_UP_CONNECTIONS: int = 2  # HTTP/1.1 only; HTTP/2 warms up its single connection
+    
+    # Circuit breakers per Azure deployment
+    CIRCUIT_FAILURE_RATE: float = 0.5  # Share of failed or slow calls that opens the circuit
+    CIRCUIT_WINDOW_SIZE: int = 20  # Recent calls considered
+    CIRCUIT_MIN_CALLS: int = 5
+    CIRCUIT_OPEN_SECONDS: float = 30.0  # Cool-down before probing again
+    CIRCUIT_HALF_OPEN_CALLS: int = 2  # Successful probes needed to close
+    CIRCUIT_CHAT_SLOW_SECONDS: float = 20.0
+    CIRCUIT_EMBEDDING_SLOW_SECONDS: float = 5.0
+    
     # Azure AI Search
     AZURE_SEARCH_ENDPOINT: Optional[str] = None
     AZURE_SEARCH_API_KEY: Optional[str] = None
@@ -74,8 +103,16 @@ class Settings(BaseSettings):
     DATA_DIR: Path = Path("data")
     LOCAL_DATA_DIR: Path = DATA_DIR / "local"
     GOOGLE_DRIVE_DATA_DIR: Path = DATA_DIR / "google_drive"
+    WEB_DATA_DIR: Path = DATA_DIR / "web_data"
+    CORPUS_DIR: Path = DATA_DIR / "corpus"
+    IMAGE_CACHE_DIR: Path = DATA_DIR / "cache" / "thumbnails"
+    KNOWLEDGE_BASE_DIR: Path = DATA_DIR / "knowledge_base"
+    SCHOOL_HOLIDAYS_FILE: Path = DATA_DIR / "calendar" / "schulferien_wien_noe.json"
     
-    @validator("DATA_DIR", "LOCAL_DATA_DIR", "GOOGLE_DRIVE_DATA_DIR", pre=True)
+    @validator(
+        "DATA_DIR", "LOCAL_DATA_DIR", "GOOGLE_DRIVE_DATA_DIR", "WEB_DATA_DIR", "CORPUS_DIR",
+        "IMAGE_CACHE_DIR", "KNOWLEDGE_BASE_DIR", "SCHOOL_HOLIDAYS_FILE", pre=True
+    )
     def resolve_paths(cls, v):
         """Resolve paths relative to the application root."""
         if isinstance(v, str):
@@ -86,6 +123,101 @@ class Settings(BaseSettings):
             v = app_root / v
         return v.resolve()
     
+    # Document extraction (data/local and data/google_drive)
+    EXTRACTION_MAX_WORKERS: int = 2
+    EXTRACTION_TIMEOUT_SECONDS: float = 60.0
+    EXTRACTION_MEMORY_LIMIT_MB: int = 512
+    
+    # Image assets
+    IMAGE_MAX_WORKERS: int = 2
+    THUMBNAIL_MAX_SIZE: int = 320
+    IMAGE_DEDUP_MAX_DISTANCE: int = 4  # Max. dHash bit difference for duplicates
+    
+    # Incremental indexing of the local data folders
+    ENABLE_FILE_WATCHER: bool = False
+    FILE_WATCHER_POLL_SECONDS: float = 2.0
+    FILE_WATCHER_DEBOUNCE_SECONDS: float = 3.0
+    
+    # Knowledge base (RAG over crawled pages and local documents)
+    KNOWLEDGE_BASE_COLLECTIONS: List[str] = [
+        "ppoe_at-ausbildung",
+        "ppoe_at-programm",
+        "ppoe_at-service",
+        "gusp_pik8",
+        "local",
+        "google_drive",
+    ]  # Collection name prefixes
+    KNOWLEDGE_CHUNK_SIZE: int = 1200  # Characters per chunk
+    KNOWLEDGE_CHUNK_OVERLAP: int = 200
+    KNOWLEDGE_TOP_K: int = 4
+    KNOWLEDGE_CANDIDATES: int = 12  # Chunks retrieved before context packing
+    KNOWLEDGE_CONTEXT_TOKENS: int = 900  # Prompt token budget for retrieved context
+    KNOWLEDGE_MMR_LAMBDA: float = 0.7  # 1.0 = relevance only, 0.0 = diversity only
+    EMBEDDING_BATCH_SIZE: int = 64
+    
+    # Micro-batching of concurrent single-text embedding requests
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 16
+    
+    # Semantic answer cache for knowledge questions
+    ENABLE_ANSWER_CACHE: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 512
+    ANSWER_CACHE_SIMILARITY: float = 0.92  # Min. cosine similarity for a hit
+    
+    # Chat conversation store
+    # "sqlite" (DATABASE_URL, one worker), "redis" (REDIS_URL, shared by all workers) or "memory"
+    CONVERSATION_STORE_BACKEND: str = "sqlite"
+    CONVERSATION_FLUSH_INTERVAL_MS: float = 50.0  # Write-behind batching window
+    CONVERSATION_MAX_COUNT: int = 10000  # Least recently used conversations are evicted beyond this
+    CONVERSATION_IDLE_TTL_SECONDS: int = 6 * 3600
+    CONVERSATION_MAX_BYTES: int = 64 * 1024 * 1024  # Approximate budget for all stored messages
+    CONVERSATION_MAX_MESSAGES: int = 50  # Messages kept per conversation
+    CONVERSATION_HISTORY_MESSAGES: int = 20  # Messages sent to the model as context
+    CONVERSATION_LOCAL_CACHE_SIZE: int = 1000  # Conversations cached per worker in front of Redis
+    
+    # Game catalog
+    GAME_BATCH_MAX_IDS: int = 100  # IDs per /games/batch request
+    
+    # Heimstunde planning
+    PLAN_CANDIDATE_LIMIT: int = 50  # Pre-filtered catalog games considered by the optimizer
+    PLAN_BEAM_WIDTH: int = 32  # Partial plans kept per step of the beam search
+    PLAN_MAX_GAMES: int = 5  # Games in the main part
+    PLAN_INTRODUCTION_MAX_TOKENS: int = 200  # Optional model-written introduction
+    PLAN_CACHE_SIZE: int = 256  # Recently saved or read plans kept in memory
+    PLAN_LIST_MAX_LIMIT: int = 100  # Plans per page of GET /planning/
+    SUGGESTION_CACHE_MAX_ENTRIES: int = 512
+    SUGGESTION_CACHE_TTL_SECONDS: float = 600.0  # Older suggestions are refreshed in the background
+    SUGGESTION_CACHE_MAX_STALE_SECONDS: float = 86400.0  # Older suggestions are recomputed before answering
+    HEIMSTUNDE_WEEKDAY: int = 4  # Regular meeting day (0 = Monday), Friday
+    HEIMSTUNDE_START_TIME: str = "18:15"
+    HEIMSTUNDE_DURATION_MINUTES: int = 90
+    SEMESTER_MAX_WEEKS: int = 30  # Meeting dates per semester request
+    SEMESTER_NO_REPEAT_WEEKS: int = 4  # A game is not repeated within this many weeks
+    SEMESTER_MIN_FILL: float = 0.6  # Share of the main part to fill before recent games are allowed again
+    SEMESTER_WORKERS: int = 4  # Plans built concurrently
+    
+    # Chat function calls
+    CHAT_TOOL_TIMEOUT_SECONDS: float = 20.0  # All function calls of one model turn together
+    CHAT_TOOL_MAX_GAMES: int = 5  # Games returned by search_games
+    ENABLE_SEARCH_PREFETCH: bool = True  # Speculative game search for game requests
+    SEARCH_PREFETCH_POOL_SIZE: int = 50  # Ranked games kept for filtering by the model's arguments
+    SEARCH_PREFETCH_MIN_OVERLAP: float = 0.5  # Share of the model's query terms found in the message
+    
+    # Rolling summaries of long conversations
+    ENABLE_CONVERSATION_SUMMARY: bool = True
+    CONVERSATION_SUMMARY_TRIGGER_TOKENS: int = 800  # Unsummarized history size that triggers a summary
+    CONVERSATION_SUMMARY_KEEP_MESSAGES: int = 6  # Most recent messages always sent verbatim
+    CONVERSATION_SUMMARY_MAX_TOKENS: int = 200
+    CONVERSATION_SUMMARY_DEPLOYMENT: Optional[str] = None  # Cheaper deployment, defaults to the chat one
+    
+    # Token accounting and per-user daily budgets (total tokens, None = unlimited)
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 30.0
+    USAGE_MAX_KEYS: int = 10000  # Counters kept in memory per dimension (user counters: all of today)
+    USAGE_TOKEN_PRICES: Dict[str, List[float]] = {}  # Deployment -> [prompt, completion] price per 1k tokens
+    USAGE_USER_SOFT_BUDGET_TOKENS: Optional[int] = None  # Above: requests get batch priority
+    USAGE_USER_HARD_BUDGET_TOKENS: Optional[int] = None  # Above: requests are refused
+    ADMIN_API_KEY: Optional[str] = None  # X-Admin-Key for /admin endpoints; without it they only work in DEBUG
+    
     # Logging
     LOG_LEVEL: str = "DEBUG" if DEBUG else "INFO"
     
@@ -101,6 +233,30 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
+def resolve_data_file(path: Path) -> Path:
+    """
+    Locate a data file in either layout.
+
+    In Docker the data directory is mounted next to the application
+    (/app/data); in a checkout it sits at the repository root, one level
+    above backend/. Relative paths are tried against the working directory,
+    the application root and the repository root.
+
+    Args:
+        path: Configured path
+
+    Returns:
+        The first existing candidate, otherwise the path as configured
+    """
+    if path.is_absolute():
+        return path
+    app_root = Path(__file__).parent.parent.parent
+    for candidate in (path, app_root / path, app_root.parent / path):
+        if candidate.exists():
+            return candidate.resolve()
+    return path
+
+
 # Global settings instance
 settings = Settings()
 
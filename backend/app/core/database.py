@@ -0,0 +1,52 @@
+"""
+SQLite helpers shared by the persistent stores.
+
+Only sqlite URLs are supported (``sqlite:///relative/or/absolute/path.db``).
+Relative paths are resolved against the application root, like the data
+directories in the settings.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+SQLITE_PREFIX = "sqlite:///"
+
+
+def sqlite_path(database_url: Optional[str] = None) -> Path:
+    """
+    File path of an SQLite database URL.
+
+    Args:
+        database_url: URL to resolve, defaults to settings.DATABASE_URL
+
+    Returns:
+        Absolute path of the database file
+    """
+    url = database_url or settings.DATABASE_URL
+    if not url.startswith(SQLITE_PREFIX):
+        raise ValueError(f"Only sqlite:/// database URLs are supported, got {url!r}")
+    path = Path(url[len(SQLITE_PREFIX):])
+    if not path.is_absolute():
+        app_root = Path(__file__).parent.parent.parent
+        path = app_root / path
+    return path.resolve()
+
+
+def connect(path: Path, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Open an SQLite connection configured for one writer and concurrent readers.
+
+    WAL mode lets readers proceed while a write transaction is open; with
+    synchronous=NORMAL a commit does not wait for an fsync (a power loss can
+    drop the last transactions, but never corrupts the database).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(path), timeout=5.0, check_same_thread=check_same_thread)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    return connection
@@ -0,0 +1,170 @@
+"""
+Redis client factory and an in-process stand-in.
+
+``memory://`` as REDIS_URL selects InProcessRedis, which implements the
+small command subset used by the shared stores (strings, lists, expiry and
+transactional pipelines) inside the current process. It is meant for tests
+and single-process development; it is not shared between workers.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+IN_PROCESS_URL = "memory://"
+
+
+class InProcessRedis:
+    """Minimal asyncio Redis replacement holding all keys in a dict."""
+
+    def __init__(self):
+        # key -> (value, expires at monotonic time or None)
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+    def _get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        return value
+
+    def _set(self, key: str, value: Any) -> None:
+        item = self._data.get(key)
+        self._data[key] = (value, item[1] if item else None)
+
+    # Commands --------------------------------------------------------------
+
+    def _cmd_get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        return None if value is None else str(value)
+
+    def _cmd_set(self, key: str, value: str) -> bool:
+        self._data[key] = (str(value), None)
+        return True
+
+    def _cmd_incr(self, key: str) -> int:
+        value = int(self._get(key) or 0) + 1
+        self._set(key, str(value))
+        return value
+
+    def _cmd_rpush(self, key: str, *values: str) -> int:
+        items = list(self._get(key) or [])
+        items.extend(values)
+        self._set(key, items)
+        return len(items)
+
+    def _cmd_ltrim(self, key: str, start: int, end: int) -> bool:
+        items = self._get(key)
+        if items is not None:
+            self._set(key, self._slice(items, start, end))
+        return True
+
+    def _cmd_lrange(self, key: str, start: int, end: int) -> List[str]:
+        return self._slice(self._get(key) or [], start, end)
+
+    def _cmd_expire(self, key: str, seconds: int) -> bool:
+        value = self._get(key)
+        if value is None:
+            return False
+        self._data[key] = (value, time.monotonic() + seconds)
+        return True
+
+    def _cmd_delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._get(key) is not None:
+                del self._data[key]
+                deleted += 1
+        return deleted
+
+    @staticmethod
+    def _slice(items: List[str], start: int, end: int) -> List[str]:
+        """Redis range semantics: inclusive end, negative indexes from the tail."""
+        length = len(items)
+        start = max(0, start + length if start < 0 else start)
+        end = end + length if end < 0 else end
+        return list(items[start:end + 1])
+
+    # Async client API -------------------------------------------------------
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cmd_get(key)
+
+    async def set(self, key: str, value: str) -> bool:
+        return self._cmd_set(key, value)
+
+    async def incr(self, key: str) -> int:
+        return self._cmd_incr(key)
+
+    async def rpush(self, key: str, *values: str) -> int:
+        return self._cmd_rpush(key, *values)
+
+    async def ltrim(self, key: str, start: int, end: int) -> bool:
+        return self._cmd_ltrim(key, start, end)
+
+    async def lrange(self, key: str, start: int, end: int) -> List[str]:
+        return self._cmd_lrange(key, start, end)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        return self._cmd_expire(key, seconds)
+
+    async def delete(self, *keys: str) -> int:
+        return self._cmd_delete(*keys)
+
+    async def ping(self) -> bool:
+        return True
+
+    def pipeline(self, transaction: bool = True) -> "InProcessPipeline":
+        return InProcessPipeline(self)
+
+    async def aclose(self) -> None:
+        self._data.clear()
+
+
+class InProcessPipeline:
+    """Queues commands and runs them back to back, which makes them atomic here."""
+
+    def __init__(self, client: InProcessRedis):
+        self._client = client
+        self._commands: List[Tuple[str, tuple]] = []
+
+    def __getattr__(self, name: str):
+        if not hasattr(self._client, f"_cmd_{name}"):
+            raise AttributeError(name)
+
+        def queue(*args):
+            self._commands.append((name, args))
+            return self
+        return queue
+
+    async def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        return [getattr(self._client, f"_cmd_{name}")(*args) for name, args in commands]
+
+    async def __aenter__(self) -> "InProcessPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._commands = []
+
+
+def create_redis_client(redis_url: Optional[str] = None):
+    """
+    Asyncio Redis client for a URL.
+
+    Args:
+        redis_url: URL to connect to, defaults to settings.REDIS_URL
+
+    Returns:
+        redis.asyncio.Redis with decoded responses, or InProcessRedis for memory://
+    """
+    url = redis_url or settings.REDIS_URL
+    if url.startswith(IN_PROCESS_URL):
+        return InProcessRedis()
+    import redis.asyncio as aioredis
+
+    return aioredis.from_url(url, decode_responses=True)
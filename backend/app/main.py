@@ -9,6 +9,17 @@ import structlog
 
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.services.azure_openai import azure_openai_service
+from app.services.conversation_store import conversation_store
+from app.services.corpus_store import corpus_store
+from app.services.document_extraction import document_extraction_service
+from app.services.file_watcher import file_watcher_service
+from app.services.game_search import game_search_service
+from app.services.image_assets import image_asset_service
+from app.services.ingestion import ingestion_service
+from app.services.knowledge_base import knowledge_base_service
+from app.services.plan_repository import plan_repository
+from app.services.usage_accounting import usage_accounting
 
 # Configure structured logging
 structlog.configure(
@@ -69,13 +80,41 @@ def create_application() -> FastAPI:
         # Initialize database
         # TODO: Add database initialization
         
-        # Initialize Azure services
-        # TODO: Add Azure service initialization
+        # Restore the document catalog from the packed corpus store
+        ingestion_service.load_catalog()
+        
+        # Downstream ingestion stages
+        ingestion_service.add_listener(image_asset_service.on_catalog_update)
+        image_asset_service.attach_to_games()
+        knowledge_base_service.load()
+        ingestion_service.add_listener(knowledge_base_service.on_catalog_update)
+        
+        # Today's token usage, so daily budgets survive restarts
+        await usage_accounting.load()
+        
+        # Initialize Azure services: open pooled connections and embed the
+        # game catalog before the first request arrives
+        warm_up = await azure_openai_service.warm_up()
+        if warm_up.get("connections"):
+            await game_search_service.preload_embeddings()
+        
+        # Watch local data folders for new documents
+        if settings.ENABLE_FILE_WATCHER:
+            await file_watcher_service.start()
 
     @app.on_event("shutdown")
     async def shutdown_event():
         """Cleanup on shutdown."""
         logger.info("Shutting down Pfadi AI Assistant API")
+        
+        await file_watcher_service.stop()
+        await azure_openai_service.close()
+        await conversation_store.close()
+        await plan_repository.close()
+        await usage_accounting.close()
+        await image_asset_service.close()
+        document_extraction_service.shutdown()
+        corpus_store.close()
 
     @app.get("/")
     async def root():
@@ -0,0 +1,128 @@
+"""
+Semantic answer cache for repeated knowledge questions.
+
+Answers to Pfadfinder knowledge questions are cached together with the
+embedding of the question. A new question that is close enough to a cached
+one (cosine similarity above ANSWER_CACHE_SIMILARITY) reuses the stored
+answer and sources without any completion round trip. Answers depend on the
+knowledge base content, so the whole cache is dropped whenever the knowledge
+base version changes.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.services.knowledge_base import knowledge_base_service
+
+logger = structlog.get_logger()
+
+
+class SemanticAnswerCache:
+    """Bounded LRU cache of answers, looked up by question similarity."""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        similarity_threshold: Optional[float] = None
+    ):
+        """Initialize the answer cache."""
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.similarity_threshold = similarity_threshold or settings.ANSWER_CACHE_SIMILARITY
+        # entry key -> {"question", "variant", "vector", "answer"}, least recently used first
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.knowledge_version = knowledge_base_service.version
+        self._next_key = 0
+        self.stats = {"lookups": 0, "hits": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_version(self) -> None:
+        """Drop all entries once the knowledge base has changed."""
+        if knowledge_base_service.version != self.knowledge_version:
+            if self.entries:
+                logger.info(
+                    "Answer cache invalidated",
+                    entries=len(self.entries),
+                    knowledge_version=knowledge_base_service.version
+                )
+                self.stats["invalidations"] += 1
+            self.entries.clear()
+            self.knowledge_version = knowledge_base_service.version
+
+    async def get(self, question: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a semantically equivalent question.
+
+        Args:
+            question: The new question
+            variant: Only entries stored with the same variant can match
+
+        Returns:
+            The cached answer dict, or None on a miss
+        """
+        if not settings.ENABLE_ANSWER_CACHE:
+            return None
+        self._check_version()
+        self.stats["lookups"] += 1
+        candidates = [key for key, entry in self.entries.items() if entry["variant"] == variant]
+        if not candidates:
+            return None
+
+        vector = await knowledge_base_service.embed_query(question)
+        if vector is None:
+            return None
+        matrix = np.stack([self.entries[key]["vector"] for key in candidates])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        key = candidates[best]
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        entry = self.entries[key]
+        logger.info(
+            "Answer cache hit",
+            question=question[:80],
+            cached_question=entry["question"][:80],
+            similarity=round(float(scores[best]), 3)
+        )
+        return entry["answer"]
+
+    async def put(self, question: str, answer: Dict[str, Any], variant: str = "") -> None:
+        """Store an answer, evicting the least recently used entry when full."""
+        if not settings.ENABLE_ANSWER_CACHE:
+            return
+        self._check_version()
+        vector = await knowledge_base_service.embed_query(question)
+        if vector is None:
+            return
+
+        self.entries[self._next_key] = {
+            "question": question,
+            "variant": variant,
+            "vector": vector,
+            "answer": answer,
+        }
+        self._next_key += 1
+        self.stats["stores"] += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["lookups"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "knowledge_version": self.knowledge_version,
+        }
+
+
+# Global cache instance
+answer_cache = SemanticAnswerCache()
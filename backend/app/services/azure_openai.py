@@ -2,17 +2,44 @@
 Azure OpenAI Service integration for Pfadi AI Assistant.
 """
 
+import asyncio
+import importlib.util
 import json
 import logging
-from typing import List, Optional, Dict, Any
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+import openai
 from openai import AsyncAzureOpenAI
 from openai.types.chat import ChatCompletion
 import structlog
 
 from app.core.config import settings
+from app.services.circuit_breaker import CircuitOpenError, circuit_breakers
+from app.services.rate_limiter import Priority, rate_limit_scheduler
+from app.services.text_processing import estimate_message_tokens, estimate_tokens
+from app.services.usage_accounting import BUDGET_EXCEEDED_MESSAGE, BudgetExceededError, usage_accounting
 
 logger = structlog.get_logger()
 
+# Failures that tell about the deployment's health; throttling (429) and other
+# 4xx errors are about the caller or the request and leave the breaker alone
+SERVICE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    httpx.TimeoutException,
+    httpx.TransportError,
+    asyncio.TimeoutError,
+)
+
+
+def is_service_failure(error: BaseException) -> bool:
+    """Whether an error should count against the deployment's circuit breaker."""
+    if isinstance(error, SERVICE_ERRORS):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
 
 class AzureOpenAIService:
     """Service for interacting with Azure OpenAI."""
@@ -20,8 +47,32 @@ class AzureOpenAIService:
     def __init__(self):
         """Initialize the Azure OpenAI client."""
         self.client: Optional[AsyncAzureOpenAI] = None
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.http2 = False
+        self.warm_up_stats: Dict[str, Any] = {}
         self._initialize_client()
     
+    def _create_http_client(self) -> httpx.AsyncClient:
+        """Shared connection pool for all Azure OpenAI requests."""
+        # HTTP/2 multiplexes concurrent requests over one connection, needs the h2 package
+        self.http2 = settings.AZURE_HTTP2 and importlib.util.find_spec("h2") is not None
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=settings.AZURE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AZURE_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.AZURE_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.AZURE_CHAT_READ_TIMEOUT,
+                connect=settings.AZURE_HTTP_CONNECT_TIMEOUT,
+            ),
+        )
+    
+    @staticmethod
+    def _request_timeout(read_timeout: float) -> httpx.Timeout:
+        return httpx.Timeout(read_timeout, connect=settings.AZURE_HTTP_CONNECT_TIMEOUT)
+    
     def _initialize_client(self) -> None:
         """Initialize the Azure OpenAI client if credentials are available."""
         if not settings.AZURE_OPENAI_ENDPOINT or not settings.AZURE_OPENAI_API_KEY:
@@ -33,22 +84,95 @@ class AzureOpenAIService:
             return
         
         try:
+            self.http_client = self._create_http_client()
             self.client = AsyncAzureOpenAI(
                 azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
                 api_key=settings.AZURE_OPENAI_API_KEY,
-                api_version="2024-02-15-preview"
+                api_version="2024-02-15-preview",
+                http_client=self.http_client,
+                # Retries are owned by the rate-limit scheduler
+                max_retries=0
             )
             logger.info("Azure OpenAI client initialized successfully")
         except Exception as e:
             logger.error("Failed to initialize Azure OpenAI client", error=str(e))
     
+    async def _call(
+        self,
+        deployment: str,
+        request: Callable[[], Awaitable[Any]],
+        estimated_tokens: int,
+        priority: Priority
+    ) -> Any:
+        """
+        Send a request through the deployment's circuit breaker and rate limits.
+
+        The breaker sees one outcome per call, after the scheduler's retries:
+        success (with the latency of the attempt that succeeded), a service
+        failure (5xx, timeout, connection error), or nothing at all for
+        throttling and other client errors.
+
+        Raises:
+            CircuitOpenError: The circuit is open, the caller should use its fallback
+        """
+        result, latency = await self._send(deployment, request, estimated_tokens, priority)
+        circuit_breakers.breaker(deployment).record_success(latency)
+        return result
+    
+    async def _send(
+        self,
+        deployment: str,
+        request: Callable[[], Awaitable[Any]],
+        estimated_tokens: int,
+        priority: Priority
+    ) -> Tuple[Any, float]:
+        """
+        Like _call, but leaves recording the success to the caller.
+
+        Streams are only successful once the last chunk has arrived.
+
+        Returns:
+            The response and the latency of the attempt that returned it
+        """
+        breaker = circuit_breakers.breaker(deployment)
+        if not breaker.allow_request():
+            raise CircuitOpenError(deployment)
+        latency = 0.0
+
+        async def attempt() -> Any:
+            nonlocal latency
+            # A retry must not go out once other calls have opened the circuit
+            if breaker.is_open():
+                raise CircuitOpenError(deployment)
+            started = time.monotonic()
+            try:
+                return await request()
+            finally:
+                latency = time.monotonic() - started
+
+        try:
+            result = await rate_limit_scheduler.execute(
+                deployment, attempt, estimated_tokens=estimated_tokens, priority=priority
+            )
+        except Exception as e:
+            if is_service_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.abandon()
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        return result, latency
+    
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
-        functions: Optional[List[Dict]] = None
+        functions: Optional[List[Dict]] = None,
+        priority: Priority = Priority.INTERACTIVE
     ) -> Dict[str, Any]:
         """
         Generate a chat completion using Azure OpenAI.
@@ -59,6 +183,7 @@ class AzureOpenAIService:
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens to generate
             functions: Function definitions for function calling
+            priority: Scheduling priority against the deployment's rate limits
             
         Returns:
             Dict containing the response and metadata
@@ -75,14 +200,16 @@ class AzureOpenAIService:
                 "model": deployment_name,
                 "messages": messages,
                 "temperature": temperature,
+                "timeout": self._request_timeout(settings.AZURE_CHAT_READ_TIMEOUT),
             }
             
             if max_tokens:
                 request_params["max_tokens"] = max_tokens
             
             if functions:
-                request_params["functions"] = functions
-                request_params["function_call"] = "auto"
+                # Tools (rather than the legacy functions API) allow several calls per turn
+                request_params["tools"] = [{"type": "function", "function": function} for function in functions]
+                request_params["tool_choice"] = "auto"
             
             logger.info(
                 "Sending chat completion request",
@@ -91,7 +218,27 @@ class AzureOpenAIService:
                 temperature=temperature
             )
             
-            response: ChatCompletion = await self.client.chat.completions.create(**request_params)
+            await usage_accounting.check_budget()
+            estimated_tokens = estimate_message_tokens(messages) + (
+                max_tokens or settings.CHAT_COMPLETION_TOKEN_ESTIMATE
+            )
+            started = time.perf_counter()
+            response: ChatCompletion = await self._call(
+                deployment_name,
+                lambda: self.client.chat.completions.create(**request_params),
+                estimated_tokens=estimated_tokens,
+                priority=usage_accounting.effective_priority(priority)
+            )
+            if response.usage:
+                rate_limit_scheduler.record_usage(
+                    deployment_name, estimated_tokens, response.usage.total_tokens
+                )
+                usage_accounting.record(
+                    deployment_name,
+                    response.usage.prompt_tokens,
+                    response.usage.completion_tokens,
+                    latency_ms=(time.perf_counter() - started) * 1000
+                )
             
             # Extract response data
             choice = response.choices[0]
@@ -100,7 +247,7 @@ class AzureOpenAIService:
             result = {
                 "message": message.content,
                 "role": message.role,
-                "function_call": None,
+                "tool_calls": [],
                 "usage": {
                     "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
                     "completion_tokens": response.usage.completion_tokens if response.usage else 0,
@@ -111,11 +258,12 @@ class AzureOpenAIService:
             }
             
             # Handle function calls
-            if message.function_call:
-                result["function_call"] = {
-                    "name": message.function_call.name,
-                    "arguments": message.function_call.arguments
-                }
+            for tool_call in message.tool_calls or []:
+                result["tool_calls"].append({
+                    "id": tool_call.id,
+                    "name": tool_call.function.name,
+                    "arguments": tool_call.function.arguments
+                })
             
             logger.info(
                 "Chat completion successful",
@@ -125,6 +273,17 @@ class AzureOpenAIService:
             
             return result
             
+        except BudgetExceededError:
+            return {
+                "message": BUDGET_EXCEEDED_MESSAGE,
+                "role": "assistant",
+                "error": "budget_exceeded"
+            }
+        except CircuitOpenError:
+            # Degraded mode: answer locally instead of waiting for a failing service
+            response = self._get_mock_response(messages[-1].get("content") or "")
+            response["degraded"] = True
+            return response
         except Exception as e:
             logger.error("Chat completion failed", error=str(e))
             return {
@@ -133,10 +292,170 @@ class AzureOpenAIService:
                 "error": str(e)
             }
     
+    async def chat_completion_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        functions: Optional[List[Dict]] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a chat completion as events.
+        
+        Yields dicts with a "type":
+            token: {"content"} for every content delta
+            function_call: {"id", "name", "arguments"} for every tool call, as soon as
+                its arguments are complete (the next call starts or the stream ends)
+            done: {"finish_reason", "usage", "mock"} at the end (usage is estimated,
+                the streaming API does not report it)
+            error: {"message", "error"} if the request failed
+        """
+        if not self.client:
+            mock = self._get_mock_response(messages[-1].get("content") or "")
+            yield {"type": "token", "content": mock["message"]}
+            yield {"type": "done", "finish_reason": "stop", "usage": mock["usage"], "mock": True}
+            return
+        
+        deployment_name = model or settings.AZURE_OPENAI_DEPLOYMENT_NAME
+        request_params = {
+            "model": deployment_name,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+            "timeout": self._request_timeout(settings.AZURE_CHAT_READ_TIMEOUT),
+        }
+        if max_tokens:
+            request_params["max_tokens"] = max_tokens
+        if functions:
+            request_params["tools"] = [{"type": "function", "function": function} for function in functions]
+            request_params["tool_choice"] = "auto"
+        
+        prompt_tokens = estimate_message_tokens(messages)
+        estimated_tokens = prompt_tokens + (max_tokens or settings.CHAT_COMPLETION_TOKEN_ESTIMATE)
+        content_parts: List[str] = []
+        # Tool call being streamed: {"index", "id", "name", "arguments"}
+        tool_call: Optional[Dict[str, Any]] = None
+        argument_parts: List[str] = []
+        finish_reason = None
+        
+        breaker = circuit_breakers.breaker(deployment_name)
+        stream = None
+        started = time.perf_counter()
+        try:
+            await usage_accounting.check_budget()
+            stream, latency = await self._send(
+                deployment_name,
+                lambda: self.client.chat.completions.create(**request_params),
+                estimated_tokens=estimated_tokens,
+                priority=usage_accounting.effective_priority(priority)
+            )
+            async for chunk in stream:
+                # Azure sends prompt filter results in a first chunk without choices
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                delta = choice.delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    yield {"type": "token", "content": delta.content}
+                for tool_delta in delta.tool_calls or []:
+                    if tool_call is None or tool_delta.index != tool_call["index"]:
+                        if tool_call is not None:
+                            # The previous call is complete once the next one starts
+                            yield {"type": "function_call", **self._finish_tool_call(tool_call)}
+                        tool_call = {"index": tool_delta.index, "id": tool_delta.id, "name": "", "arguments": ""}
+                    if tool_delta.id:
+                        tool_call["id"] = tool_delta.id
+                    if tool_delta.function and tool_delta.function.name:
+                        tool_call["name"] += tool_delta.function.name
+                    if tool_delta.function and tool_delta.function.arguments:
+                        tool_call["arguments"] += tool_delta.function.arguments
+                        argument_parts.append(tool_delta.function.arguments)
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+        except BudgetExceededError:
+            yield {"type": "error", "message": BUDGET_EXCEEDED_MESSAGE, "error": "budget_exceeded"}
+            return
+        except CircuitOpenError:
+            mock = self._get_mock_response(messages[-1].get("content") or "")
+            yield {"type": "token", "content": mock["message"]}
+            yield {"type": "done", "finish_reason": "stop", "usage": mock["usage"], "mock": True}
+            return
+        except Exception as e:
+            if stream is not None:
+                # Broke off mid-stream: the breaker and the budget still see the request
+                if is_service_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.abandon()
+                self._record_stream_usage(
+                    deployment_name, estimated_tokens, prompt_tokens, content_parts, argument_parts, started
+                )
+            logger.error("Streaming chat completion failed", error=str(e))
+            yield {
+                "type": "error",
+                "message": "Entschuldigung, es gab einen Fehler bei der Verarbeitung deiner Anfrage. Bitte versuche es später erneut.",
+                "error": str(e)
+            }
+            return
+        except BaseException:
+            # Cancelled or closed by the consumer while streaming
+            if stream is not None:
+                breaker.abandon()
+                self._record_stream_usage(
+                    deployment_name, estimated_tokens, prompt_tokens, content_parts, argument_parts, started
+                )
+            raise
+        
+        # Latency up to the response headers, comparable to non-streamed calls
+        breaker.record_success(latency)
+        completion_tokens = self._record_stream_usage(
+            deployment_name, estimated_tokens, prompt_tokens, content_parts, argument_parts, started
+        )
+        if tool_call is not None:
+            yield {"type": "function_call", **self._finish_tool_call(tool_call)}
+        
+        yield {
+            "type": "done",
+            "finish_reason": finish_reason,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "estimated": True
+            },
+            "mock": False
+        }
+    
+    @staticmethod
+    def _record_stream_usage(
+        deployment: str,
+        estimated_tokens: int,
+        prompt_tokens: int,
+        content_parts: List[str],
+        argument_parts: List[str],
+        started: float
+    ) -> int:
+        """Account the (possibly partial) streamed output and return its estimated tokens."""
+        completion_tokens = estimate_tokens("".join(content_parts)) + estimate_tokens("".join(argument_parts))
+        rate_limit_scheduler.record_usage(deployment, estimated_tokens, prompt_tokens + completion_tokens)
+        usage_accounting.record(
+            deployment, prompt_tokens, completion_tokens,
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+        return completion_tokens
+    
+    @staticmethod
+    def _finish_tool_call(tool_call: Dict[str, Any]) -> Dict[str, str]:
+        return {"id": tool_call["id"], "name": tool_call["name"], "arguments": tool_call["arguments"]}
+    
     async def generate_embedding(
         self,
         text: str,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE
     ) -> List[float]:
         """
         Generate embeddings for text using Azure OpenAI.
@@ -144,6 +463,7 @@ class AzureOpenAIService:
         Args:
             text: Text to generate embeddings for
             model: Embedding model deployment name
+            priority: Scheduling priority against the deployment's rate limits
             
         Returns:
             List of embedding values
@@ -155,9 +475,23 @@ class AzureOpenAIService:
         try:
             deployment_name = model or settings.AZURE_EMBEDDING_DEPLOYMENT_NAME
             
-            response = await self.client.embeddings.create(
-                model=deployment_name,
-                input=text
+            started = time.perf_counter()
+            response = await self._call(
+                deployment_name,
+                lambda: self.client.embeddings.create(
+                    model=deployment_name,
+                    input=text,
+                    timeout=self._request_timeout(settings.AZURE_EMBEDDING_READ_TIMEOUT)
+                ),
+                estimated_tokens=estimate_tokens(text),
+                priority=priority
+            )
+            usage_accounting.record(
+                deployment_name,
+                response.usage.prompt_tokens if response.usage else estimate_tokens(text),
+                latency_ms=(time.perf_counter() - started) * 1000,
+                feature="embeddings",
+                shared=True
             )
             
             embedding = response.data[0].embedding
@@ -170,10 +504,68 @@ class AzureOpenAIService:
             
             return embedding
             
+        except CircuitOpenError:
+            return [0.0] * 1536  # Return dummy embedding
         except Exception as e:
             logger.error("Embedding generation failed", error=str(e))
             return [0.0] * 1536  # Return dummy embedding
-    
+
+    async def generate_embeddings(
+        self,
+        texts: List[str],
+        model: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> Optional[List[List[float]]]:
+        """
+        Generate embeddings for several texts in batched requests.
+
+        Args:
+            texts: Texts to generate embeddings for
+            model: Embedding model deployment name
+            priority: Scheduling priority against the deployment's rate limits
+
+        Returns:
+            One embedding per text in input order, or None if unavailable or failed
+        """
+        if not self.client:
+            return None
+
+        deployment_name = model or settings.AZURE_EMBEDDING_DEPLOYMENT_NAME
+        embeddings: List[List[float]] = []
+        try:
+            for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE):
+                batch = texts[start:start + settings.EMBEDDING_BATCH_SIZE]
+                started = time.perf_counter()
+                response = await self._call(
+                    deployment_name,
+                    lambda: self.client.embeddings.create(
+                        model=deployment_name,
+                        input=batch,
+                        timeout=self._request_timeout(settings.AZURE_EMBEDDING_READ_TIMEOUT)
+                    ),
+                    estimated_tokens=sum(estimate_tokens(text) for text in batch),
+                    priority=priority
+                )
+                usage_accounting.record(
+                    deployment_name,
+                    response.usage.prompt_tokens if response.usage else sum(estimate_tokens(text) for text in batch),
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                    feature="embeddings",
+                    shared=True
+                )
+                # The API may return items out of order
+                embeddings.extend(
+                    item.embedding for item in sorted(response.data, key=lambda item: item.index)
+                )
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            logger.error("Batch embedding generation failed", error=str(e), texts=len(texts))
+            return None
+
+        logger.info("Batch embedding generation successful", texts=len(texts))
+        return embeddings
+
     def _get_mock_response(self, user_message: str) -> Dict[str, Any]:
         """Generate a mock response when Azure OpenAI is not available."""
         
@@ -196,9 +588,60 @@ class AzureOpenAIService:
             "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
         }
     
+    async def warm_up(self) -> Dict[str, Any]:
+        """
+        Open pooled connections before the first user request.
+
+        Pays DNS, TLS and connection setup once at startup with cheap
+        requests. Over HTTP/1.1 AZURE_WARM_UP_CONNECTIONS requests run
+        concurrently, so each opens a connection of its own; over HTTP/2 all
+        requests share one multiplexed connection, so a single request warms
+        it up.
+
+        Returns:
+            Warm-up statistics ("connections" is the number of connections opened)
+        """
+        if not self.client:
+            return {"skipped": True}
+        
+        started = time.perf_counter()
+        requests = 1 if self.http2 else settings.AZURE_WARM_UP_CONNECTIONS
+        results = await asyncio.gather(
+            *(
+                self.client.models.list(timeout=self._request_timeout(settings.AZURE_HTTP_CONNECT_TIMEOUT))
+                for _ in range(requests)
+            ),
+            return_exceptions=True
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        self.warm_up_stats = {
+            "connections": len(results) - len(failures),
+            "requests": len(results),
+            "failed": len(failures),
+            "http2": self.http2,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if failures:
+            logger.warning("Azure OpenAI warm-up incomplete", error=str(failures[0]), **self.warm_up_stats)
+        else:
+            logger.info("Azure OpenAI connections warmed up", **self.warm_up_stats)
+        return self.warm_up_stats
+    
+    async def close(self) -> None:
+        """Close the connection pool gracefully."""
+        if self.client:
+            await self.client.close()
+            logger.info("Azure OpenAI connection pool closed")
+    
     def is_available(self) -> bool:
         """Check if Azure OpenAI service is available."""
         return self.client is not None
+    
+    def embeddings_available(self) -> bool:
+        """Configured and the embedding deployment's circuit is not open."""
+        return self.is_available() and not circuit_breakers.breaker(
+            settings.AZURE_EMBEDDING_DEPLOYMENT_NAME
+        ).is_open()
 
 
 # Global service instance
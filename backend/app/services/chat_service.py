@@ -2,13 +2,25 @@
 Chat service implementing Pfadi-specific conversation logic.
 """
 
+import asyncio
 import json
+import time
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 from datetime import datetime
 import structlog
 
+from app.services.answer_cache import answer_cache
 from app.services.azure_openai import azure_openai_service
+from app.services.context_packing import context_packer
+from app.services.conversation_locks import conversation_locks
+from app.services.conversation_store import conversation_store
+from app.services.conversation_summary import conversation_summarizer, split_history, summary_message
+from app.services.game_search import game_search_service
+from app.services.knowledge_base import knowledge_base_service
+from app.services.planning_service import planning_service
+from app.services.search_prefetch import PrefetchedSearch, game_search_prefetcher, looks_like_game_request
+from app.services.usage_accounting import usage_accounting
 from app.core.config import settings
 
 logger = structlog.get_logger()
@@ -104,7 +116,15 @@ class PfadiChatService:
     
     def __init__(self):
         """Initialize the chat service."""
-        self.conversation_memory: Dict[str, List[Dict]] = {}
+        self.store = conversation_store
+        self.stream_stats = {
+            "streams": 0,
+            "total_ms_sum": 0.0,
+            "ttft_count": 0,
+            "ttft_ms_sum": 0.0,
+            "ttft_ms_max": 0.0,
+            "ttft_ms_last": 0.0,
+        }
     
     async def process_message(
         self,
@@ -127,43 +147,249 @@ class PfadiChatService:
         if not conversation_id:
             conversation_id = str(uuid.uuid4())
         
-        # Build conversation history
-        messages = self._build_conversation_messages(
-            user_message, 
-            conversation_id, 
-            user_context
-        )
-        
-        # Get AI response
-        try:
-            if azure_openai_service.is_available():
-                response = await self._get_ai_response(messages, conversation_id)
-            else:
-                response = self._get_fallback_response(user_message)
-        except Exception as e:
-            logger.error("Error processing message", error=str(e))
-            response = {
-                "message": "Entschuldigung, es gab einen technischen Fehler. Bitte versuche es erneut.",
-                "error": True
-            }
-        
-        # Update conversation memory
-        self._update_conversation_memory(conversation_id, user_message, response)
+        # Turns of one conversation run one after another, each seeing the previous exchange
+        async with conversation_locks.hold(conversation_id):
+            # Stamped once it is this turn's turn, so it sorts after the previous reply
+            received_at = datetime.utcnow().isoformat()
+            # Build conversation history
+            messages = await self._build_conversation_messages(
+                user_message, 
+                conversation_id, 
+                user_context
+            )
+            
+            # Get AI response
+            try:
+                if azure_openai_service.is_available():
+                    with usage_accounting.attribute(conversation=conversation_id):
+                        response = await self._get_ai_response(messages, conversation_id)
+                else:
+                    response = self._get_fallback_response(user_message)
+            except Exception as e:
+                logger.error("Error processing message", error=str(e))
+                response = {
+                    "message": "Entschuldigung, es gab einen technischen Fehler. Bitte versuche es erneut.",
+                    "error": True
+                }
+            
+            # Update conversation memory
+            await self._update_conversation_memory(conversation_id, user_message, response, received_at)
         
         # Generate suggested actions
         suggested_actions = self._generate_suggested_actions(response, user_message)
+        data, references = self._reference_payload(response.get("function_data"))
         
         return {
             "message": response.get("message", "Keine Antwort erhalten."),
             "conversation_id": conversation_id,
-            "data": response.get("function_data"),
+            "data": data,
+            "references": references,
             "suggested_actions": suggested_actions,
             "timestamp": datetime.utcnow(),
             "usage": response.get("usage", {}),
             "mock_response": response.get("mock", False)
         }
     
-    def _build_conversation_messages(
+    async def process_message_stream(
+        self,
+        user_message: str,
+        conversation_id: Optional[str] = None,
+        user_context: Optional[Dict] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a user message and stream the response as events.
+        
+        Yields dicts with a "type": start, token, function_call, function_result,
+        error and finally done (full message, referenced objects, suggested
+        actions, usage and timings).
+        Conversation memory is updated once the answer is complete. A turn
+        waits for earlier turns of the same conversation after the start event.
+        """
+        started = time.perf_counter()
+        if not conversation_id:
+            conversation_id = str(uuid.uuid4())
+        
+        yield {"type": "start", "conversation_id": conversation_id}
+        
+        async with conversation_locks.hold(conversation_id):
+            # Stamped once it is this turn's turn, so it sorts after the previous reply
+            received_at = datetime.utcnow().isoformat()
+            messages = await self._build_conversation_messages(
+                user_message,
+                conversation_id,
+                user_context
+            )
+            
+            first_token_at = None
+            response: Dict[str, Any] = {}
+            try:
+                with usage_accounting.attribute(conversation=conversation_id):
+                    async for event in self._stream_ai_response(messages):
+                        if event["type"] == "response":
+                            response = event["response"]
+                            continue
+                        if event["type"] == "token" and first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        yield event
+            except Exception as e:
+                logger.error("Error streaming message", error=str(e))
+                response = {
+                    "message": "Entschuldigung, es gab einen technischen Fehler. Bitte versuche es erneut.",
+                    "error": True
+                }
+                yield {"type": "error", "message": response["message"]}
+            
+            await self._update_conversation_memory(conversation_id, user_message, response, received_at)
+        
+        total_ms = (time.perf_counter() - started) * 1000
+        ttft_ms = (first_token_at - started) * 1000 if first_token_at else None
+        self._record_stream_timing(ttft_ms, total_ms)
+        data, references = self._reference_payload(response.get("function_data"))
+        
+        yield {
+            "type": "done",
+            "message": response.get("message") or "Keine Antwort erhalten.",
+            "conversation_id": conversation_id,
+            "data": data,
+            "references": references,
+            "suggested_actions": self._generate_suggested_actions(response, user_message),
+            "timestamp": datetime.utcnow().isoformat(),
+            "usage": response.get("usage", {}),
+            "mock_response": response.get("mock", False),
+            "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+            "total_ms": round(total_ms, 1)
+        }
+    
+    async def _stream_ai_response(self, messages: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of _get_ai_response.
+        
+        Forwards token events, runs a function call as soon as its arguments
+        are complete and streams the follow-up answer. The last event has type
+        "response" and carries the assembled response dict.
+        """
+        user_message = messages[-1]["content"]
+        first_turn = len(messages) == 2
+        if first_turn and azure_openai_service.is_available():
+            cached = await answer_cache.get(user_message, variant="message")
+            if cached:
+                yield {"type": "token", "content": cached["message"]}
+                yield {"type": "response", "response": self._cached_response(cached)}
+                return
+        
+        prefetch = game_search_prefetcher.start(user_message)
+        try:
+            async for event in self._stream_with_functions(messages, user_message, first_turn, prefetch):
+                yield event
+        finally:
+            game_search_prefetcher.finish(prefetch)
+    
+    async def _stream_with_functions(
+        self,
+        messages: List[Dict[str, Any]],
+        user_message: str,
+        first_turn: bool,
+        prefetch: Optional[PrefetchedSearch]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        parts: List[str] = []
+        tool_calls: List[Dict[str, str]] = []
+        tasks: List[asyncio.Task] = []
+        usage: Dict[str, Any] = {}
+        mock = False
+        async for event in azure_openai_service.chat_completion_stream(
+            messages=messages,
+            temperature=0.7,
+            functions=list(self.AVAILABLE_FUNCTIONS.values())
+        ):
+            if event["type"] == "token":
+                parts.append(event["content"])
+                yield event
+            elif event["type"] == "function_call":
+                # Start each call right away, while the model may still stream the next one
+                tool_call = {"id": event["id"], "name": event["name"], "arguments": event["arguments"]}
+                tool_calls.append(tool_call)
+                tasks.extend(self._start_tool_calls([tool_call], prefetch))
+                yield {"type": "function_call", **tool_call}
+            elif event["type"] == "error":
+                for task in tasks:
+                    task.cancel()
+                yield {"type": "error", "message": event["message"]}
+                yield {"type": "response", "response": {"message": event["message"], "error": event["error"]}}
+                return
+            elif event["type"] == "done":
+                usage, mock = event["usage"], event["mock"]
+        
+        if not tool_calls:
+            yield {"type": "response", "response": {"message": "".join(parts), "usage": usage, "mock": mock}}
+            return
+        
+        knowledge_key = self._knowledge_cache_variant(tool_calls)
+        if knowledge_key:
+            cached = await answer_cache.get(knowledge_key[0], variant=knowledge_key[1])
+            if cached:
+                for task in tasks:
+                    task.cancel()
+                yield {"type": "token", "content": cached["message"]}
+                yield {"type": "response", "response": self._cached_response(cached, usage)}
+                return
+        
+        results = await self._collect_tool_results(tool_calls, tasks)
+        for tool_call, result in zip(tool_calls, results):
+            yield {
+                "type": "function_result",
+                "id": tool_call["id"],
+                "name": tool_call["name"],
+                # Full game objects follow once, in the references of the done event
+                "data": self._reference_payload(
+                    {key: value for key, value in result.items() if key != "context_usage"}
+                )[0]
+            }
+        function_result, context_usage = self._append_tool_results(tool_calls, results, messages)
+        
+        parts = []
+        async for event in azure_openai_service.chat_completion_stream(messages=messages, temperature=0.7):
+            if event["type"] == "token":
+                parts.append(event["content"])
+                yield event
+            elif event["type"] == "error":
+                yield {"type": "error", "message": event["message"]}
+                yield {
+                    "type": "response",
+                    "response": {"message": event["message"], "error": event["error"], "function_data": function_result}
+                }
+                return
+            elif event["type"] == "done":
+                usage = {**event["usage"], **(context_usage or {})}
+        
+        message = "".join(parts)
+        if knowledge_key and message:
+            await self._cache_knowledge_answer(
+                knowledge_key, user_message if first_turn else None, message, function_result
+            )
+        yield {"type": "response", "response": {"message": message, "function_data": function_result, "usage": usage}}
+    
+    def _record_stream_timing(self, ttft_ms: Optional[float], total_ms: float) -> None:
+        stats = self.stream_stats
+        stats["streams"] += 1
+        stats["total_ms_sum"] += total_ms
+        if ttft_ms is not None:
+            stats["ttft_count"] += 1
+            stats["ttft_ms_sum"] += ttft_ms
+            stats["ttft_ms_max"] = max(stats["ttft_ms_max"], ttft_ms)
+            stats["ttft_ms_last"] = ttft_ms
+    
+    def get_stream_stats(self) -> Dict[str, Any]:
+        """Time-to-first-token statistics of streamed answers."""
+        stats = self.stream_stats
+        return {
+            "streams": stats["streams"],
+            "avg_ttft_ms": round(stats["ttft_ms_sum"] / stats["ttft_count"], 1) if stats["ttft_count"] else None,
+            "max_ttft_ms": round(stats["ttft_ms_max"], 1),
+            "last_ttft_ms": round(stats["ttft_ms_last"], 1) if stats["ttft_count"] else None,
+            "avg_total_ms": round(stats["total_ms_sum"] / stats["streams"], 1) if stats["streams"] else None,
+        }
+    
+    async def _build_conversation_messages(
         self,
         user_message: str,
         conversation_id: str,
@@ -176,10 +402,16 @@ class PfadiChatService:
         
         messages = [{"role": "system", "content": system_prompt}]
         
-        # Add conversation history (limit to last 10 exchanges)
-        if conversation_id in self.conversation_memory:
-            history = self.conversation_memory[conversation_id][-20:]  # Last 20 messages
-            messages.extend(history)
+        # Older turns are represented by the rolling summary, newer ones verbatim
+        history = await self.store.get_messages(conversation_id, limit=settings.CONVERSATION_MAX_MESSAGES)
+        summary = await self.store.get_summary(conversation_id) if history else None
+        unsummarized = split_history(history, summary)
+        if conversation_summarizer.needs_summary(unsummarized):
+            conversation_summarizer.schedule(self.store, conversation_id, unsummarized, summary)
+        if summary:
+            messages.append(summary_message(summary))
+        recent = unsummarized[-settings.CONVERSATION_HISTORY_MESSAGES:]
+        messages.extend({"role": message["role"], "content": message["content"]} for message in recent)
         
         # Add current user message
         messages.append({"role": "user", "content": user_message})
@@ -209,6 +441,7 @@ VERHALTEN:
 - Biete konkrete, umsetzbare Vorschläge
 - Frage nach, wenn wichtige Informationen fehlen
 - Nutze die verfügbaren Funktionen, wenn passend
+- Belege Antworten aus der Wissensdatenbank mit den Quellennummern, z.B. [1]
 - Erkläre komplexe Konzepte altersgerecht
 
 KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niederösterreich und Wien."""
@@ -234,6 +467,29 @@ KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niede
     ) -> Dict[str, Any]:
         """Get response from Azure OpenAI with function calling."""
         
+        # A repeated knowledge question at the start of a conversation needs
+        # no completion at all. Later turns may depend on the history.
+        user_message = messages[-1]["content"]
+        first_turn = len(messages) == 2
+        if first_turn:
+            cached = await answer_cache.get(user_message, variant="message")
+            if cached:
+                return self._cached_response(cached)
+        
+        # A game request will most likely be answered with search_games
+        prefetch = game_search_prefetcher.start(user_message)
+        try:
+            return await self._complete_with_functions(messages, user_message, first_turn, prefetch)
+        finally:
+            game_search_prefetcher.finish(prefetch)
+    
+    async def _complete_with_functions(
+        self,
+        messages: List[Dict[str, Any]],
+        user_message: str,
+        first_turn: bool,
+        prefetch: Optional[PrefetchedSearch]
+    ) -> Dict[str, Any]:
         # Make API call with function definitions
         response = await azure_openai_service.chat_completion(
             messages=messages,
@@ -242,20 +498,16 @@ KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niede
         )
         
         # Handle function calls
-        if response.get("function_call"):
-            function_result = await self._execute_function_call(response["function_call"])
+        if response.get("tool_calls"):
+            knowledge_key = self._knowledge_cache_variant(response["tool_calls"])
+            if knowledge_key:
+                # The model's question is self-contained, so it is safe to match in any turn
+                question = knowledge_key[0]
+                cached = await answer_cache.get(question, variant=knowledge_key[1])
+                if cached:
+                    return self._cached_response(cached, response.get("usage"))
             
-            # Add function call and result to conversation
-            messages.append({
-                "role": "assistant",
-                "content": None,
-                "function_call": response["function_call"]
-            })
-            messages.append({
-                "role": "function",
-                "name": response["function_call"]["name"],
-                "content": json.dumps(function_result, ensure_ascii=False)
-            })
+            function_result, context_usage = await self._run_tool_calls(response["tool_calls"], messages, prefetch)
             
             # Get final response incorporating function result
             final_response = await azure_openai_service.chat_completion(
@@ -264,23 +516,190 @@ KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niede
             )
             
             final_response["function_data"] = function_result
+            if context_usage:
+                final_response.setdefault("usage", {}).update(context_usage)
+            
+            if knowledge_key and final_response.get("message") and not final_response.get("error"):
+                await self._cache_knowledge_answer(
+                    knowledge_key, user_message if first_turn else None,
+                    final_response["message"], function_result
+                )
             return final_response
         
         return response
     
-    async def _execute_function_call(self, function_call: Dict[str, str]) -> Dict[str, Any]:
-        """Execute a function call and return the result."""
+    async def _run_tool_calls(
+        self,
+        tool_calls: List[Dict[str, str]],
+        messages: List[Dict[str, Any]],
+        prefetch: Optional[PrefetchedSearch] = None
+    ) -> tuple:
+        """Execute the tool calls of one model turn concurrently and append calls and results to the messages."""
+        results = await self._collect_tool_results(tool_calls, self._start_tool_calls(tool_calls, prefetch))
+        return self._append_tool_results(tool_calls, results, messages)
+    
+    def _start_tool_calls(
+        self,
+        tool_calls: List[Dict[str, str]],
+        prefetch: Optional[PrefetchedSearch] = None
+    ) -> List[asyncio.Task]:
+        return [
+            asyncio.create_task(self._execute_function_call(tool_call, prefetch))
+            for tool_call in tool_calls
+        ]
+    
+    async def _collect_tool_results(
+        self,
+        tool_calls: List[Dict[str, str]],
+        tasks: List[asyncio.Task]
+    ) -> List[Dict[str, Any]]:
+        """Wait for the tool calls of one turn, all of them together bounded by CHAT_TOOL_TIMEOUT_SECONDS."""
+        if not tasks:
+            return []
+        _, pending = await asyncio.wait(tasks, timeout=settings.CHAT_TOOL_TIMEOUT_SECONDS)
+        results = []
+        for tool_call, task in zip(tool_calls, tasks):
+            if task in pending:
+                task.cancel()
+                logger.warning("Function call timed out", function=tool_call["name"])
+                results.append({"error": "Zeitüberschreitung bei der Ausführung"})
+            elif task.exception() is not None:
+                logger.error("Function call failed", function=tool_call["name"], error=str(task.exception()))
+                results.append({"error": str(task.exception())})
+            else:
+                results.append(task.result())
+        return results
+    
+    def _append_tool_results(
+        self,
+        tool_calls: List[Dict[str, str]],
+        results: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]]
+    ) -> tuple:
+        """
+        Append the assistant's tool calls and their compacted results to the messages.
+        
+        Returns:
+            (function data for the client, knowledge packing statistics or None)
+        """
+        messages.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": tool_call["id"],
+                    "type": "function",
+                    "function": {"name": tool_call["name"], "arguments": tool_call["arguments"]}
+                }
+                for tool_call in tool_calls
+            ]
+        })
+        function_data: Dict[str, Any] = {}
+        context_usage = None
+        for tool_call, result in zip(tool_calls, results):
+            # Packing statistics are reported in usage, not sent to the model
+            context_usage = result.pop("context_usage", None) or context_usage
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": json.dumps(self._compact_for_model(tool_call["name"], result), ensure_ascii=False, default=str)
+            })
+            # The functions return distinct keys (games, plan, context), so one dict serves the client
+            function_data.update(result)
+        return function_data, context_usage
+    
+    @staticmethod
+    def _compact_for_model(function_name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduce a function result to what the model needs to answer (ids, names, durations)."""
+        if result.get("error"):
+            return result
+        if function_name == "search_games":
+            return {
+                "games": [
+                    {
+                        "id": game["gameId"],
+                        "name": game["name"],
+                        "duration_minutes": game["durationMinutes"],
+                        "participants": f"{game['minParticipants']}-{game['maxParticipants']}",
+                        "location": game["location"],
+                    }
+                    for game in result["games"]
+                ],
+                "total_found": result["total_found"],
+            }
+        if function_name == "create_heimstunde_plan":
+            return {
+                "plan_id": result["plan_id"],
+                "title": result["title"],
+                "duration": result["duration"],
+                "schedule": [
+                    {
+                        "start_time": item["start_time"],
+                        "duration": item["duration"],
+                        "activity": item["activity_name"],
+                        **({"game_id": item["game_id"]} if item.get("game_id") else {}),
+                    }
+                    for item in result["schedule"]
+                ],
+                "material_list": result["material_list"],
+            }
+        return result
+    
+    async def _cache_knowledge_answer(
+        self,
+        knowledge_key: tuple,
+        first_turn_message: Optional[str],
+        message: str,
+        function_result: Dict[str, Any]
+    ) -> None:
+        """Store a knowledge answer under the model's question (and the first-turn message)."""
+        answer = {"message": message, "function_data": function_result}
+        await answer_cache.put(knowledge_key[0], answer, variant=knowledge_key[1])
+        if first_turn_message:
+            await answer_cache.put(first_turn_message, answer, variant="message")
+    
+    @staticmethod
+    def _knowledge_cache_variant(tool_calls: List[Dict[str, str]]) -> Optional[tuple]:
+        """(question, cache variant) if the turn is a single knowledge function call, else None."""
+        if len(tool_calls) != 1 or tool_calls[0].get("name") != "get_pfadfinder_knowledge":
+            return None
+        function_call = tool_calls[0]
+        try:
+            arguments = json.loads(function_call.get("arguments") or "{}")
+        except json.JSONDecodeError:
+            return None
+        if not arguments.get("question"):
+            return None
+        return arguments["question"], f"knowledge:{bool(arguments.get('age_appropriate'))}"
+    
+    @staticmethod
+    def _cached_response(cached: Dict[str, Any], usage: Optional[Dict] = None) -> Dict[str, Any]:
+        """Build a chat response from a cached knowledge answer."""
+        usage = usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        return {
+            "message": cached["message"],
+            "role": "assistant",
+            "function_data": cached["function_data"],
+            "usage": {**usage, "cached": True},
+        }
+    
+    async def _execute_function_call(
+        self,
+        function_call: Dict[str, str],
+        prefetch: Optional[PrefetchedSearch] = None
+    ) -> Dict[str, Any]:
+        """Execute a function call and return the result (search_games may use the turn's prefetch)."""
         
         function_name = function_call["name"]
         try:
-            arguments = json.loads(function_call["arguments"])
+            arguments = json.loads(function_call["arguments"] or "{}")
         except json.JSONDecodeError:
             return {"error": "Invalid function arguments"}
         
         logger.info("Executing function call", function=function_name, arguments=arguments)
         
         if function_name == "search_games":
-            return await self._search_games(**arguments)
+            return await self._search_games(prefetch=prefetch, **arguments)
         elif function_name == "create_heimstunde_plan":
             return await self._create_heimstunde_plan(**arguments)
         elif function_name == "get_pfadfinder_knowledge":
@@ -288,94 +707,116 @@ KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niede
         else:
             return {"error": f"Unknown function: {function_name}"}
     
-    async def _search_games(self, query: str, **filters) -> Dict[str, Any]:
-        """Mock implementation of game search."""
-        # TODO: Integrate with actual game search service
+    async def _search_games(
+        self,
+        query: str,
+        duration_max: Optional[int] = None,
+        participant_count: Optional[int] = None,
+        location: Optional[str] = None,
+        age_group: Optional[str] = None,
+        prefetch: Optional[PrefetchedSearch] = None
+    ) -> Dict[str, Any]:
+        """Search games with the game search service, or serve them from a matching prefetch."""
+        filters = {
+            "duration_max": duration_max,
+            "participant_count": participant_count,
+            "location": location if location in ("indoor", "outdoor") else None,
+            "age_group": age_group,
+        }
+        result = await game_search_prefetcher.take(
+            prefetch, query, limit=settings.CHAT_TOOL_MAX_GAMES, **filters
+        )
+        if result is None:
+            result = await game_search_service.search_games(
+                query=query,
+                limit=settings.CHAT_TOOL_MAX_GAMES,
+                **filters
+            )
         return {
             "games": [
-                {
-                    "name": "Vertrauenskreis",
-                    "description": "Spiel zum Aufbau von Vertrauen in der Gruppe",
-                    "duration_minutes": 15,
-                    "participants": "8-15",
-                    "location": "both",
-                    "tags": ["vertrauen", "teambuilding"]
-                }
+                {key: value for key, value in game.items() if key != "embedding"}
+                for game in result["games"]
             ],
             "query": query,
-            "filters_applied": filters,
-            "total_found": 1
+            "search_type": result["search_type"],
+            "filters_applied": result["filters_applied"],
+            "total_found": result["total_found"]
         }
     
-    async def _create_heimstunde_plan(self, **plan_data) -> Dict[str, Any]:
-        """Mock implementation of heimstunde planning."""
-        # TODO: Integrate with actual planning service
-        return {
-            "plan_id": str(uuid.uuid4()),
-            "title": f"Heimstunde: {plan_data.get('theme', 'Allgemein')}",
-            "duration": plan_data.get("duration", 90),
-            "structure": [
-                {"time": "19:00", "activity": "Begrüßung", "duration": 10},
-                {"time": "19:10", "activity": "Hauptaktivität", "duration": 50},
-                {"time": "20:00", "activity": "Reflexion", "duration": 20},
-                {"time": "20:20", "activity": "Abschluss", "duration": 10}
-            ],
-            "materials": ["Je nach gewählten Aktivitäten"],
-            "notes": "Plan an Gruppengröße anpassen"
-        }
+    async def _create_heimstunde_plan(
+        self,
+        duration: int = 90,
+        participant_count: int = 12,
+        theme: Optional[str] = None,
+        location: str = "flexible",
+        pedagogical_goals: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Create a Heimstunde plan with the planning service."""
+        return await planning_service.create_heimstunde_plan(
+            duration=duration,
+            participant_count=participant_count,
+            theme=theme,
+            location=location,
+            pedagogical_goals=pedagogical_goals
+        )
     
     async def _get_pfadfinder_knowledge(self, question: str, age_appropriate: bool = False) -> Dict[str, Any]:
-        """Mock implementation of Pfadfinder knowledge."""
-        # TODO: Integrate with RAG system and knowledge base
-        knowledge_responses = {
-            "pfadfindergesetze": "Die Pfadfindergesetze sind die Grundregeln unseres Zusammenlebens...",
-            "allzeit bereit": "'Allzeit bereit' ist unser Wahlspruch und bedeutet...",
-            "pfadfindergruß": "Der Pfadfindergruß wird mit drei Fingern gemacht..."
-        }
-        
-        # Simple keyword matching for demo
-        response = "Das ist eine interessante Frage zum Pfadfinderwissen. Für detaillierte Antworten benötige ich Zugang zur Wissensdatenbank."
-        for keyword, answer in knowledge_responses.items():
-            if keyword in question.lower():
-                response = answer
-                break
+        """Retrieve relevant passages from the knowledge base, packed under a token budget."""
+        passages = await knowledge_base_service.search(
+            question,
+            top_k=settings.KNOWLEDGE_CANDIDATES,
+            with_vectors=True
+        )
+        if not passages:
+            return {
+                "context": "Dazu habe ich in der Wissensdatenbank leider nichts gefunden.",
+                "citations": [],
+                "age_appropriate": age_appropriate
+            }
         
+        packed = context_packer.pack(passages)
         return {
-            "answer": response,
-            "sources": ["Pfadfinder Grundlagen"],
-            "age_appropriate": age_appropriate
+            "context": packed["context"],
+            "citations": packed["citations"],
+            "age_appropriate": age_appropriate,
+            "context_usage": packed["usage"]
         }
     
     def _get_fallback_response(self, user_message: str) -> Dict[str, Any]:
         """Generate fallback response when AI is not available."""
         return azure_openai_service._get_mock_response(user_message)
     
-    def _update_conversation_memory(
+    async def _update_conversation_memory(
         self,
         conversation_id: str,
         user_message: str,
-        response: Dict[str, Any]
+        response: Dict[str, Any],
+        received_at: Optional[str] = None
     ) -> None:
         """Update conversation memory with the latest exchange."""
         
-        if conversation_id not in self.conversation_memory:
-            self.conversation_memory[conversation_id] = []
-        
-        # Add user message
-        self.conversation_memory[conversation_id].append({
-            "role": "user",
-            "content": user_message
-        })
+        await self.store.append_messages(conversation_id, [
+            {"role": "user", "content": user_message, "timestamp": received_at},
+            {"role": "assistant", "content": response.get("message", "")}
+        ])
+    
+    @staticmethod
+    def _reference_payload(function_data: Optional[Dict[str, Any]]) -> tuple:
+        """
+        Split function data into an id-based payload and a side table of full objects.
         
-        # Add assistant response
-        self.conversation_memory[conversation_id].append({
-            "role": "assistant", 
-            "content": response.get("message", "")
-        })
+        Games are referenced by ID in the data ("game_ids") and in suggested
+        actions, so each game object is serialized once per response, under
+        references["games"]. Clients fetch other games via /games/batch.
         
-        # Keep only last 50 messages to prevent memory issues
-        if len(self.conversation_memory[conversation_id]) > 50:
-            self.conversation_memory[conversation_id] = self.conversation_memory[conversation_id][-50:]
+        Returns:
+            (data, references)
+        """
+        if not function_data or "games" not in function_data:
+            return function_data, {}
+        data = {key: value for key, value in function_data.items() if key != "games"}
+        data["game_ids"] = [game["gameId"] for game in function_data["games"]]
+        return data, {"games": {game["gameId"]: game for game in function_data["games"]}}
     
     def _generate_suggested_actions(
         self,
@@ -390,17 +831,18 @@ KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niede
         if response.get("function_data"):
             data = response["function_data"]
             
-            if "games" in data:
+            if data.get("games"):
+                game_ids = [game["gameId"] for game in data["games"]]
                 actions.extend([
                     {
                         "text": "📋 Heimstunde mit diesen Spielen planen",
                         "action": "create_plan",
-                        "data": {"suggested_games": data["games"]}
+                        "data": {"game_ids": game_ids}
                     },
                     {
                         "text": "🔍 Ähnliche Spiele suchen",
                         "action": "search_similar",
-                        "data": {"reference_games": data["games"][:2]}
+                        "data": {"game_ids": game_ids[:2]}
                     }
                 ])
             
@@ -419,10 +861,8 @@ KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niede
                 ])
         
         # General actions based on message content
-        message_lower = user_message.lower()
-        
         if not actions:  # Only add general actions if no specific ones
-            if any(word in message_lower for word in ["spiel", "aktivität"]):
+            if looks_like_game_request(user_message):
                 actions.append({
                     "text": "🎯 Spiele suchen",
                     "action": "search_games",
@@ -444,16 +884,13 @@ KONTEXT: Du hilfst bei der Arbeit mit Guides und Spähern (10-13 Jahre) in Niede
         
         return actions[:4]  # Limit to 4 suggestions
     
-    def get_conversation_history(self, conversation_id: str) -> List[Dict[str, str]]:
+    async def get_conversation_history(self, conversation_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a given conversation ID."""
-        return self.conversation_memory.get(conversation_id, [])
+        return await self.store.get_messages(conversation_id)
     
-    def clear_conversation(self, conversation_id: str) -> bool:
+    async def clear_conversation(self, conversation_id: str) -> bool:
         """Clear conversation history for a given conversation ID."""
-        if conversation_id in self.conversation_memory:
-            del self.conversation_memory[conversation_id]
-            return True
-        return False
+        return await self.store.delete(conversation_id)
 
 
 # Global service instance
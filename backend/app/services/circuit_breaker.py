@@ -0,0 +1,164 @@
+"""
+Circuit breakers for Azure OpenAI deployments.
+
+Each deployment gets a breaker that watches the outcome of its recent
+calls. When too many of them fail or are too slow, the breaker opens and
+callers go straight to their local fallbacks (mock answers, text search)
+instead of waiting for timeouts. After a cool-down a few probe calls are let
+through (half-open); if they succeed the breaker closes again.
+
+Callers report one outcome per logical call, after any retries, and only
+failures of the service itself (5xx, timeouts, connection errors) count:
+a throttled or rejected request says nothing about the deployment's health.
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a rolling window of call outcomes."""
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_seconds: float,
+        failure_rate: Optional[float] = None,
+        window_size: Optional[int] = None,
+        min_calls: Optional[int] = None,
+        open_seconds: Optional[float] = None,
+        half_open_calls: Optional[int] = None
+    ):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.failure_rate = failure_rate or settings.CIRCUIT_FAILURE_RATE
+        self.min_calls = min_calls or settings.CIRCUIT_MIN_CALLS
+        self.open_seconds = open_seconds or settings.CIRCUIT_OPEN_SECONDS
+        self.half_open_calls = half_open_calls or settings.CIRCUIT_HALF_OPEN_CALLS
+        # True for every failed or slow call
+        self._outcomes: Deque[bool] = deque(maxlen=window_size or settings.CIRCUIT_WINDOW_SIZE)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.stats = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "trips": 0}
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now. Refused calls should use their fallback."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.stats["rejected"] += 1
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_calls:
+                self.stats["rejected"] += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def is_open(self) -> bool:
+        """Open and still cooling down (does not count as a rejected call)."""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.open_seconds
+
+    def record_success(self, latency_seconds: float) -> None:
+        slow = latency_seconds > self.slow_call_seconds
+        self.stats["calls"] += 1
+        if slow:
+            self.stats["slow_calls"] += 1
+        self._record(bad=slow)
+
+    def record_failure(self) -> None:
+        self.stats["calls"] += 1
+        self.stats["failures"] += 1
+        self._record(bad=True)
+
+    def abandon(self) -> None:
+        """A permitted call ended without an outcome (e.g. it was cancelled)."""
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _record(self, bad: bool) -> None:
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if bad:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(CLOSED)
+            return
+
+        self._outcomes.append(bad)
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning("Circuit breaker state change", circuit=self.name, old=self.state, new=state)
+        self.state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.stats["trips"] += 1
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        bad = sum(self._outcomes)
+        status = {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failure_rate": round(bad / len(self._outcomes), 3) if self._outcomes else 0.0,
+            **self.stats,
+        }
+        if self.state == OPEN:
+            status["retry_in_seconds"] = round(
+                max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)), 1
+            )
+        return status
+
+
+class CircuitBreakerRegistry:
+    """One breaker per Azure deployment."""
+
+    def __init__(self):
+        """Initialize the registry."""
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, deployment: str) -> CircuitBreaker:
+        if deployment not in self.breakers:
+            slow_seconds = (
+                settings.CIRCUIT_EMBEDDING_SLOW_SECONDS
+                if deployment == settings.AZURE_EMBEDDING_DEPLOYMENT_NAME
+                else settings.CIRCUIT_CHAT_SLOW_SECONDS
+            )
+            self.breakers[deployment] = CircuitBreaker(deployment, slow_seconds)
+        return self.breakers[deployment]
+
+    def any_open(self) -> bool:
+        return any(breaker.is_open() for breaker in self.breakers.values())
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.get_status() for name, breaker in self.breakers.items()}
+
+
+# Global registry instance
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,127 @@
+"""
+Token-budgeted context packing for retrieval-augmented answers.
+
+Retrieved chunks overlap heavily (neighbouring chunks share their overlap,
+mirrored pages share whole paragraphs). Instead of appending all of them to
+the prompt, the packer greedily selects chunks by maximal marginal relevance
+(relevance to the question minus similarity to chunks already selected)
+until the token budget is used up, and replaces full source metadata with
+short numbered citations.
+"""
+
+from typing import Any, Dict, List, Optional
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.services.text_processing import estimate_tokens
+
+logger = structlog.get_logger()
+
+
+class ContextPacker:
+    """Selects non-redundant passages under a prompt token budget."""
+
+    def __init__(self, mmr_lambda: Optional[float] = None):
+        """Initialize the context packer."""
+        self.mmr_lambda = settings.KNOWLEDGE_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+
+    @staticmethod
+    def _format_passage(number: int, passage: Dict[str, Any]) -> str:
+        label = " › ".join(part for part in (passage.get("title"), passage.get("heading")) if part)
+        return f"[{number}] {label}: {passage['text']}" if label else f"[{number}] {passage['text']}"
+
+    @staticmethod
+    def _truncate(text: str, max_tokens: int) -> str:
+        """Cut a text at a word boundary so it fits into max_tokens."""
+        words = text.split()
+        kept: List[str] = []
+        used = 0
+        for word in words:
+            cost = estimate_tokens(word)
+            if used + cost > max_tokens:
+                break
+            kept.append(word)
+            used += cost
+        return " ".join(kept) + (" …" if len(kept) < len(words) else "")
+
+    def pack(
+        self,
+        passages: List[Dict[str, Any]],
+        budget_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Pack retrieved passages into a compact, cited context block.
+
+        Args:
+            passages: Knowledge base results, best first, with "score" and "vector"
+            budget_tokens: Token budget for the context (defaults to KNOWLEDGE_CONTEXT_TOKENS)
+
+        Returns:
+            Dict with the context text, citations and token usage
+        """
+        budget = budget_tokens or settings.KNOWLEDGE_CONTEXT_TOKENS
+        # What appending every passage with its full metadata would have cost
+        candidate_tokens = sum(
+            estimate_tokens(passage["text"]) + estimate_tokens(passage.get("title") or "")
+            + estimate_tokens(passage.get("source_url") or passage.get("source_path") or "")
+            for passage in passages
+        )
+
+        vectors = [passage.get("vector") for passage in passages]
+        remaining = list(range(len(passages)))
+        selected: List[int] = []
+        blocks: List[str] = []
+        used = 0
+
+        while remaining:
+            best, best_value = None, -np.inf
+            for index in remaining:
+                similarities = [
+                    float(np.dot(vectors[index], vectors[other]))
+                    for other in selected
+                    if vectors[index] is not None and vectors[other] is not None
+                ]
+                redundancy = max(similarities, default=0.0)
+                value = (
+                    self.mmr_lambda * passages[index]["score"]
+                    - (1 - self.mmr_lambda) * redundancy
+                )
+                if value > best_value:
+                    best, best_value = index, value
+            remaining.remove(best)
+
+            block = self._format_passage(len(selected) + 1, passages[best])
+            cost = estimate_tokens(block)
+            if used + cost > budget:
+                if selected:
+                    # Skip it; a shorter, less relevant passage may still fit
+                    continue
+                # Never return an empty context: trim the best passage instead
+                block = self._truncate(block, budget)
+                cost = estimate_tokens(block)
+            selected.append(best)
+            blocks.append(block)
+            used += cost
+
+        citations = [
+            {
+                "id": number,
+                "title": passages[index].get("title"),
+                "source": passages[index].get("source_url") or passages[index].get("source_path"),
+            }
+            for number, index in enumerate(selected, start=1)
+        ]
+        usage = {
+            "context_tokens": used,
+            "candidate_tokens": candidate_tokens,
+            "tokens_saved": max(0, candidate_tokens - used),
+            "passages_used": len(selected),
+            "passages_retrieved": len(passages),
+        }
+        logger.debug("Context packed", **usage)
+        return {"context": "\n\n".join(blocks), "citations": citations, "usage": usage}
+
+
+# Global packer instance
+context_packer = ContextPacker()
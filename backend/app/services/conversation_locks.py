@@ -0,0 +1,87 @@
+"""
+Per-conversation serialization of chat turns.
+
+A turn reads the history, waits for the model and then appends the exchange.
+Two turns of the same conversation that overlap (double submits, quick
+follow-ups) would both read the old history and one exchange would be
+missing from the other's context. Each conversation therefore gets its own
+FIFO lock: turns of one conversation run one after another in arrival
+order, while different conversations never wait for each other. Locks are
+created on first use and dropped as soon as no turn holds or awaits them, so
+idle conversations cost nothing.
+
+The locks live in the worker process. With several workers sharing
+conversations through Redis, a conversation's turns are only serialized
+within each worker.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+
+class _ConversationLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Turns holding or waiting for the lock
+        self.users = 0
+
+
+class ConversationLockManager:
+    """Lazily created, self-removing locks keyed by conversation ID."""
+
+    def __init__(self):
+        """Initialize the lock manager."""
+        self._locks: Dict[str, _ConversationLock] = {}
+        self.stats = {
+            "turns": 0,
+            "contended": 0,
+            "wait_ms_sum": 0.0,
+            "wait_ms_max": 0.0,
+            "max_queued": 0,
+        }
+
+    @asynccontextmanager
+    async def hold(self, conversation_id: str) -> AsyncIterator[None]:
+        """
+        Run the enclosed turn exclusively for its conversation.
+
+        Args:
+            conversation_id: Conversation the turn belongs to
+        """
+        entry = self._locks.get(conversation_id)
+        if entry is None:
+            entry = self._locks[conversation_id] = _ConversationLock()
+        entry.users += 1
+        self.stats["turns"] += 1
+        contended = entry.lock.locked()
+        if contended:
+            self.stats["contended"] += 1
+            self.stats["max_queued"] = max(self.stats["max_queued"], entry.users - 1)
+        started = time.perf_counter()
+        try:
+            async with entry.lock:
+                if contended:
+                    wait_ms = (time.perf_counter() - started) * 1000
+                    self.stats["wait_ms_sum"] += wait_ms
+                    self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[conversation_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        contended = self.stats["contended"]
+        return {
+            **self.stats,
+            "active": len(self._locks),
+            "wait_ms_avg": self.stats["wait_ms_sum"] / contended if contended else 0.0,
+        }
+
+
+# Global lock manager instance
+conversation_locks = ConversationLockManager()
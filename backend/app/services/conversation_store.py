@@ -0,0 +1,610 @@
+"""
+Conversation store for the chat service.
+
+Chat history used to live in a plain dict that gained a key for every new
+conversation and never lost one. The store interface below keeps chat
+history behind async methods so that other backends can be plugged in; the
+in-memory implementation bounds itself by conversation count, idle time and
+an approximate byte budget, evicting least recently used conversations first.
+The SQLite implementation persists every message with its timestamp and
+uses the in-memory store as a cache in front of the database. The Redis
+implementation shares conversations between all workers.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import structlog
+
+from app.core.config import settings
+from app.core.database import connect, sqlite_path
+from app.core.redis_client import InProcessRedis, create_redis_client
+
+logger = structlog.get_logger()
+
+# Rough per-message overhead of the dict and its strings in CPython
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def message_size(message: Dict[str, Any]) -> int:
+    """Approximate memory footprint of one stored message in bytes."""
+    return MESSAGE_OVERHEAD_BYTES + len((message.get("content") or "").encode("utf-8"))
+
+
+def stamp_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of the messages with a UTC ISO timestamp and a unique id (existing ones are kept)."""
+    now = datetime.utcnow().isoformat()
+    return [
+        {**message, "timestamp": message.get("timestamp") or now, "id": message.get("id") or uuid.uuid4().hex}
+        for message in messages
+    ]
+
+
+class ConversationStore(ABC):
+    """Storage for chat messages, keyed by conversation ID."""
+
+    @abstractmethod
+    async def get_messages(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get the messages of a conversation, oldest first.
+
+        Args:
+            conversation_id: Conversation to read
+            limit: Only return the most recent messages
+
+        Returns:
+            List of {"role", "content", "timestamp", "id"} dicts, empty for unknown conversations
+        """
+
+    @abstractmethod
+    async def append_messages(self, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Append messages, creating the conversation if needed."""
+
+    @abstractmethod
+    async def delete(self, conversation_id: str) -> bool:
+        """Delete a conversation. Returns False if it did not exist."""
+
+    @abstractmethod
+    async def get_summary(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the rolling summary of a conversation's older messages.
+
+        Returns:
+            {"text", "until", "until_id"} where until and until_id are the
+            timestamp and id of the last summarized message, or None if
+            there is no summary yet
+        """
+
+    @abstractmethod
+    async def set_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        """Replace the rolling summary of a conversation."""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Size and eviction metrics."""
+
+    async def close(self) -> None:
+        """Release resources held by the store."""
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Bounded in-process store with LRU, idle TTL and byte budget eviction."""
+
+    def __init__(
+        self,
+        max_conversations: Optional[int] = None,
+        idle_ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        max_messages: Optional[int] = None
+    ):
+        """Initialize the store."""
+        self.max_conversations = max_conversations or settings.CONVERSATION_MAX_COUNT
+        self.idle_ttl = idle_ttl_seconds or settings.CONVERSATION_IDLE_TTL_SECONDS
+        self.max_bytes = max_bytes or settings.CONVERSATION_MAX_BYTES
+        self.max_messages = max_messages or settings.CONVERSATION_MAX_MESSAGES
+        # conversation_id -> {"messages", "bytes", "last_access"}, least recently used first
+        self.conversations: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {
+            "created": 0,
+            "deleted": 0,
+            "evicted_lru": 0,
+            "evicted_idle": 0,
+            "evicted_bytes": 0,
+        }
+
+    def _touch(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a live conversation and mark it as most recently used."""
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        now = time.monotonic()
+        if now - conversation["last_access"] > self.idle_ttl:
+            self._remove(conversation_id)
+            self.stats["evicted_idle"] += 1
+            return None
+        conversation["last_access"] = now
+        self.conversations.move_to_end(conversation_id)
+        return conversation
+
+    def _remove(self, conversation_id: str) -> None:
+        conversation = self.conversations.pop(conversation_id)
+        self.total_bytes -= conversation["bytes"]
+
+    def _evict(self) -> None:
+        """Drop idle conversations, then the least recently used ones until within limits."""
+        now = time.monotonic()
+        # Recency order means all idle conversations sit at the front
+        while self.conversations:
+            oldest_id, oldest = next(iter(self.conversations.items()))
+            if now - oldest["last_access"] <= self.idle_ttl:
+                break
+            self._remove(oldest_id)
+            self.stats["evicted_idle"] += 1
+
+        while len(self.conversations) > self.max_conversations:
+            self._remove(next(iter(self.conversations)))
+            self.stats["evicted_lru"] += 1
+
+        # Never evict the conversation that was just written
+        while self.total_bytes > self.max_bytes and len(self.conversations) > 1:
+            self._remove(next(iter(self.conversations)))
+            self.stats["evicted_bytes"] += 1
+
+    def contains(self, conversation_id: str) -> bool:
+        return self._touch(conversation_id) is not None
+
+    async def get_messages(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        conversation = self._touch(conversation_id)
+        if conversation is None:
+            return []
+        messages = conversation["messages"]
+        return list(messages[-limit:] if limit else messages)
+
+    async def append_messages(self, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        messages = stamp_messages(messages)
+        conversation = self._touch(conversation_id)
+        if conversation is None:
+            conversation = {"messages": [], "bytes": 0, "last_access": time.monotonic()}
+            self.conversations[conversation_id] = conversation
+            self.stats["created"] += 1
+
+        stored = conversation["messages"]
+        stored.extend(messages)
+        added = sum(message_size(message) for message in messages)
+        if len(stored) > self.max_messages:
+            dropped = stored[:-self.max_messages]
+            del stored[:-self.max_messages]
+            added -= sum(message_size(message) for message in dropped)
+        conversation["bytes"] += added
+        self.total_bytes += added
+        self._evict()
+
+    async def delete(self, conversation_id: str) -> bool:
+        if conversation_id not in self.conversations:
+            return False
+        self._remove(conversation_id)
+        self.stats["deleted"] += 1
+        return True
+
+    async def get_summary(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        conversation = self._touch(conversation_id)
+        return conversation.get("summary") if conversation else None
+
+    async def set_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        conversation = self._touch(conversation_id)
+        if conversation is None:
+            return
+        previous = conversation.get("summary")
+        change = message_size({"content": summary["text"]}) - (
+            message_size({"content": previous["text"]}) if previous else 0
+        )
+        conversation["summary"] = summary
+        conversation["bytes"] += change
+        self.total_bytes += change
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "conversations": len(self.conversations),
+            "approx_bytes": self.total_bytes,
+            "max_conversations": self.max_conversations,
+            "max_bytes": self.max_bytes,
+            "idle_ttl_seconds": self.idle_ttl,
+            **self.stats,
+        }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Conversations persisted in SQLite with write-behind batching.
+
+    Recently used conversations are served from a bounded in-memory cache,
+    so the chat path neither reads nor writes the database for an active
+    conversation. New messages are queued and written by a background task
+    in one transaction per flush interval.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        flush_interval_ms: Optional[float] = None,
+        cache: Optional[InMemoryConversationStore] = None
+    ):
+        """Initialize the store. The database is opened on first use."""
+        self.path = path or sqlite_path()
+        interval_ms = flush_interval_ms if flush_interval_ms is not None else settings.CONVERSATION_FLUSH_INTERVAL_MS
+        self.flush_interval = interval_ms / 1000
+        self.cache = cache or InMemoryConversationStore()
+        # One connection per executor thread; WAL lets them read concurrently
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Messages waiting for the writer, and per conversation how many are not yet committed
+        self._pending: List[Tuple[str, Dict[str, Any]]] = []
+        self._unflushed: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._writer_task: Optional[asyncio.Task] = None
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "flushes": 0,
+            "write_errors": 0,
+            "cache_misses": 0,
+            "total_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect(self.path, check_same_thread=False)
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation
+                    ON chat_messages (conversation_id, id);
+                CREATE TABLE IF NOT EXISTS chat_summaries (
+                    conversation_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    until TEXT NOT NULL
+                );
+            """)
+            # Columns added after the tables were first created
+            for table, column in (("chat_messages", "message_id"), ("chat_summaries", "until_id")):
+                columns = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    with connection:
+                        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _read(self, conversation_id: str, limit: Optional[int]) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT role, content, created_at, message_id FROM chat_messages WHERE conversation_id = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (conversation_id, limit if limit else -1)
+        ).fetchall()
+        return [
+            {"role": row["role"], "content": row["content"], "timestamp": row["created_at"], "id": row["message_id"]}
+            for row in reversed(rows)
+        ]
+
+    def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO chat_messages (conversation_id, role, content, created_at, message_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        conversation_id,
+                        message["role"],
+                        message.get("content") or "",
+                        message["timestamp"],
+                        message.get("id"),
+                    )
+                    for conversation_id, message in batch
+                ]
+            )
+
+    def _read_summary(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT summary, until, until_id FROM chat_summaries WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return {"text": row["summary"], "until": row["until"], "until_id": row["until_id"]} if row else None
+
+    def _write_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO chat_summaries (conversation_id, summary, until, until_id) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (conversation_id) DO UPDATE SET "
+                "summary = excluded.summary, until = excluded.until, until_id = excluded.until_id",
+                (conversation_id, summary["text"], summary["until"], summary.get("until_id"))
+            )
+
+    def _delete(self, conversation_id: str) -> int:
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM chat_summaries WHERE conversation_id = ?", (conversation_id,))
+            return connection.execute(
+                "DELETE FROM chat_messages WHERE conversation_id = ?", (conversation_id,)
+            ).rowcount
+
+    async def _load(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Read from the database once queued messages of the conversation are written."""
+        if conversation_id in self._unflushed:
+            await self.flush()
+        return await asyncio.to_thread(self._read, conversation_id, limit)
+
+    async def get_messages(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        cache_size = self.cache.max_messages
+        if not limit or limit > cache_size:
+            # Full histories are not cached
+            return await self._load(conversation_id, limit)
+
+        if not self.cache.contains(conversation_id):
+            self.stats["cache_misses"] += 1
+            recent = await self._load(conversation_id, cache_size)
+            summary = await asyncio.to_thread(self._read_summary, conversation_id)
+            if not self.cache.contains(conversation_id):
+                await self.cache.append_messages(conversation_id, recent)
+                if summary:
+                    await self.cache.set_summary(conversation_id, summary)
+        return await self.cache.get_messages(conversation_id, limit)
+
+    async def append_messages(self, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        messages = stamp_messages(messages)
+        if not self.cache.contains(conversation_id):
+            # Load the stored tail first so the cache holds the whole recent history
+            await self.get_messages(conversation_id, limit=self.cache.max_messages)
+        await self.cache.append_messages(conversation_id, messages)
+
+        self._pending.extend((conversation_id, message) for message in messages)
+        self._unflushed[conversation_id] = self._unflushed.get(conversation_id, 0) + len(messages)
+        self.stats["queued"] += len(messages)
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._write_loop())
+        self._wakeup.set()
+
+    async def _write_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Let further messages join the batch
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            # A flush interrupted by close() would lose track of its batch
+            await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        """Write all queued messages in one transaction."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                # Keep the messages queued, they are retried with the next flush
+                self._pending[:0] = batch
+                self.stats["write_errors"] += 1
+                logger.error("Writing chat messages failed", error=str(e), messages=len(batch))
+                return
+
+            flush_ms = (time.perf_counter() - started) * 1000
+            self.stats["flushes"] += 1
+            self.stats["written"] += len(batch)
+            self.stats["total_flush_ms"] += flush_ms
+            self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], flush_ms)
+            for conversation_id, _ in batch:
+                self._unflushed[conversation_id] -= 1
+                if not self._unflushed[conversation_id]:
+                    del self._unflushed[conversation_id]
+
+    async def get_summary(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        if self.cache.contains(conversation_id):
+            return await self.cache.get_summary(conversation_id)
+        return await asyncio.to_thread(self._read_summary, conversation_id)
+
+    async def set_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        # Summaries are rare, they are written through
+        await asyncio.to_thread(self._write_summary, conversation_id, summary)
+        await self.cache.set_summary(conversation_id, summary)
+
+    async def delete(self, conversation_id: str) -> bool:
+        if conversation_id in self._unflushed:
+            await self.flush()
+        cached = await self.cache.delete(conversation_id)
+        deleted_rows = await asyncio.to_thread(self._delete, conversation_id)
+        return cached or deleted_rows > 0
+
+    async def close(self) -> None:
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            self._writer_task = None
+        await self.flush()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        flushes = self.stats["flushes"]
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "pending_writes": len(self._pending),
+            **self.stats,
+            "total_flush_ms": round(self.stats["total_flush_ms"], 3),
+            "max_flush_ms": round(self.stats["max_flush_ms"], 3),
+            "avg_flush_ms": round(self.stats["total_flush_ms"] / flushes, 3) if flushes else 0.0,
+            "avg_batch_size": round(self.stats["written"] / flushes, 2) if flushes else 0.0,
+            "cache": self.cache.get_stats(),
+        }
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    Conversations shared by all workers through Redis.
+
+    Every conversation is a capped Redis list of JSON messages plus a version
+    counter. Appends push, trim, bump the version and refresh the expiry in
+    one MULTI/EXEC pipeline, so the messages of an exchange stay together
+    and all workers see appends in the same order. Reads go through a local
+    cache that is only trusted while its version matches the one in Redis.
+    """
+
+    def __init__(self, client: Any = None, cache_size: Optional[int] = None):
+        """Initialize the store."""
+        self.client = client if client is not None else create_redis_client()
+        self.max_messages = settings.CONVERSATION_MAX_MESSAGES
+        self.ttl = int(settings.CONVERSATION_IDLE_TTL_SECONDS)
+        self.cache_size = cache_size or settings.CONVERSATION_LOCAL_CACHE_SIZE
+        # conversation_id -> (version, messages), least recently used first
+        self._cache: "OrderedDict[str, Tuple[int, List[Dict[str, Any]]]]" = OrderedDict()
+        self.stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "appends": 0,
+            "deleted": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def _keys(conversation_id: str) -> Tuple[str, str]:
+        return f"chat:{conversation_id}:messages", f"chat:{conversation_id}:version"
+
+    def _remember(self, conversation_id: str, version: int, messages: List[Dict[str, Any]]) -> None:
+        self._cache[conversation_id] = (version, messages)
+        self._cache.move_to_end(conversation_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def get_messages(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        messages_key, version_key = self._keys(conversation_id)
+        try:
+            version = int(await self.client.get(version_key) or 0)
+            cached = self._cache.get(conversation_id)
+            if cached and cached[0] == version:
+                self.stats["cache_hits"] += 1
+                self._cache.move_to_end(conversation_id)
+                messages = cached[1]
+            else:
+                self.stats["cache_misses"] += 1
+                async with self.client.pipeline(transaction=True) as pipe:
+                    pipe.get(version_key)
+                    pipe.lrange(messages_key, 0, -1)
+                    raw_version, raw_messages = await pipe.execute()
+                version = int(raw_version or 0)
+                messages = [json.loads(raw) for raw in raw_messages]
+                if version:
+                    self._remember(conversation_id, version, messages)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("Reading conversation from Redis failed", conversation_id=conversation_id, error=str(e))
+            return []
+        return list(messages[-limit:] if limit else messages)
+
+    async def append_messages(self, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        messages = stamp_messages(messages)
+        messages_key, version_key = self._keys(conversation_id)
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.rpush(messages_key, *(json.dumps(message, ensure_ascii=False) for message in messages))
+                pipe.ltrim(messages_key, -self.max_messages, -1)
+                pipe.incr(version_key)
+                pipe.expire(messages_key, self.ttl)
+                pipe.expire(version_key, self.ttl)
+                results = await pipe.execute()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("Writing conversation to Redis failed", conversation_id=conversation_id, error=str(e))
+            return
+        self.stats["appends"] += 1
+
+        version = int(results[2])
+        cached = self._cache.get(conversation_id)
+        if cached and cached[0] == version - 1:
+            # Nobody else appended in between, the cached copy can be extended
+            self._remember(conversation_id, version, (cached[1] + messages)[-self.max_messages:])
+        else:
+            self._cache.pop(conversation_id, None)
+
+    async def get_summary(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self.client.get(f"chat:{conversation_id}:summary")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("Reading conversation summary from Redis failed", conversation_id=conversation_id, error=str(e))
+            return None
+        return json.loads(raw) if raw else None
+
+    async def set_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.set(f"chat:{conversation_id}:summary", json.dumps(summary, ensure_ascii=False))
+                pipe.expire(f"chat:{conversation_id}:summary", self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("Writing conversation summary to Redis failed", conversation_id=conversation_id, error=str(e))
+
+    async def delete(self, conversation_id: str) -> bool:
+        self._cache.pop(conversation_id, None)
+        try:
+            deleted = await self.client.delete(*self._keys(conversation_id), f"chat:{conversation_id}:summary")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("Deleting conversation from Redis failed", conversation_id=conversation_id, error=str(e))
+            return False
+        if deleted:
+            self.stats["deleted"] += 1
+        return deleted > 0
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        return {
+            "backend": "redis",
+            "in_process": isinstance(self.client, InProcessRedis),
+            "cached_conversations": len(self._cache),
+            **self.stats,
+            "cache_hit_rate": round(self.stats["cache_hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+def create_conversation_store() -> ConversationStore:
+    """Conversation store for the configured CONVERSATION_STORE_BACKEND."""
+    backend = settings.CONVERSATION_STORE_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteConversationStore()
+    if backend == "redis":
+        return RedisConversationStore()
+    if backend == "memory":
+        return InMemoryConversationStore()
+    raise ValueError(f"Unknown conversation store backend: {settings.CONVERSATION_STORE_BACKEND}")
+
+
+# Global store instance
+conversation_store = create_conversation_store()
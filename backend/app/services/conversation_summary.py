@@ -0,0 +1,186 @@
+"""
+Rolling summaries of long conversations.
+
+Long planning sessions used to resend the last 20 raw messages on every
+turn. Once the not yet summarized history grows beyond
+CONVERSATION_SUMMARY_TRIGGER_TOKENS, the older turns are condensed into a
+short summary by a background completion (batch priority, low max_tokens);
+the most recent messages stay verbatim. Prompts then carry the summary plus
+the recent turns, so their size stays roughly constant.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+import structlog
+
+from app.core.config import settings
+from app.services.azure_openai import azure_openai_service
+from app.services.conversation_store import ConversationStore
+from app.services.rate_limiter import Priority
+from app.services.text_processing import estimate_message_tokens
+from app.services.usage_accounting import usage_accounting
+
+logger = structlog.get_logger()
+
+SUMMARY_PROMPT = """Fasse das bisherige Gespräch zwischen einer Pfadfinderleiter:in und dem Pfadi AI Assistenten kompakt zusammen.
+Behalte alle Fakten, die für die weitere Planung wichtig sind: Gruppe, Alter, Anzahl, Termine, Orte, Material,
+gewählte oder abgelehnte Spiele, getroffene Entscheidungen und offene Fragen. Lass Begrüßungen und Wiederholungen weg.
+Antworte nur mit der Zusammenfassung in Stichpunkten."""
+
+
+def split_history(
+    history: List[Dict[str, Any]],
+    summary: Optional[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Messages after the last one the summary covers (all messages without a summary).
+
+    The cut is by position: timestamps are taken when a request arrives, so a
+    queued follow-up may carry an earlier time than the reply before it.
+
+    Args:
+        history: The conversation's whole stored window, oldest first
+        summary: Summary with the id of its last message in until_id
+    """
+    if not summary:
+        return history
+    until_id = summary.get("until_id")
+    if until_id:
+        for index, message in enumerate(history):
+            if message.get("id") == until_id:
+                return history[index + 1:]
+        # The summarized message was trimmed from the window, everything kept is newer
+        return history
+    # Summaries written before messages had ids
+    return [message for message in history if message.get("timestamp", "") > summary["until"]]
+
+
+def summary_message(summary: Dict[str, Any]) -> Dict[str, str]:
+    """Prompt message carrying a conversation summary."""
+    return {
+        "role": "system",
+        "content": f"Zusammenfassung des bisherigen Gesprächs:\n{summary['text']}"
+    }
+
+
+class ConversationSummarizer:
+    """Schedules background summaries of conversations that grew too long."""
+
+    def __init__(self):
+        """Initialize the summarizer."""
+        self._in_flight: Set[str] = set()
+        # Strong references to running tasks; the event loop only keeps weak ones
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            "scheduled": 0,
+            "completed": 0,
+            "failed": 0,
+            "messages_summarized": 0,
+            "tokens_before": 0,
+            "tokens_after": 0,
+        }
+
+    def is_available(self) -> bool:
+        return settings.ENABLE_CONVERSATION_SUMMARY and azure_openai_service.is_available()
+
+    def needs_summary(self, unsummarized: List[Dict[str, Any]]) -> bool:
+        return (
+            settings.ENABLE_CONVERSATION_SUMMARY
+            and len(unsummarized) > settings.CONVERSATION_SUMMARY_KEEP_MESSAGES
+            and estimate_message_tokens(unsummarized) > settings.CONVERSATION_SUMMARY_TRIGGER_TOKENS
+        )
+
+    def schedule(
+        self,
+        store: ConversationStore,
+        conversation_id: str,
+        unsummarized: List[Dict[str, Any]],
+        summary: Optional[Dict[str, Any]]
+    ) -> None:
+        """Summarize the older part of the history in the background (once per conversation)."""
+        if conversation_id in self._in_flight or not self.is_available():
+            return
+        older = unsummarized[:-settings.CONVERSATION_SUMMARY_KEEP_MESSAGES]
+        # Cut after a complete exchange
+        while older and older[-1]["role"] != "assistant":
+            older.pop()
+        if not older:
+            return
+
+        self._in_flight.add(conversation_id)
+        self.stats["scheduled"] += 1
+        task = asyncio.create_task(self._summarize(store, conversation_id, older, summary))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(
+        self,
+        store: ConversationStore,
+        conversation_id: str,
+        older: List[Dict[str, Any]],
+        summary: Optional[Dict[str, Any]]
+    ) -> None:
+        try:
+            with usage_accounting.attribute(conversation=conversation_id, feature="summary"):
+                text = await self.summarize(older, summary)
+            if not text:
+                self.stats["failed"] += 1
+                return
+            await store.set_summary(
+                conversation_id,
+                {"text": text, "until": older[-1]["timestamp"], "until_id": older[-1].get("id")}
+            )
+            self.stats["completed"] += 1
+            self.stats["messages_summarized"] += len(older)
+            self.stats["tokens_before"] += estimate_message_tokens(older)
+            self.stats["tokens_after"] += estimate_message_tokens([{"content": text}])
+            logger.info(
+                "Conversation summarized",
+                conversation_id=conversation_id,
+                messages=len(older),
+                summary_length=len(text)
+            )
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error("Conversation summary failed", conversation_id=conversation_id, error=str(e))
+        finally:
+            self._in_flight.discard(conversation_id)
+
+    async def summarize(
+        self,
+        messages: List[Dict[str, Any]],
+        summary: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        Condense messages (and an earlier summary) into a new summary.
+
+        Returns:
+            The summary text, or None if the completion failed
+        """
+        transcript = "\n".join(
+            f"{'Leiter:in' if message['role'] == 'user' else 'Assistent'}: {message['content']}"
+            for message in messages
+        )
+        if summary:
+            transcript = f"Bisherige Zusammenfassung:\n{summary['text']}\n\nNeuer Gesprächsverlauf:\n{transcript}"
+
+        response = await azure_openai_service.chat_completion(
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": transcript},
+            ],
+            model=settings.CONVERSATION_SUMMARY_DEPLOYMENT or None,
+            temperature=0.2,
+            max_tokens=settings.CONVERSATION_SUMMARY_MAX_TOKENS,
+            priority=Priority.BATCH
+        )
+        if response.get("error") or response.get("mock") or response.get("degraded"):
+            return None
+        return (response.get("message") or "").strip() or None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self._in_flight)}
+
+
+# Global summarizer instance
+conversation_summarizer = ConversationSummarizer()
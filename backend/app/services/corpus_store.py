@@ -0,0 +1,421 @@
+"""
+Packed single-file corpus store for extracted document texts.
+
+All texts live in one append-only data file; a JSON-lines index maps each
+document id to (offset, length) plus document metadata. Reads are served
+from an mmap of the data file, so fetching a document is a slice of mapped
+memory instead of an open/read/close on one of thousands of small files.
+
+Files on disk (``<gen>`` increases with every compaction):
+
+    CURRENT          name of the live generation
+    corpus-<gen>.dat concatenated UTF-8 texts
+    corpus-<gen>.idx one JSON record per write, the last record per id wins
+    LOCK             held (flock) by whichever process is writing or compacting
+
+Nothing is created until the first write. A running server compacts its
+store through POST /api/v1/admin/corpus/compact; the command line below is
+for maintenance while the server is stopped and refuses to run while
+another process is writing.
+
+Usage:
+    python -m app.services.corpus_store stats
+    python -m app.services.corpus_store compact
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import structlog
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+logger = structlog.get_logger()
+
+
+class CorpusStoreBusyError(RuntimeError):
+    """Raised when another process holds the store's write lock."""
+
+
+class PackedCorpusStore:
+    """Append-only packed text store with an offset/length index and mmap reads."""
+
+    def __init__(self, directory: Optional[Path] = None):
+        """Open the store in the given directory. Files are created on the first write."""
+        self.directory = Path(directory or settings.CORPUS_DIR)
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._generation = 0
+        self._data_file = None
+        self._index_file = None
+        self._data_size = 0
+        # Size of the index file as far as this process has read or written it
+        self._index_size = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+        self._opened = False
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+
+    def _paths(self, generation: int) -> Tuple[Path, Path]:
+        return (
+            self.directory / f"corpus-{generation}.dat",
+            self.directory / f"corpus-{generation}.idx",
+        )
+
+    def _current_generation(self) -> int:
+        current = self.directory / "CURRENT"
+        return int(current.read_text().strip() or 0) if current.exists() else 0
+
+    def _open(self) -> None:
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        """
+        Pick up what other processes wrote or compacted since this one last looked.
+
+        Costs a read of CURRENT and a stat of the index file; only records
+        appended since then are parsed. Call with the lock held.
+        """
+        if not self._opened or self._current_generation() != self._generation:
+            self._open_generation()
+            return
+        _, index_path = self._paths(self._generation)
+        size = index_path.stat().st_size if index_path.exists() else 0
+        if size < self._index_size:
+            self._open_generation()
+        elif size > self._index_size:
+            self._read_index_tail()
+
+    def _open_generation(self) -> None:
+        """Load the live generation's index; nothing is created on disk."""
+        self._close_files()
+        self._generation = self._current_generation()
+        self._index = {}
+        self._index_size = 0
+        self._data_size = 0
+        self._opened = True
+        self._read_index_tail()
+
+    def _read_index_tail(self) -> None:
+        """Apply the index records appended after the part already read."""
+        data_path, index_path = self._paths(self._generation)
+        if not index_path.exists():
+            return
+        with open(index_path, "rb") as f:
+            f.seek(self._index_size)
+            tail = f.read()
+        # Whole lines only: a record still being written is read next time
+        complete = tail.rfind(b"\n") + 1
+        for line in tail[:complete].decode("utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn write after a crash
+                continue
+            if record.get("deleted"):
+                self._index.pop(record["id"], None)
+            else:
+                self._index[record["id"]] = record
+        self._index_size += complete
+        # Texts are flushed before their index records
+        self._data_size = data_path.stat().st_size if data_path.exists() else 0
+
+    def _close_files(self) -> None:
+        for handle in (self._data_file, self._index_file):
+            if handle is not None:
+                handle.close()
+        self._data_file = None
+        self._index_file = None
+        self._mmap = None
+        self._mapped_size = 0
+
+    @contextmanager
+    def _writing(self, blocking: bool = True) -> Iterator[None]:
+        """
+        Hold the cross-process write lock (LOCK file in the store directory).
+
+        Another process (a second worker, the compaction CLI) may have
+        appended or switched generations since this one last looked; the
+        index is reloaded before writing so no record is written against
+        stale offsets or into a replaced generation.
+
+        Raises:
+            CorpusStoreBusyError: Not blocking and another process holds the lock
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / "LOCK", "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    raise CorpusStoreBusyError(f"Corpus store {self.directory} is locked by another process")
+            self._refresh()
+            data_path, index_path = self._paths(self._generation)
+            if index_path.exists() and index_path.stat().st_size > self._index_size:
+                # Half a record left by a crashed writer, new records must start on a fresh line
+                self._close_files()
+                os.truncate(index_path, self._index_size)
+            if self._data_file is None:
+                current = self.directory / "CURRENT"
+                if not current.exists():
+                    current.write_text(str(self._generation))
+                self._data_file = open(data_path, "ab")
+                self._index_file = open(index_path, "a", encoding="utf-8")
+            try:
+                yield
+            finally:
+                self._data_file.flush()
+                self._index_file.flush()
+                self._index_size = self._index_file.tell()
+
+    def _mapped(self) -> Optional[mmap.mmap]:
+        """Current mapping of the data file, remapped after it has grown. Call with the lock held."""
+        if self._data_size == 0:
+            return None
+        if self._mmap is None or self._mapped_size < self._data_size:
+            if self._data_file is not None:
+                self._data_file.flush()
+            data_path, _ = self._paths(self._generation)
+            try:
+                f = open(data_path, "rb")
+            except FileNotFoundError:
+                # Compacted by another process: switch to the new generation
+                self._open_generation()
+                return self._mapped()
+            with f:
+                # Earlier mappings stay alive as long as slices reference them
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._mmap)
+        return self._mmap
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def put(self, doc_id: str, text: str, meta: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Store a document text.
+
+        Args:
+            doc_id: Document id
+            text: Document text
+            meta: JSON-serialisable metadata kept in the index
+
+        Returns:
+            True if text or metadata changed, False if the document was up to date
+        """
+        return bool(self.put_many([(doc_id, text, meta)]))
+
+    def put_many(self, items: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> List[str]:
+        """Store several documents with one flush. Returns the ids that changed."""
+        changed: List[str] = []
+        with self._lock, self._writing():
+            for doc_id, text, meta in items:
+                encoded = text.encode("utf-8")
+                digest = hashlib.sha1(encoded).hexdigest()
+                existing = self._index.get(doc_id)
+
+                if existing and existing["sha1"] == digest:
+                    if meta is None or existing.get("meta") == meta:
+                        continue
+                    record = {**existing, "meta": meta}
+                else:
+                    record = {
+                        "id": doc_id,
+                        "offset": self._data_size,
+                        "length": len(encoded),
+                        "sha1": digest,
+                        "meta": meta,
+                    }
+                    self._data_file.write(encoded)
+                    self._data_size += len(encoded)
+
+                changed.append(doc_id)
+                self._index[doc_id] = record
+                self._index_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return changed
+
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document from the index. Its bytes are reclaimed by compact()."""
+        with self._lock, self._writing():
+            if self._index.pop(doc_id, None) is None:
+                return False
+            self._index_file.write(json.dumps({"id": doc_id, "deleted": True}) + "\n")
+            return True
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __contains__(self, doc_id: str) -> bool:
+        self._open()
+        return doc_id in self._index
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._index)
+
+    def ids(self) -> List[str]:
+        self._open()
+        return list(self._index)
+
+    def get_meta(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        self._open()
+        record = self._index.get(doc_id)
+        return record.get("meta") if record else None
+
+    def iter_meta(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (doc_id, metadata) for every stored document without touching texts."""
+        self._open()
+        for doc_id, record in list(self._index.items()):
+            yield doc_id, record.get("meta") or {}
+
+    def get_bytes(self, doc_id: str) -> Optional[memoryview]:
+        """Zero-copy view of a document's UTF-8 bytes."""
+        with self._lock:
+            self._refresh()
+            # Mapping first: it may switch generations, and the record must come from the same one
+            mapped = self._mapped()
+            record = self._index.get(doc_id)
+        if record is None:
+            return None
+        if record["length"] == 0:
+            return memoryview(b"")
+        return memoryview(mapped)[record["offset"]:record["offset"] + record["length"]]
+
+    def get_text(self, doc_id: str) -> Optional[str]:
+        """Decoded document text."""
+        view = self.get_bytes(doc_id)
+        if view is None:
+            return None
+        return str(view, "utf-8")
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def compact(self, blocking: bool = True) -> Dict[str, Any]:
+        """
+        Rewrite live documents into a new generation, dropping stale bytes.
+
+        The switch to the new generation is a single atomic rename of CURRENT.
+        Compaction holds the cross-process write lock, so writers in other
+        processes wait for it and then reopen the new generation; readers
+        keep their mapping of the old files until they next remap.
+
+        Args:
+            blocking: Wait for other writers instead of failing
+
+        Raises:
+            CorpusStoreBusyError: Not blocking and another process is writing
+        """
+        if not (self.directory / "CURRENT").exists():
+            # Nothing was ever written
+            return {"generation": 0, "documents": 0, "bytes_before": 0, "bytes_after": 0}
+
+        with self._lock, self._writing(blocking=blocking):
+            old_generation = self._generation
+            old_data, old_index = self._paths(old_generation)
+            bytes_before = self._data_size
+
+            new_generation = old_generation + 1
+            new_data, new_index = self._paths(new_generation)
+
+            new_records: Dict[str, Dict[str, Any]] = {}
+            with open(old_data, "rb") as src, open(new_data, "wb") as dst, \
+                    open(new_index, "w", encoding="utf-8") as idx:
+                offset = 0
+                # Copy in offset order for sequential I/O
+                for doc_id, record in sorted(self._index.items(), key=lambda item: item[1]["offset"]):
+                    src.seek(record["offset"])
+                    dst.write(src.read(record["length"]))
+                    new_record = {**record, "offset": offset}
+                    idx.write(json.dumps(new_record, ensure_ascii=False) + "\n")
+                    new_records[doc_id] = new_record
+                    offset += record["length"]
+                dst.flush()
+                os.fsync(dst.fileno())
+                idx.flush()
+                os.fsync(idx.fileno())
+
+            pointer = self.directory / "CURRENT.tmp"
+            pointer.write_text(str(new_generation))
+            os.replace(pointer, self.directory / "CURRENT")
+
+            self._close_files()
+            self._generation = new_generation
+            self._index = new_records
+            self._data_file = open(new_data, "ab")
+            self._index_file = open(new_index, "a", encoding="utf-8")
+            self._data_size = offset
+
+            for path in (old_data, old_index):
+                path.unlink(missing_ok=True)
+
+        stats = {
+            "generation": new_generation,
+            "documents": len(new_records),
+            "bytes_before": bytes_before,
+            "bytes_after": offset,
+        }
+        logger.info("Corpus store compacted", **stats)
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._open()
+        live_bytes = sum(record["length"] for record in self._index.values())
+        return {
+            "generation": self._generation,
+            "documents": len(self._index),
+            "data_bytes": self._data_size,
+            "live_bytes": live_bytes,
+            "stale_bytes": self._data_size - live_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_files()
+            self._opened = False
+
+
+# Global store instance
+corpus_store = PackedCorpusStore()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Packed corpus store maintenance")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--directory", type=Path, default=None, help="Store directory")
+    args = parser.parse_args()
+
+    store = PackedCorpusStore(args.directory) if args.directory else corpus_store
+    if args.command == "compact":
+        try:
+            result = store.compact(blocking=False)
+        except CorpusStoreBusyError as e:
+            # A running server compacts through POST /api/v1/admin/corpus/compact
+            print(f"{e}; try again later or use the admin endpoint", file=sys.stderr)
+            sys.exit(1)
+    else:
+        result = store.get_stats()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
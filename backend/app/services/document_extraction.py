@@ -0,0 +1,365 @@
+"""
+Format-specific document extraction for local and Google Drive data folders.
+
+Extraction runs in a process pool so that a single pathological file (huge
+scanned PDF, corrupt spreadsheet) can neither block the event loop nor stall
+the whole run: every worker has an address-space cap and every file a
+timeout.
+"""
+
+import asyncio
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Roughly one printed page of running text, used to report pages/s for
+# formats without a page concept (DOCX, plain text).
+CHARS_PER_PAGE = 3000
+
+# Extra time the parent waits beyond the in-worker alarm before it gives up
+# on a worker that is stuck in C code and does not react to signals.
+TIMEOUT_GRACE_SECONDS = 5.0
+
+
+class ExtractionTimeout(Exception):
+    """Raised inside a worker when a file exceeds its time budget."""
+
+
+def _estimate_pages(text: str) -> int:
+    return max(1, -(-len(text) // CHARS_PER_PAGE))
+
+
+def _extract_pdf(path: Path) -> Dict[str, Any]:
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(str(path))
+    page_texts = [page.extract_text() or "" for page in reader.pages]
+    title = None
+    if reader.metadata and reader.metadata.title:
+        title = str(reader.metadata.title)
+    return {
+        "text": "\n\n".join(text.strip() for text in page_texts if text.strip()),
+        "pages": len(page_texts),
+        "title": title,
+    }
+
+
+def _extract_docx(path: Path) -> Dict[str, Any]:
+    import docx
+
+    document = docx.Document(str(path))
+    lines = []
+    for paragraph in document.paragraphs:
+        text = paragraph.text.strip()
+        if not text:
+            continue
+        style = paragraph.style.name if paragraph.style is not None else ""
+        # Keep headings recognisable for heading-aware chunking downstream
+        if style.startswith("Heading"):
+            level = style.replace("Heading", "").strip()
+            depth = int(level) if level.isdigit() else 1
+            text = f"{'#' * depth} {text}"
+        lines.append(text)
+
+    for table in document.tables:
+        for row in table.rows:
+            cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+            if cells:
+                lines.append(" | ".join(cells))
+
+    text = "\n".join(lines)
+    title = document.core_properties.title or None
+    return {"text": text, "pages": _estimate_pages(text), "title": title}
+
+
+def _extract_xlsx(path: Path) -> Dict[str, Any]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(str(path), read_only=True, data_only=True)
+    try:
+        sections = []
+        for sheet in workbook.worksheets:
+            rows = []
+            for row in sheet.iter_rows(values_only=True):
+                cells = [str(value).strip() for value in row if value not in (None, "")]
+                if cells:
+                    rows.append(" | ".join(cells))
+            if rows:
+                sections.append(f"## {sheet.title}\n" + "\n".join(rows))
+        # One sheet counts as one page
+        return {
+            "text": "\n\n".join(sections),
+            "pages": len(workbook.worksheets),
+            "title": None,
+        }
+    finally:
+        workbook.close()
+
+
+def _extract_plain_text(path: Path) -> Dict[str, Any]:
+    text = path.read_text(encoding="utf-8", errors="replace")
+    return {"text": text, "pages": _estimate_pages(text), "title": None}
+
+
+EXTRACTORS: Dict[str, Callable[[Path], Dict[str, Any]]] = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".xlsx": _extract_xlsx,
+    ".xlsm": _extract_xlsx,
+    ".txt": _extract_plain_text,
+    ".md": _extract_plain_text,
+}
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+    """Process pool initializer: cap the worker's address space."""
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not available on Windows
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _extract_in_worker(path_str: str, timeout_seconds: float) -> Dict[str, Any]:
+    """Extract a single file. Runs inside a pool worker process."""
+    path = Path(path_str)
+    file_format = path.suffix.lower().lstrip(".")
+    result: Dict[str, Any] = {
+        "path": path_str,
+        "format": file_format,
+        "text": "",
+        "pages": 0,
+        "title": None,
+        "error": None,
+    }
+
+    extractor = EXTRACTORS.get(path.suffix.lower())
+    if extractor is None:
+        result["error"] = "unsupported_format"
+        return result
+
+    use_alarm = hasattr(signal, "setitimer") and timeout_seconds > 0
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout_seconds)
+
+    started = time.perf_counter()
+    try:
+        result.update(extractor(path))
+    except ExtractionTimeout:
+        result["error"] = "timeout"
+    except MemoryError:
+        result["error"] = "memory_limit_exceeded"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result["duration_seconds"] = time.perf_counter() - started
+    return result
+
+
+class DocumentExtractionService:
+    """Extracts text from PDF, DOCX and XLSX files in a sandboxed process pool."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None,
+    ):
+        """Initialize the extraction service."""
+        self.max_workers = max_workers or settings.EXTRACTION_MAX_WORKERS
+        self.timeout_seconds = timeout_seconds or settings.EXTRACTION_TIMEOUT_SECONDS
+        self.memory_limit_mb = (
+            memory_limit_mb
+            if memory_limit_mb is not None
+            else settings.EXTRACTION_MEMORY_LIMIT_MB
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.format_stats: Dict[str, Dict[str, float]] = {}
+        # format -> (files in flight, wall-clock time the first of them started)
+        self._busy: Dict[str, Tuple[int, float]] = {}
+
+    def supported_extensions(self) -> List[str]:
+        """List file extensions with a registered extractor."""
+        return sorted(EXTRACTORS)
+
+    def discover_files(self, directories: Iterable[Path]) -> List[Path]:
+        """Find all supported files below the given directories."""
+        files = []
+        for directory in directories:
+            if not directory.exists():
+                continue
+            for path in sorted(directory.rglob("*")):
+                if (
+                    path.is_file()
+                    and not path.name.startswith((".", "~$"))
+                    and path.suffix.lower() in EXTRACTORS
+                ):
+                    files.append(path)
+        return files
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+            )
+        return self._pool
+
+    def _reset_pool(self) -> None:
+        """Tear down a pool whose worker is wedged or died."""
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        # A worker stuck in native code ignores SIGALRM; kill it so the run
+        # can continue on a fresh pool.
+        for process in list(getattr(pool, "_processes", {}).values()):
+            if process.is_alive():
+                process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _extract_one(self, path: Path) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        # One retry covers innocent files that were in flight when another
+        # file brought the pool down.
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(
+                        pool, _extract_in_worker, str(path), self.timeout_seconds
+                    ),
+                    timeout=self.timeout_seconds + TIMEOUT_GRACE_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Extraction worker unresponsive, recycling pool", path=str(path))
+                if self._pool is pool:
+                    self._reset_pool()
+                error = "timeout"
+                break
+            except BrokenProcessPool:
+                if self._pool is pool:
+                    self._reset_pool()
+                error = "worker_crashed"
+
+        return {
+            "path": str(path),
+            "format": path.suffix.lower().lstrip("."),
+            "text": "",
+            "pages": 0,
+            "title": None,
+            "error": error,
+            "duration_seconds": 0.0,
+        }
+
+    async def extract_files(self, paths: Iterable[Path]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Extract files concurrently and yield results as they complete.
+
+        Args:
+            paths: Files to extract
+
+        Yields:
+            Extraction result dicts with text, page count, format and error
+        """
+        pending_paths = deque(paths)
+        max_in_flight = self.max_workers * 2
+        # task -> format of the file it extracts
+        in_flight: Dict[asyncio.Future, str] = {}
+
+        try:
+            while pending_paths or in_flight:
+                while pending_paths and len(in_flight) < max_in_flight:
+                    path = pending_paths.popleft()
+                    file_format = path.suffix.lower().lstrip(".")
+                    self._track_busy(file_format, 1)
+                    in_flight[asyncio.ensure_future(self._extract_one(path))] = file_format
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    self._track_busy(in_flight.pop(task), -1)
+                    result = task.result()
+                    self._record_stats(result)
+                    yield result
+        finally:
+            # The consumer stopped early: files still queued for the pool are dropped
+            for task, file_format in in_flight.items():
+                task.cancel()
+                self._track_busy(file_format, -1)
+
+    def _format_stats(self, file_format: str) -> Dict[str, float]:
+        return self.format_stats.setdefault(
+            file_format,
+            {"files": 0, "failed": 0, "pages": 0, "seconds": 0.0, "worker_seconds": 0.0},
+        )
+
+    def _track_busy(self, file_format: str, delta: int) -> None:
+        """Count wall-clock seconds while at least one file of the format is in flight."""
+        count, since = self._busy.get(file_format, (0, time.perf_counter()))
+        count += delta
+        if count > 0:
+            self._busy[file_format] = (count, since)
+            return
+        self._busy.pop(file_format, None)
+        self._format_stats(file_format)["seconds"] += time.perf_counter() - since
+
+    def _record_stats(self, result: Dict[str, Any]) -> None:
+        stats = self._format_stats(result["format"])
+        stats["files"] += 1
+        stats["worker_seconds"] += result.get("duration_seconds", 0.0)
+        if result["error"]:
+            stats["failed"] += 1
+        else:
+            stats["pages"] += result["pages"]
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-format throughput since service start.
+
+        seconds is wall-clock time with files of the format in flight, so
+        pages_per_second is the throughput of the whole pool; worker_seconds
+        adds up the time each file took in its worker.
+        """
+        now = time.perf_counter()
+        report = {}
+        for file_format, stats in self.format_stats.items():
+            running = self._busy.get(file_format)
+            seconds = stats["seconds"] + (now - running[1] if running else 0.0)
+            report[file_format] = {
+                **stats,
+                "seconds": round(seconds, 3),
+                "pages_per_second": round(stats["pages"] / seconds, 2) if seconds else 0.0,
+            }
+        return report
+
+    def shutdown(self) -> None:
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Global service instance
+document_extraction_service = DocumentExtractionService()
@@ -0,0 +1,135 @@
+"""
+Micro-batching dispatcher for single-text embedding requests.
+
+Searches, knowledge lookups and chat each need one short embedding. Sent
+individually, every one of them is a separate HTTPS request against the
+same rate limit. The dispatcher holds requests for a few milliseconds (or
+until EMBEDDING_BATCH_MAX_SIZE inputs are waiting), sends them as one
+batched embeddings request and resolves each caller's future with its own
+vector.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import structlog
+
+from app.core.config import settings
+from app.services.azure_openai import azure_openai_service
+
+logger = structlog.get_logger()
+
+
+class EmbeddingDispatcher:
+    """Coalesces concurrent embedding calls into batched requests."""
+
+    def __init__(self, window_ms: Optional[float] = None, max_batch_size: Optional[int] = None):
+        """Initialize the dispatcher."""
+        self.window = (window_ms if window_ms is not None else settings.EMBEDDING_BATCH_WINDOW_MS) / 1000
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_MAX_SIZE
+        # (text, future, enqueued at)
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Strong references to flush timers and in-flight sends; the event loop only keeps weak ones
+        self._sending: Set[asyncio.Task] = set()
+        self.stats = {
+            "requests": 0,
+            "dispatched": 0,
+            "batches": 0,
+            "inputs_sent": 0,
+            "failed_batches": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """
+        Embed one text as part of the next batch.
+
+        Returns:
+            The embedding, or None if the embedding deployment is unavailable or failed
+        """
+        if not azure_openai_service.embeddings_available():
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        self.stats["requests"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_now()
+        elif self._flush_task is None:
+            self._schedule_flush()
+        return await future
+
+    def _schedule_flush(self) -> None:
+        self._flush_task = self._track(asyncio.create_task(self._flush_after_window()))
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+        return task
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        await self._send(self._take_pending())
+
+    def _flush_now(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._track(asyncio.create_task(self._send(self._take_pending())))
+
+    def _take_pending(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending and self._flush_task is None:
+            self._schedule_flush()
+        return batch
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        if not batch:
+            return
+        sent_at = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            wait_ms = (sent_at - enqueued_at) * 1000
+            self.stats["total_wait_ms"] += wait_ms
+            self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+
+        # Identical texts in one batch are embedded once
+        unique_texts: Dict[str, int] = {}
+        for text, _, _ in batch:
+            unique_texts.setdefault(text, len(unique_texts))
+        self.stats["batches"] += 1
+        self.stats["dispatched"] += len(batch)
+        self.stats["inputs_sent"] += len(unique_texts)
+
+        try:
+            embeddings = await azure_openai_service.generate_embeddings(list(unique_texts))
+        except Exception as e:
+            logger.error("Embedding batch failed", error=str(e), size=len(batch))
+            embeddings = None
+        if embeddings is None:
+            self.stats["failed_batches"] += 1
+
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(embeddings[unique_texts[text]] if embeddings else None)
+
+    def get_stats(self) -> Dict[str, float]:
+        batches = self.stats["batches"]
+        dispatched = self.stats["dispatched"]
+        return {
+            **self.stats,
+            "total_wait_ms": round(self.stats["total_wait_ms"], 3),
+            "max_wait_ms": round(self.stats["max_wait_ms"], 3),
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "avg_batch_size": round(dispatched / batches, 2) if batches else 0.0,
+            "avg_batch_fill": round(dispatched / (batches * self.max_batch_size), 3) if batches else 0.0,
+            "avg_wait_ms": round(self.stats["total_wait_ms"] / dispatched, 3) if dispatched else 0.0,
+        }
+
+
+# Global dispatcher instance
+embedding_dispatcher = EmbeddingDispatcher()
@@ -8,6 +8,7 @@ from typing import List, Dict, Any, Optional
 import structlog
 
 from app.services.azure_openai import azure_openai_service
+from app.services.embedding_dispatcher import embedding_dispatcher
 from app.core.config import settings
 
 logger = structlog.get_logger()
@@ -107,6 +108,23 @@ class GameSearchService:
             }
         ]
     
+    def get_game(self, game_id: str) -> Optional[Dict[str, Any]]:
+        """Get a game by ID (None if unknown)."""
+        return next((game for game in self.mock_games if game["gameId"] == game_id), None)
+    
+    def get_games(self, game_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Get several games by ID in one lookup.
+        
+        Args:
+            game_ids: Game IDs, duplicates are returned once
+            
+        Returns:
+            Known games in the order of their first ID; unknown IDs are skipped
+        """
+        games_by_id = {game["gameId"]: game for game in self.mock_games}
+        return [games_by_id[game_id] for game_id in dict.fromkeys(game_ids) if game_id in games_by_id]
+    
     async def search_games(
         self,
         query: Optional[str] = None,
@@ -159,31 +177,21 @@ class GameSearchService:
         
         logger.info(f"After keyword filtering: {len(filtered_games)} games")
         
-        # Apply semantic search if query provided and service available
-        if query and use_semantic_search and azure_openai_service.is_available():
+        # Apply semantic search if query provided and embeddings are available
+        # (an open circuit means text matching right away instead of a timeout)
+        if query and use_semantic_search and azure_openai_service.embeddings_available():
             try:
                 semantic_results = await self._semantic_search(query, filtered_games)
                 final_results = semantic_results[:limit]
                 search_type = "semantic"
             except Exception as e:
                 logger.warning("Semantic search failed, falling back to keyword search", error=str(e))
-                final_results = filtered_games[:limit]
+                final_results = self._text_search(query, filtered_games)[:limit]
                 search_type = "keyword_fallback"
         else:
             # Simple text matching for query
             if query:
-                query_lower = query.lower()
-                text_matched = []
-                for game in filtered_games:
-                    score = self._calculate_text_match_score(game, query_lower)
-                    if score > 0:
-                        game_copy = game.copy()
-                        game_copy["search_score"] = score
-                        text_matched.append(game_copy)
-                
-                # Sort by score
-                text_matched.sort(key=lambda x: x["search_score"], reverse=True)
-                final_results = text_matched[:limit]
+                final_results = self._text_search(query, filtered_games)[:limit]
                 search_type = "text_match"
             else:
                 final_results = filtered_games[:limit]
@@ -253,6 +261,22 @@ class GameSearchService:
         
         return filtered
     
+    def _text_search(self, query: str, games: List[Dict]) -> List[Dict]:
+        """Games matching the query as text, best match first."""
+        
+        query_lower = query.lower()
+        text_matched = []
+        for game in games:
+            score = self._calculate_text_match_score(game, query_lower)
+            if score > 0:
+                game_copy = game.copy()
+                game_copy["search_score"] = score
+                text_matched.append(game_copy)
+        
+        # Sort by score
+        text_matched.sort(key=lambda x: x["search_score"], reverse=True)
+        return text_matched
+    
     async def _semantic_search(
         self, 
         query: str, 
@@ -260,22 +284,26 @@ class GameSearchService:
     ) -> List[Dict]:
         """Perform semantic search using embeddings."""
         
-        # Generate query embedding
-        query_embedding = await azure_openai_service.generate_embedding(query)
-        
-        # Generate game embeddings if not cached
-        games_with_embeddings = []
-        for game in games:
-            if game["embedding"] is None:
-                # Create search text for embedding
-                search_text = self._create_game_search_text(game)
-                game["embedding"] = await azure_openai_service.generate_embedding(search_text)
-            
-            games_with_embeddings.append(game)
+        # Query and missing game embeddings are requested concurrently so the
+        # dispatcher can send them as one batch
+        missing = [game for game in games if game["embedding"] is None]
+        embeddings = await asyncio.gather(
+            embedding_dispatcher.embed(query),
+            *(embedding_dispatcher.embed(self._create_game_search_text(game)) for game in missing)
+        )
+        if embeddings[0] is None:
+            raise RuntimeError("Query embedding unavailable")
+        query_embedding = embeddings[0]
+        for game, embedding in zip(missing, embeddings[1:]):
+            # Failed embeddings stay None and are retried on the next search
+            game["embedding"] = embedding
+        if any(game["embedding"] is None for game in games):
+            # Ranking only the embedded games would silently drop the others
+            raise RuntimeError("Game embeddings incomplete")
         
         # Calculate similarity scores
         scored_games = []
-        for game in games_with_embeddings:
+        for game in games:
             similarity = self._cosine_similarity(query_embedding, game["embedding"])
             game_copy = game.copy()
             game_copy["semantic_score"] = similarity
@@ -286,6 +314,27 @@ class GameSearchService:
         
         return scored_games
     
+    async def preload_embeddings(self) -> int:
+        """
+        Embed all catalog games in one batched request, e.g. at startup.
+        
+        Returns:
+            Number of games embedded
+        """
+        missing = [game for game in self.mock_games if game["embedding"] is None]
+        if not missing or not azure_openai_service.embeddings_available():
+            return 0
+        
+        embeddings = await azure_openai_service.generate_embeddings(
+            [self._create_game_search_text(game) for game in missing]
+        )
+        if embeddings is None:
+            return 0
+        for game, embedding in zip(missing, embeddings):
+            game["embedding"] = embedding
+        logger.info("Game embeddings preloaded", games=len(missing))
+        return len(missing)
+    
     def _create_game_search_text(self, game: Dict) -> str:
         """Create a comprehensive text representation for embedding generation."""
         
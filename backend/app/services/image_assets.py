@@ -0,0 +1,412 @@
+"""
+Image asset pipeline: perceptual-hash deduplication and precomputed thumbnails.
+
+Crawled pages reference the same logos and icons over and over. Images are
+decoded in a process pool, grouped by a 64-bit difference hash (dHash), and
+only one web-sized thumbnail is rendered per group. Thumbnails are named by
+their hash, so they are immutable and can be cached by browsers forever.
+
+Images are linked to catalog documents by their ingestion id. A game gets the
+thumbnails of its source document: the one in its documentId field, or the
+crawled page at its sourceUrl. Games without a source get none.
+"""
+
+import asyncio
+import importlib.util
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+THUMBNAIL_FORMAT = "webp"
+THUMBNAIL_ROUTE = f"{settings.API_V1_STR}/assets/thumbnails"
+MANIFEST_NAME = "manifest.json"
+
+
+def _dhash(image, hash_size: int = 8) -> str:
+    """64-bit difference hash: compares neighbouring pixels of a 9x8 grayscale."""
+    from PIL import Image
+
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def _hash_image(path_str: str) -> Dict[str, Any]:
+    """Decode an image and compute its perceptual hash. Runs in a pool worker."""
+    from PIL import Image
+
+    try:
+        with Image.open(path_str) as image:
+            width, height = image.size
+            # JPEG can decode at reduced scale, which is all dHash needs
+            image.draft("L", (64, 64))
+            return {
+                "path": path_str,
+                "phash": _dhash(image),
+                "width": width,
+                "height": height,
+                "error": None,
+            }
+    except Exception as e:
+        return {"path": path_str, "phash": None, "width": 0, "height": 0, "error": str(e)}
+
+
+def _render_thumbnail(path_str: str, target_str: str, max_size: int) -> Dict[str, Any]:
+    """Render a web-sized thumbnail. Runs in a pool worker."""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(path_str) as image:
+            image.draft("RGB", (max_size, max_size))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ("P", "LA", "PA") or "transparency" in image.info:
+                image = image.convert("RGBA")
+            elif image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGB")
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+            image.save(target_str, THUMBNAIL_FORMAT.upper(), quality=80, method=4)
+            return {"path": path_str, "bytes": Path(target_str).stat().st_size, "error": None}
+    except Exception as e:
+        return {"path": path_str, "bytes": 0, "error": str(e)}
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+class ImageAssetService:
+    """Deduplicates crawled images and serves precomputed thumbnails."""
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        """Initialize the image asset service."""
+        self.cache_dir = Path(cache_dir or settings.IMAGE_CACHE_DIR)
+        self.max_size = settings.THUMBNAIL_MAX_SIZE
+        self.max_distance = settings.IMAGE_DEDUP_MAX_DISTANCE
+        # image path (relative to the web data dir) -> manifest entry
+        self.images: Dict[str, Dict[str, Any]] = {}
+        # canonical hash -> thumbnail file name
+        self.thumbnails: Dict[str, str] = {}
+        # ingestion document id -> image paths referenced by that document
+        self.document_images: Dict[str, List[str]] = {}
+        self.last_run: Dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+        # Started on first use, kept for the life of the service
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._load_manifest()
+
+    def is_available(self) -> bool:
+        """Pillow is needed to decode images."""
+        return importlib.util.find_spec("PIL") is not None
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+
+    def _load_manifest(self) -> None:
+        manifest_path = self.cache_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            return
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Thumbnail manifest unreadable, rebuilding", error=str(e))
+            return
+        self.images = manifest.get("images", {})
+        self.thumbnails = manifest.get("thumbnails", {})
+        self.document_images = manifest.get("document_images", {})
+
+    def _save_manifest(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.cache_dir / MANIFEST_NAME
+        tmp_path = manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "images": self.images,
+                    "thumbnails": self.thumbnails,
+                    "document_images": self.document_images,
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        tmp_path.replace(manifest_path)
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+
+    def resolve_crawler_path(self, crawler_path: str) -> Optional[Path]:
+        """
+        Map an absolute path from summary.json to the local data tree.
+
+        The crawler recorded paths like /.../collection/<crawl>/images/<file>;
+        only the last three components are meaningful here.
+        """
+        parts = Path(crawler_path).parts
+        if len(parts) < 3:
+            return None
+        crawl_dir, _, file_name = parts[-3:]
+        for candidate_dir in (crawl_dir, f"{crawl_dir} copy"):
+            candidate = settings.WEB_DATA_DIR / candidate_dir / "images" / file_name
+            if candidate.exists():
+                return candidate
+        return None
+
+    def discover_images(self) -> List[Path]:
+        """All decodable images in the crawled data tree."""
+        if not settings.WEB_DATA_DIR.exists():
+            return []
+        return sorted(
+            path for path in settings.WEB_DATA_DIR.glob("*/images/*")
+            if path.suffix.lower() in IMAGE_EXTENSIONS
+        )
+
+    async def process_images(
+        self,
+        paths: Iterable[Path],
+        document_images: Optional[Dict[str, List[str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Hash, deduplicate and thumbnail the given images.
+
+        Args:
+            paths: Image files to process (unchanged ones are skipped)
+            document_images: Document id -> crawler image paths to link to thumbnails
+
+        Returns:
+            Run statistics
+        """
+        if not self.is_available():
+            logger.warning("Pillow not installed, skipping image pipeline")
+            return {"skipped": True}
+
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            pending = []
+            for path in paths:
+                key = str(path.relative_to(settings.WEB_DATA_DIR))
+                stat = path.stat()
+                signature = [stat.st_mtime_ns, stat.st_size]
+                entry = self.images.get(key)
+                if entry and entry.get("signature") == signature:
+                    continue
+                pending.append((key, path, signature))
+
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=settings.IMAGE_MAX_WORKERS)
+            pool = self._pool
+
+            # Phase 1: decode and hash every new image
+            hashed = await asyncio.gather(*(
+                loop.run_in_executor(pool, _hash_image, str(path))
+                for _, path, _ in pending
+            ))
+
+            new_canonicals: Dict[str, Path] = {}
+            failed = 0
+            for (key, path, signature), result in zip(pending, hashed):
+                if result["error"]:
+                    failed += 1
+                    continue
+                canonical = self._find_canonical(result["phash"])
+                if canonical is None:
+                    canonical = result["phash"]
+                    self.thumbnails[canonical] = f"{canonical}.{THUMBNAIL_FORMAT}"
+                    new_canonicals[canonical] = path
+                elif canonical in new_canonicals:
+                    # Prefer the highest resolution source within a group
+                    current = self.images.get(
+                        str(new_canonicals[canonical].relative_to(settings.WEB_DATA_DIR)), {}
+                    )
+                    if result["width"] * result["height"] > current.get("pixels", 0):
+                        new_canonicals[canonical] = path
+                self.images[key] = {
+                    "signature": signature,
+                    "phash": result["phash"],
+                    "canonical": canonical,
+                    "pixels": result["width"] * result["height"],
+                }
+
+            # Phase 2: one thumbnail per group of near-identical images
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            rendered = await asyncio.gather(*(
+                loop.run_in_executor(
+                    pool,
+                    _render_thumbnail,
+                    str(path),
+                    str(self.cache_dir / self.thumbnails[canonical]),
+                    self.max_size,
+                )
+                for canonical, path in new_canonicals.items()
+            ))
+
+            failed_canonicals = set()
+            for (canonical, _), result in zip(new_canonicals.items(), rendered):
+                if result["error"]:
+                    failed += 1
+                    failed_canonicals.add(canonical)
+                    self.thumbnails.pop(canonical, None)
+            if failed_canonicals:
+                # Forget the group's images, so the next run tries them again
+                self.images = {
+                    key: entry for key, entry in self.images.items()
+                    if entry["canonical"] not in failed_canonicals
+                }
+
+            if document_images:
+                self._link_documents(document_images)
+            self._save_manifest()
+
+        self.last_run = {
+            "images_processed": len(pending),
+            "images_known": len(self.images),
+            "thumbnails": len(self.thumbnails),
+            "new_thumbnails": len(new_canonicals),
+            "thumbnail_bytes": sum(result["bytes"] for result in rendered),
+            "failed": failed,
+        }
+        logger.info("Image pipeline completed", **self.last_run)
+        return self.last_run
+
+    async def process_catalog_images(self) -> Dict[str, Any]:
+        """Run the pipeline over the whole data tree and relink all catalog documents."""
+        from app.services.ingestion import ingestion_service
+
+        document_images = {
+            doc_id: document["image_paths"]
+            for doc_id, document in ingestion_service.documents.items()
+            if document.get("image_paths")
+        }
+        stats = await self.process_images(self.discover_images(), document_images)
+        stats["games_with_thumbnails"] = self.attach_to_games()
+        return stats
+
+    def _find_canonical(self, phash: str) -> Optional[str]:
+        if phash in self.thumbnails:
+            return phash
+        for canonical in self.thumbnails:
+            if hamming_distance(phash, canonical) <= self.max_distance:
+                return canonical
+        return None
+
+    def _link_documents(self, document_images: Dict[str, List[str]]) -> None:
+        for doc_id, crawler_paths in document_images.items():
+            linked = []
+            for crawler_path in crawler_paths:
+                path = self.resolve_crawler_path(crawler_path)
+                if path is not None:
+                    linked.append(str(path.relative_to(settings.WEB_DATA_DIR)))
+            self.document_images[doc_id] = linked
+
+    async def on_catalog_update(
+        self,
+        version: int,
+        changed_ids: List[str],
+        removed_ids: List[str]
+    ) -> None:
+        """Ingestion listener: process images referenced by changed documents."""
+        from app.services.ingestion import ingestion_service
+
+        for doc_id in removed_ids:
+            self.document_images.pop(doc_id, None)
+        document_images = {}
+        for doc_id in changed_ids:
+            document = ingestion_service.get_document(doc_id)
+            if document and document.get("image_paths"):
+                document_images[doc_id] = document["image_paths"]
+        if not document_images:
+            if removed_ids:
+                self.attach_to_games()
+            return
+
+        paths = {
+            path
+            for crawler_paths in document_images.values()
+            for path in map(self.resolve_crawler_path, crawler_paths)
+            if path is not None and path.suffix.lower() in IMAGE_EXTENSIONS
+        }
+        await self.process_images(sorted(paths), document_images)
+        self.attach_to_games()
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def thumbnail_url(self, image_key: str) -> Optional[str]:
+        entry = self.images.get(image_key)
+        if not entry or entry.get("canonical") not in self.thumbnails:
+            return None
+        return f"{THUMBNAIL_ROUTE}/{self.thumbnails[entry['canonical']]}"
+
+    def thumbnails_for_document(self, doc_id: Optional[str]) -> List[str]:
+        """Deduplicated thumbnail URLs for the images of a catalog document."""
+        if not doc_id:
+            return []
+        urls: List[str] = []
+        for image_key in self.document_images.get(doc_id, []):
+            url = self.thumbnail_url(image_key)
+            if url and url not in urls:
+                urls.append(url)
+        return urls
+
+    @staticmethod
+    def game_document_id(game: Dict[str, Any]) -> Optional[str]:
+        """Ingestion id of the document a game was taken from, None if unknown."""
+        from app.services.ingestion import make_document_id
+
+        if game.get("documentId"):
+            return game["documentId"]
+        if game.get("sourceUrl"):
+            return make_document_id("web", game["sourceUrl"])
+        return None
+
+    def attach_to_games(self) -> int:
+        """Attach thumbnail references to catalog games by their source document."""
+        from app.services.game_search import game_search_service
+
+        attached = 0
+        for game in game_search_service.mock_games:
+            game["thumbnails"] = self.thumbnails_for_document(self.game_document_id(game))
+            attached += bool(game["thumbnails"])
+        return attached
+
+    def get_thumbnail_path(self, name: str) -> Optional[Path]:
+        """Filesystem path of a known thumbnail, None for unknown names."""
+        canonical = name.rsplit(".", 1)[0]
+        if self.thumbnails.get(canonical) != name:
+            return None
+        path = self.cache_dir / name
+        return path if path.exists() else None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "available": self.is_available(),
+            "images": len(self.images),
+            "thumbnails": len(self.thumbnails),
+            "documents_with_images": sum(1 for images in self.document_images.values() if images),
+            "last_run": self.last_run,
+        }
+
+    async def close(self) -> None:
+        """Shut the worker pool down without blocking the event loop."""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown)
+
+
+# Global service instance
+image_asset_service = ImageAssetService()
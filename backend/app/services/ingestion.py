@@ -0,0 +1,367 @@
+"""
+Document ingestion pipeline for crawled web data and local document folders.
+
+All sources are normalised into one document shape and published into a
+versioned catalog. Document texts are written to the packed corpus store,
+the in-memory catalog only keeps metadata. Downstream consumers (knowledge
+base, search) register listeners and are notified with the ids of changed
+documents whenever a new catalog version is published.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+import structlog
+
+from app.core.config import settings
+from app.services.corpus_store import corpus_store
+from app.services.document_extraction import document_extraction_service
+
+logger = structlog.get_logger()
+
+# Separator between the crawler's header block and the page text in texts/*.txt
+CRAWL_HEADER_SEPARATOR = "=" * 50
+CRAWL_LINKS_MARKER = "\nLINKS:\n"
+
+# Documents buffered before one batched write to the corpus store
+CORPUS_WRITE_BATCH = 200
+
+CatalogListener = Callable[[int, List[str], List[str]], Awaitable[None]]
+
+
+def make_document_id(source_type: str, key: str) -> str:
+    """Stable document id derived from the source type and URL or path."""
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return f"{source_type}_{digest}"
+
+
+def parse_crawled_text(raw: str) -> Dict[str, Optional[str]]:
+    """Split a crawler texts/*.txt file into header fields and page text."""
+    header, _, body = raw.partition(CRAWL_HEADER_SEPARATOR)
+    if not body:
+        header, body = "", raw
+
+    fields: Dict[str, Optional[str]] = {"title": None, "url": None, "crawled_at": None}
+    for line in header.splitlines():
+        key, _, value = line.partition(":")
+        value = value.strip()
+        if key == "Titel":
+            fields["title"] = value
+        elif key == "URL":
+            fields["url"] = value
+        elif key == "Zeitpunkt":
+            fields["crawled_at"] = value
+
+    fields["text"] = body.split(CRAWL_LINKS_MARKER, 1)[0].strip()
+    return fields
+
+
+class DocumentIngestionService:
+    """Streams documents from all data sources into a versioned catalog."""
+
+    def __init__(self):
+        """Initialize the ingestion service."""
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.catalog_version = 0
+        self.last_run: Dict[str, Any] = {}
+        self._listeners: List[CatalogListener] = []
+        self._lock = asyncio.Lock()
+
+    def add_listener(self, listener: CatalogListener) -> None:
+        """Register a coroutine called with (version, changed_ids, removed_ids)."""
+        self._listeners.append(listener)
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def iter_web_documents(self, web_data_dir: Optional[Path] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield documents from the crawler output in data/web_data.
+
+        Every crawl folder holds one texts/*.txt per page; summary.json, when
+        present, adds the image paths. Pages crawled more than once (the
+        "copy" folders) are yielded only once, keyed by URL.
+        """
+        web_data_dir = web_data_dir or settings.WEB_DATA_DIR
+        if not web_data_dir.exists():
+            return
+
+        # Loose files whose signature matches the catalog were ingested
+        # before; their text is already in the corpus store, so skip opening them.
+        known = {
+            document["source_path"]: document
+            for document in self.documents.values()
+            if document["source_type"] == "web"
+        }
+
+        seen_urls = set()
+        for crawl_dir in sorted(p for p in web_data_dir.iterdir() if p.is_dir()):
+            texts_dir = crawl_dir / "texts"
+            if not texts_dir.exists():
+                continue
+            image_paths = None
+
+            for text_path in sorted(texts_dir.glob("*.txt")):
+                source_path = str(text_path.relative_to(web_data_dir))
+                stat = text_path.stat()
+                signature = [stat.st_mtime_ns, stat.st_size]
+                previous = known.get(source_path)
+                if previous and previous.get("source_signature") == signature:
+                    seen_urls.add(previous["source_url"])
+                    continue
+
+                parsed = parse_crawled_text(text_path.read_text(encoding="utf-8", errors="replace"))
+                url = parsed["url"] or source_path
+                if url in seen_urls or not parsed["text"]:
+                    continue
+                seen_urls.add(url)
+                if image_paths is None:
+                    image_paths = self._load_image_paths(crawl_dir)
+
+                yield {
+                    "document_id": make_document_id("web", url),
+                    "title": parsed["title"] or text_path.stem,
+                    "text": parsed["text"],
+                    "source_type": "web",
+                    "source_url": url,
+                    "source_path": source_path,
+                    "source_signature": signature,
+                    "collection": crawl_dir.name.removesuffix(" copy"),
+                    "format": "html",
+                    "pages": 1,
+                    "image_paths": image_paths.get(url, []),
+                    "updated_at": parsed["crawled_at"],
+                }
+
+    def _load_image_paths(self, crawl_dir: Path) -> Dict[str, List[str]]:
+        summary_path = crawl_dir / "summary.json"
+        if not summary_path.exists():
+            return {}
+        try:
+            entries = json.loads(summary_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Could not read crawl summary", path=str(summary_path), error=str(e))
+            return {}
+        return {
+            entry["url"]: entry.get("image_paths") or []
+            for entry in entries
+            if isinstance(entry, dict) and entry.get("url")
+        }
+
+    def local_source_roots(self) -> Dict[str, Path]:
+        """Folders scanned for leader documents, keyed by source type."""
+        return {
+            "local": settings.LOCAL_DATA_DIR,
+            "google_drive": settings.GOOGLE_DRIVE_DATA_DIR,
+        }
+
+    async def iter_local_documents(
+        self,
+        paths: Optional[List[Path]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Extract and yield documents from data/local and data/google_drive.
+
+        Args:
+            paths: Restrict extraction to these files (default: all supported files)
+        """
+        roots = self.local_source_roots()
+        if paths is None:
+            paths = document_extraction_service.discover_files(roots.values())
+
+        async for result in document_extraction_service.extract_files(paths):
+            path = Path(result["path"])
+            if result["error"]:
+                logger.warning("Document extraction failed", path=str(path), error=result["error"])
+                continue
+            if not result["text"].strip():
+                continue
+
+            try:
+                modified_at = datetime.utcfromtimestamp(path.stat().st_mtime).isoformat()
+            except FileNotFoundError:
+                # Deleted while it was being extracted
+                continue
+
+            source_type, relative_path = self._local_source(path, roots)
+            yield {
+                "document_id": make_document_id(source_type, relative_path),
+                "title": result["title"] or path.stem,
+                "text": result["text"],
+                "source_type": source_type,
+                "source_url": None,
+                "source_path": relative_path,
+                "collection": source_type,
+                "format": result["format"],
+                "pages": result["pages"],
+                "image_paths": [],
+                "updated_at": modified_at,
+            }
+
+    def _local_source(self, path: Path, roots: Dict[str, Path]):
+        """Source type and root-relative path of a local document."""
+        resolved = path.resolve()
+        for source_type, root in roots.items():
+            if resolved.is_relative_to(root.resolve()):
+                return source_type, str(resolved.relative_to(root.resolve()))
+        return "local", str(path)
+
+    def local_document_id(self, path: Path) -> str:
+        """Catalog id a local file is (or would be) stored under."""
+        source_type, relative_path = self._local_source(path, self.local_source_roots())
+        return make_document_id(source_type, relative_path)
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+
+    async def ingest(
+        self,
+        documents: Any,
+        source: str,
+        removed_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Stream documents into the catalog and publish a new version.
+
+        Args:
+            documents: Iterable or async iterable of document dicts
+            source: Name of the run for logging and stats
+            removed_ids: Document ids to drop from the catalog
+
+        Returns:
+            Run statistics
+        """
+        started = time.perf_counter()
+        changed_ids: List[str] = []
+
+        async with self._lock:
+            batch: List[Dict[str, Any]] = []
+            async for document in self._aiter(documents):
+                batch.append(document)
+                if len(batch) >= CORPUS_WRITE_BATCH:
+                    changed_ids.extend(await self._store_batch(batch))
+                    batch = []
+            changed_ids.extend(await self._store_batch(batch))
+            pages = sum(self.documents[doc_id].get("pages", 0) for doc_id in changed_ids)
+
+            removed = []
+            for doc_id in removed_ids or []:
+                if self.documents.pop(doc_id, None) is not None:
+                    corpus_store.delete(doc_id)
+                    removed.append(doc_id)
+            version = await self._publish(changed_ids, removed)
+
+        duration = time.perf_counter() - started
+        self.last_run = {
+            "source": source,
+            "documents": len(changed_ids),
+            "removed": len(removed),
+            "pages": pages,
+            "duration_seconds": round(duration, 3),
+            "catalog_version": version,
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        logger.info("Ingestion run completed", **self.last_run)
+        return self.last_run
+
+    async def _store_batch(self, batch: List[Dict[str, Any]]) -> List[str]:
+        """Write texts to the corpus store and metadata to the catalog."""
+        if not batch:
+            return []
+        items = []
+        for document in batch:
+            meta = {key: value for key, value in document.items() if key != "text"}
+            items.append((document["document_id"], document["text"], meta))
+            self.documents[document["document_id"]] = meta
+        return await asyncio.to_thread(corpus_store.put_many, items)
+
+    def load_catalog(self) -> int:
+        """
+        Restore the catalog metadata from the corpus store index.
+
+        Returns:
+            Number of documents restored
+        """
+        self.documents = {doc_id: meta for doc_id, meta in corpus_store.iter_meta() if meta}
+        if self.documents:
+            self.catalog_version = max(self.catalog_version, 1)
+        logger.info("Document catalog loaded", documents=len(self.documents))
+        return len(self.documents)
+
+    def get_document_text(self, document_id: str) -> Optional[str]:
+        """Read a document's text from the packed corpus store."""
+        return corpus_store.get_text(document_id)
+
+    async def ingest_web_data(self) -> Dict[str, Any]:
+        """Ingest all crawled web pages."""
+        return await self.ingest(self.iter_web_documents(), source="web")
+
+    async def ingest_local_documents(self, paths: Optional[List[Path]] = None) -> Dict[str, Any]:
+        """Ingest PDF/DOCX/XLSX files from the local and Google Drive folders."""
+        stats = await self.ingest(self.iter_local_documents(paths), source="local")
+        stats["formats"] = document_extraction_service.get_stats()
+        return stats
+
+    async def ingest_local_changes(
+        self,
+        changed_paths: List[Path],
+        removed_paths: List[Path]
+    ) -> Dict[str, Any]:
+        """Re-extract only the changed files and drop deleted ones."""
+        removed_ids = [self.local_document_id(path) for path in removed_paths]
+        stats = await self.ingest(
+            self.iter_local_documents(changed_paths) if changed_paths else [],
+            source="local_incremental",
+            removed_ids=removed_ids,
+        )
+        stats["formats"] = document_extraction_service.get_stats()
+        return stats
+
+    async def _publish(self, changed_ids: List[str], removed_ids: List[str]) -> int:
+        if not changed_ids and not removed_ids:
+            return self.catalog_version
+
+        self.catalog_version += 1
+        for listener in self._listeners:
+            try:
+                await listener(self.catalog_version, changed_ids, removed_ids)
+            except Exception as e:
+                logger.error("Catalog listener failed", error=str(e))
+        return self.catalog_version
+
+    @staticmethod
+    async def _aiter(documents: Any) -> AsyncIterator[Dict[str, Any]]:
+        if hasattr(documents, "__aiter__"):
+            async for document in documents:
+                yield document
+        else:
+            for document in documents:
+                yield document
+
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get a catalog document by id."""
+        return self.documents.get(document_id)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Catalog size, version and statistics of the last run."""
+        by_source: Dict[str, int] = {}
+        for document in self.documents.values():
+            by_source[document["source_type"]] = by_source.get(document["source_type"], 0) + 1
+        return {
+            "catalog_version": self.catalog_version,
+            "documents": len(self.documents),
+            "documents_by_source": by_source,
+            "last_run": self.last_run,
+            "extraction": document_extraction_service.get_stats(),
+            "corpus": corpus_store.get_stats(),
+        }
+
+
+# Global service instance
+ingestion_service = DocumentIngestionService()
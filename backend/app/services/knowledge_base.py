@@ -0,0 +1,418 @@
+"""
+Local knowledge base for retrieval-augmented answers.
+
+Catalog documents from the configured collections (ppoe.at Ausbildung,
+Programm and Service pages, the GuSp wiki, local documents) are split into
+overlapping, heading-aware chunks and embedded in batches. Vectors are kept
+as one L2-normalised float32 matrix, so a query is a single matrix-vector
+product plus a partial sort, which stays in the low milliseconds for the
+corpus sizes we deal with.
+
+Embeddings come from the Azure OpenAI embedding deployment when configured,
+otherwise from the local hashing embedder. The store records which embedder
+built it and rebuilds itself when that changes.
+
+Files on disk:
+
+    manifest.json  embedder, dimensions, version and build statistics
+    chunks.json    chunk texts and source metadata, one entry per matrix row
+    vectors.npy    float32 matrix (chunks x dimensions)
+"""
+
+import asyncio
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.services.azure_openai import azure_openai_service
+from app.services.embedding_dispatcher import embedding_dispatcher
+from app.services.rate_limiter import Priority
+from app.services.text_processing import hashing_embedder, split_sentences
+
+logger = structlog.get_logger()
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*$", re.MULTILINE)
+
+
+def _split_long(sentence: str, chunk_size: int) -> List[str]:
+    """Break a sentence longer than a chunk at word boundaries."""
+    if len(sentence) <= chunk_size:
+        return [sentence]
+    pieces, current = [], ""
+    for word in sentence.split():
+        if current and len(current) + len(word) + 1 > chunk_size:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _sections(text: str) -> Iterable[Tuple[List[str], str]]:
+    """Yield (heading path, body) for each markdown section of a text."""
+    headings: List[Tuple[int, str]] = []
+    position = 0
+    for match in HEADING_PATTERN.finditer(text):
+        yield [title for _, title in headings], text[position:match.start()]
+        level = len(match.group(1))
+        headings = [(lvl, title) for lvl, title in headings if lvl < level]
+        headings.append((level, match.group(2)))
+        position = match.end()
+    yield [title for _, title in headings], text[position:]
+
+
+def chunk_text(text: str, chunk_size: int, overlap: int) -> List[Tuple[str, str]]:
+    """
+    Split a text into overlapping chunks that never cross a heading.
+
+    Args:
+        text: Document text, optionally with markdown headings
+        chunk_size: Maximum characters per chunk
+        overlap: Characters of trailing sentences repeated in the next chunk
+
+    Returns:
+        List of (heading path, chunk text)
+    """
+    chunks: List[Tuple[str, str]] = []
+    for heading_path, body in _sections(text):
+        sentences = [
+            piece
+            for sentence in split_sentences(" ".join(body.split()))
+            for piece in _split_long(sentence, chunk_size)
+        ]
+        heading = " › ".join(heading_path)
+        window: List[str] = []
+        length = 0
+        for sentence in sentences:
+            if window and length + len(sentence) + 1 > chunk_size:
+                chunks.append((heading, " ".join(window)))
+                # Carry the tail of the previous chunk over as context
+                carried: List[str] = []
+                carried_length = 0
+                for previous in reversed(window):
+                    if carried_length + len(previous) > overlap:
+                        break
+                    carried.insert(0, previous)
+                    carried_length += len(previous) + 1
+                window, length = carried, carried_length
+            window.append(sentence)
+            length += len(sentence) + 1
+        if window:
+            chunks.append((heading, " ".join(window)))
+    return chunks
+
+
+class KnowledgeBaseService:
+    """Builds, persists and queries the local chunk vector store."""
+
+    def __init__(self, directory: Optional[Path] = None):
+        """Initialize the knowledge base service."""
+        self.directory = Path(directory or settings.KNOWLEDGE_BASE_DIR)
+        self.chunk_size = settings.KNOWLEDGE_CHUNK_SIZE
+        self.chunk_overlap = settings.KNOWLEDGE_CHUNK_OVERLAP
+        self.chunks: List[Dict[str, Any]] = []
+        self.vectors = np.zeros((0, hashing_embedder.dimensions), dtype=np.float32)
+        self.embedder: Optional[str] = None
+        self.version = 0
+        self.build_stats: Dict[str, Any] = {}
+        self.query_stats = {"queries": 0, "total_ms": 0.0, "last_ms": 0.0}
+        self._lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Embedding
+    # ------------------------------------------------------------------
+
+    def _preferred_embedder(self) -> str:
+        if azure_openai_service.is_available():
+            return f"azure:{settings.AZURE_EMBEDDING_DEPLOYMENT_NAME}"
+        return hashing_embedder.name
+
+    async def _embed(self, texts: List[str], embedder: str) -> Optional[np.ndarray]:
+        """Embed texts with the given embedder as a normalised float32 matrix."""
+        if not texts:
+            return np.zeros((0, self.vectors.shape[1]), dtype=np.float32)
+        if embedder == hashing_embedder.name:
+            return await asyncio.to_thread(hashing_embedder.embed_many, texts)
+
+        if len(texts) == 1:
+            # Single queries are coalesced with concurrent ones
+            embedding = await embedding_dispatcher.embed(texts[0])
+            embeddings = [embedding] if embedding is not None else None
+        else:
+            embeddings = await azure_openai_service.generate_embeddings(texts, priority=Priority.BATCH)
+        if embeddings is None:
+            return None
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def is_relevant(self, document: Dict[str, Any]) -> bool:
+        """Whether a catalog document belongs to one of the configured collections."""
+        collection = document.get("collection") or ""
+        return any(collection.startswith(prefix) for prefix in settings.KNOWLEDGE_BASE_COLLECTIONS)
+
+    def _chunk_documents(self, document_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        from app.services.ingestion import ingestion_service
+
+        chunks: List[Dict[str, Any]] = []
+        for doc_id in document_ids:
+            document = ingestion_service.get_document(doc_id)
+            if not document or not self.is_relevant(document):
+                continue
+            text = ingestion_service.get_document_text(doc_id)
+            if not text:
+                continue
+            for position, (heading, chunk) in enumerate(
+                chunk_text(text, self.chunk_size, self.chunk_overlap)
+            ):
+                chunks.append({
+                    "chunk_id": f"{doc_id}:{position}",
+                    "document_id": doc_id,
+                    "title": document.get("title"),
+                    "heading": heading,
+                    "text": chunk,
+                    "source_url": document.get("source_url"),
+                    "source_path": document.get("source_path"),
+                    "collection": document.get("collection"),
+                })
+        return chunks
+
+    @staticmethod
+    def _embedding_input(chunk: Dict[str, Any]) -> str:
+        # Title and heading give short chunks the context they lack on their own
+        context = " › ".join(part for part in (chunk["title"], chunk["heading"]) if part)
+        return f"{context}\n{chunk['text']}" if context else chunk["text"]
+
+    async def rebuild(self) -> Dict[str, Any]:
+        """Chunk and embed every relevant catalog document from scratch."""
+        from app.services.ingestion import ingestion_service
+
+        async with self._lock:
+            started = time.perf_counter()
+            embedder = self._preferred_embedder()
+            chunks = await asyncio.to_thread(
+                self._chunk_documents, list(ingestion_service.documents)
+            )
+            vectors = await self._embed([self._embedding_input(c) for c in chunks], embedder)
+            if vectors is None and embedder != hashing_embedder.name:
+                logger.warning("Embedding deployment failed, using hashing embedder")
+                embedder = hashing_embedder.name
+                vectors = await self._embed([self._embedding_input(c) for c in chunks], embedder)
+
+            self.chunks, self.vectors, self.embedder = chunks, vectors, embedder
+            self.version += 1
+            self.build_stats = {
+                "mode": "full",
+                "documents": len({chunk["document_id"] for chunk in chunks}),
+                "chunks_embedded": len(chunks),
+                "build_seconds": round(time.perf_counter() - started, 3),
+            }
+            await asyncio.to_thread(self._save)
+
+        logger.info("Knowledge base built", **self.build_stats, embedder=embedder)
+        return self.get_status()
+
+    async def update_documents(self, changed_ids: List[str], removed_ids: List[str]) -> Dict[str, Any]:
+        """
+        Re-chunk changed documents and drop removed ones.
+
+        Falls back to a full rebuild when the store was built with a different
+        embedder than the one available now, since vectors would not be comparable.
+        """
+        if self.embedder != self._preferred_embedder():
+            return await self.rebuild()
+
+        async with self._lock:
+            started = time.perf_counter()
+            stale = set(changed_ids) | set(removed_ids)
+            new_chunks = await asyncio.to_thread(self._chunk_documents, changed_ids)
+            new_vectors = await self._embed(
+                [self._embedding_input(c) for c in new_chunks], self.embedder
+            )
+            if new_vectors is None:
+                logger.error("Knowledge base update failed, embeddings unavailable")
+                return self.get_status()
+
+            keep = [row for row, chunk in enumerate(self.chunks) if chunk["document_id"] not in stale]
+            removed_chunks = len(self.chunks) - len(keep)
+            chunks = [self.chunks[row] for row in keep] + new_chunks
+            vectors = np.vstack([self.vectors[keep], new_vectors])
+            # Swap both at once so concurrent searches see a consistent store
+            self.chunks, self.vectors = chunks, vectors
+            self.version += 1
+            self.build_stats = {
+                "mode": "incremental",
+                "documents": len({chunk["document_id"] for chunk in chunks}),
+                "chunks_embedded": len(new_chunks),
+                "chunks_removed": removed_chunks,
+                "build_seconds": round(time.perf_counter() - started, 3),
+            }
+            await asyncio.to_thread(self._save)
+
+        logger.info("Knowledge base updated", **self.build_stats)
+        return self.get_status()
+
+    async def on_catalog_update(
+        self,
+        version: int,
+        changed_ids: List[str],
+        removed_ids: List[str]
+    ) -> None:
+        """Ingestion listener: keep the knowledge base in sync with the catalog."""
+        if not self.chunks and not self._manifest_path().exists():
+            await self.rebuild()
+        else:
+            await self.update_documents(changed_ids, removed_ids)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _manifest_path(self) -> Path:
+        return self.directory / "manifest.json"
+
+    def _save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        vectors_tmp = self.directory / "vectors.tmp.npy"
+        np.save(vectors_tmp, self.vectors)
+        chunks_tmp = self.directory / "chunks.json.tmp"
+        chunks_tmp.write_text(json.dumps(self.chunks, ensure_ascii=False), encoding="utf-8")
+        manifest_tmp = self.directory / "manifest.json.tmp"
+        manifest_tmp.write_text(
+            json.dumps({
+                "embedder": self.embedder,
+                "dimensions": int(self.vectors.shape[1]),
+                "version": self.version,
+                "build": self.build_stats,
+            }),
+            encoding="utf-8",
+        )
+        vectors_tmp.replace(self.directory / "vectors.npy")
+        chunks_tmp.replace(self.directory / "chunks.json")
+        # The manifest goes last and marks the store as complete
+        manifest_tmp.replace(self._manifest_path())
+
+    def load(self) -> int:
+        """
+        Load a previously built store from disk.
+
+        Returns:
+            Number of chunks loaded
+        """
+        try:
+            manifest = json.loads(self._manifest_path().read_text(encoding="utf-8"))
+            chunks = json.loads((self.directory / "chunks.json").read_text(encoding="utf-8"))
+            vectors = np.load(self.directory / "vectors.npy")
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning("Knowledge base unreadable, rebuild required", error=str(e))
+            return 0
+
+        if len(chunks) != vectors.shape[0]:
+            logger.warning("Knowledge base chunks and vectors out of sync, rebuild required")
+            return 0
+
+        self.chunks, self.vectors = chunks, vectors.astype(np.float32, copy=False)
+        self.embedder = manifest.get("embedder")
+        self.version = manifest.get("version", 0)
+        self.build_stats = manifest.get("build", {})
+        logger.info("Knowledge base loaded", chunks=len(chunks), embedder=self.embedder)
+        return len(chunks)
+
+    def store_bytes(self) -> int:
+        return sum(
+            path.stat().st_size
+            for path in (self._manifest_path(), self.directory / "chunks.json", self.directory / "vectors.npy")
+            if path.exists()
+        )
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
+    async def embed_query(self, text: str) -> Optional[np.ndarray]:
+        """Embed a query with the embedder the store was built with."""
+        vectors = await self._embed([text], self.embedder or self._preferred_embedder())
+        return None if vectors is None else vectors[0]
+
+    async def search(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        with_vectors: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve the chunks most similar to a query.
+
+        Args:
+            query: Natural language question
+            top_k: Number of chunks to return (defaults to KNOWLEDGE_TOP_K)
+            with_vectors: Attach each chunk's embedding as "vector" (for reranking)
+
+        Returns:
+            Chunks with source metadata and a cosine similarity score, best first
+        """
+        chunks, vectors, embedder = self.chunks, self.vectors, self.embedder
+        if not chunks or not query.strip():
+            return []
+
+        started = time.perf_counter()
+        query_vectors = await self._embed([query], embedder)
+        if query_vectors is None:
+            return []
+
+        top_k = top_k or settings.KNOWLEDGE_TOP_K
+        scores = vectors @ query_vectors[0]
+        # Partial sort: only the best candidates need to be ordered. Fetch a
+        # few extra because mirrored pages produce identical chunks.
+        pool_size = min(top_k * 4, len(chunks))
+        candidates = np.argpartition(-scores, pool_size - 1)[:pool_size]
+        results: List[Dict[str, Any]] = []
+        seen_texts = set()
+        for row in candidates[np.argsort(-scores[candidates])]:
+            if chunks[row]["text"] in seen_texts:
+                continue
+            seen_texts.add(chunks[row]["text"])
+            result = {**chunks[row], "score": round(float(scores[row]), 4)}
+            if with_vectors:
+                result["vector"] = vectors[row]
+            results.append(result)
+            if len(results) == top_k:
+                break
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.query_stats["queries"] += 1
+        self.query_stats["total_ms"] += elapsed_ms
+        self.query_stats["last_ms"] = round(elapsed_ms, 3)
+        return results
+
+    def get_status(self) -> Dict[str, Any]:
+        queries = self.query_stats["queries"]
+        return {
+            "version": self.version,
+            "embedder": self.embedder,
+            "dimensions": int(self.vectors.shape[1]),
+            "documents": len({chunk["document_id"] for chunk in self.chunks}),
+            "chunks": len(self.chunks),
+            "store_bytes": self.store_bytes(),
+            "build": self.build_stats,
+            "queries": queries,
+            "avg_query_ms": round(self.query_stats["total_ms"] / queries, 3) if queries else 0.0,
+            "last_query_ms": self.query_stats["last_ms"],
+        }
+
+
+# Global service instance
+knowledge_base_service = KnowledgeBaseService()
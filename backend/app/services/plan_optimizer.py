@@ -0,0 +1,230 @@
+"""
+Game selection for the main part of a Heimstunde.
+
+Chooses an ordered sequence of catalog games that fills the available
+minutes as completely as possible while covering the pedagogical goals,
+matching the theme, preferring well rated games, alternating active and
+calm phases and, across a semester, reusing materials the group already
+has. The candidates are pre-filtered by the game search (group size,
+location, age group, duration), and the sequence is found with a beam search
+over partial plans. With a few dozen candidates this takes a few
+milliseconds and needs no model call.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.text_processing import word_stems
+
+ACTIVE_TAGS = {"bewegung", "wettkampf", "outdoor", "sport", "laufen", "fangen", "action"}
+CALM_TAGS = {"ruhig", "kreativität", "sprache", "zuhören", "konzentration", "basteln", "reflexion"}
+
+# Objective weights
+FILL_WEIGHT = 4.0
+GOAL_WEIGHT = 3.0
+THEME_WEIGHT = 2.0
+RATING_WEIGHT = 1.0
+MATERIAL_WEIGHT = 0.5  # Materials the group already has (semester planning)
+REPEAT_WEIGHT = 1.0  # Per recently played game, scaled by its repeat penalty
+SAME_ENERGY_PENALTY = 0.5  # Per pair of consecutive games with the same energy
+MIXED_ENERGY_BONUS = 0.5  # Active and calm games both present
+ACTIVE_START_BONUS = 0.25  # Warm up after the opening
+CALM_END_BONUS = 0.25  # Settle down before the reflection
+
+
+def energy_level(game: Dict[str, Any]) -> str:
+    """"active", "calm" or "neutral", derived from the game's tags."""
+    tags = {tag.lower() for tag in game.get("tags", [])}
+    active, calm = bool(tags & ACTIVE_TAGS), bool(tags & CALM_TAGS)
+    if active and not calm:
+        return "active"
+    if calm and not active:
+        return "calm"
+    return "neutral"
+
+
+def game_materials(game: Dict[str, Any]) -> Set[str]:
+    """Materials a game needs, normalized; "Keine ..." entries are dropped."""
+    return {
+        material.strip().lower() for material in game.get("materials", [])
+        if not material.lower().startswith("keine")
+    }
+
+
+@dataclass
+class _Candidate:
+    game: Dict[str, Any]
+    duration: int
+    energy: str
+    goals: FrozenSet[int]
+    relevance: float
+    rating: float
+    material_reuse: float
+    repeat_penalty: float
+
+
+@dataclass
+class _State:
+    sequence: Tuple[int, ...] = ()
+    used: int = 0
+    goals: FrozenSet[int] = frozenset()
+    score: float = 0.0
+    details: Dict[str, float] = field(default_factory=dict)
+
+
+class PlanOptimizer:
+    """Beam search over game sequences for a given time budget."""
+
+    def select(
+        self,
+        games: List[Dict[str, Any]],
+        available_minutes: int,
+        goals: Optional[List[Dict[str, str]]] = None,
+        theme: Optional[str] = None,
+        beam_width: Optional[int] = None,
+        max_games: Optional[int] = None,
+        exclude_ids: Optional[Set[str]] = None,
+        known_materials: Optional[Set[str]] = None,
+        repeat_penalties: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Choose and order games for the main part.
+
+        Args:
+            games: Pre-filtered candidate games
+            available_minutes: Minutes to fill
+            goals: Pedagogical goals as {"type", "description"} dicts
+            theme: Theme of the Heimstunde
+            beam_width: Partial plans kept per step (defaults to PLAN_BEAM_WIDTH)
+            max_games: Maximum number of games (defaults to PLAN_MAX_GAMES)
+            exclude_ids: Games not to use (played recently)
+            known_materials: Materials already used, preferred again
+            repeat_penalties: Game ID -> penalty in [0, 1] for games that may be
+                used but were played recently
+
+        Returns:
+            Dict with the ordered games, used minutes, covered and uncovered
+            goals, the objective score with its parts and the search time
+        """
+        started = time.perf_counter()
+        goals = goals or []
+        beam_width = beam_width or settings.PLAN_BEAM_WIDTH
+        max_games = max_games or settings.PLAN_MAX_GAMES
+        candidates = self._candidates(
+            games, available_minutes, goals, theme,
+            exclude_ids or set(), known_materials or set(), repeat_penalties or {}
+        )
+
+        best = _State()
+        beam = [best]
+        expanded = 0
+        for _ in range(max_games):
+            # Same set of games ending with the same energy: only the best order survives
+            successors: Dict[Tuple[FrozenSet[int], str], _State] = {}
+            for state in beam:
+                for index, candidate in enumerate(candidates):
+                    if index in state.sequence or state.used + candidate.duration > available_minutes:
+                        continue
+                    expanded += 1
+                    sequence = state.sequence + (index,)
+                    successor = _State(
+                        sequence=sequence,
+                        used=state.used + candidate.duration,
+                        goals=state.goals | candidate.goals,
+                    )
+                    self._score(
+                        successor, candidates, available_minutes, len(goals), bool(theme), bool(known_materials)
+                    )
+                    key = (frozenset(sequence), candidate.energy)
+                    if key not in successors or successors[key].score < successor.score:
+                        successors[key] = successor
+            if not successors:
+                break
+            beam = sorted(successors.values(), key=lambda state: state.score, reverse=True)[:beam_width]
+            if beam[0].score > best.score:
+                best = beam[0]
+
+        return {
+            "games": [candidates[index].game for index in best.sequence],
+            "used_minutes": best.used,
+            "covered_goals": [goals[index] for index in sorted(best.goals)],
+            "uncovered_goals": [goal for index, goal in enumerate(goals) if index not in best.goals],
+            "score": round(best.score, 3),
+            "score_details": {name: round(value, 3) for name, value in best.details.items()},
+            "candidates": len(candidates),
+            "expanded": expanded,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def _candidates(
+        games: List[Dict[str, Any]],
+        available_minutes: int,
+        goals: List[Dict[str, str]],
+        theme: Optional[str],
+        exclude_ids: Set[str],
+        known_materials: Set[str],
+        repeat_penalties: Dict[str, float]
+    ) -> List[_Candidate]:
+        goal_stems = [word_stems(f"{goal['type']} {goal['description']}", min_length=4) for goal in goals]
+        theme_stems = word_stems(theme or "", min_length=4)
+        candidates = []
+        for game in games:
+            if game["durationMinutes"] > available_minutes or game["gameId"] in exclude_ids:
+                continue
+            materials = game_materials(game)
+            game_stems = word_stems(
+                " ".join([game["name"], game["description"], game["pedagogicalValue"], *game["tags"]]),
+                min_length=4
+            )
+            candidates.append(_Candidate(
+                game=game,
+                duration=game["durationMinutes"],
+                energy=energy_level(game),
+                goals=frozenset(i for i, stems in enumerate(goal_stems) if stems & game_stems),
+                relevance=len(theme_stems & game_stems) / len(theme_stems) if theme_stems else 0.0,
+                rating=(game.get("rating") or 3.0) / 5.0,
+                material_reuse=len(materials & known_materials) / len(materials) if materials else 1.0,
+                repeat_penalty=repeat_penalties.get(game["gameId"], 0.0),
+            ))
+        return candidates
+
+    @staticmethod
+    def _score(
+        state: _State,
+        candidates: List[_Candidate],
+        available_minutes: int,
+        goal_count: int,
+        has_theme: bool,
+        has_materials: bool
+    ) -> None:
+        chosen = [candidates[index] for index in state.sequence]
+        energies = [candidate.energy for candidate in chosen]
+        balance = -SAME_ENERGY_PENALTY * sum(
+            1 for a, b in zip(energies, energies[1:]) if a == b and a != "neutral"
+        )
+        if "active" in energies and "calm" in energies:
+            balance += MIXED_ENERGY_BONUS
+        if energies[0] == "active":
+            balance += ACTIVE_START_BONUS
+        if len(energies) > 1 and energies[-1] == "calm":
+            balance += CALM_END_BONUS
+
+        state.details = {
+            "fill": FILL_WEIGHT * state.used / available_minutes,
+            "goals": GOAL_WEIGHT * len(state.goals) / goal_count if goal_count else 0.0,
+            "theme": THEME_WEIGHT * sum(c.relevance for c in chosen) / len(chosen) if has_theme else 0.0,
+            "rating": RATING_WEIGHT * sum(c.rating for c in chosen) / len(chosen),
+            "materials": (
+                MATERIAL_WEIGHT * sum(c.material_reuse for c in chosen) / len(chosen) if has_materials else 0.0
+            ),
+            "repeats": -REPEAT_WEIGHT * sum(c.repeat_penalty for c in chosen),
+            "balance": balance,
+        }
+        state.score = sum(state.details.values())
+
+
+# Global optimizer instance
+plan_optimizer = PlanOptimizer()
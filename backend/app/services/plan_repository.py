@@ -0,0 +1,242 @@
+"""
+Persistent store for Heimstunde plans.
+
+Plans are kept in SQLite (settings.DATABASE_URL) as one JSON document per
+row, next to the columns used for listing: the date of the Heimstunde, the
+theme and the creation time, each with an index that ends in the plan ID
+(theme filters have one per sort order).
+Listing uses keyset pagination on those indexes: the cursor holds the sort
+key of the last plan returned, so every page is one index range scan no
+matter how deep the client has paged. Recently saved or read plans are
+served from a bounded in-memory cache.
+"""
+
+import asyncio
+import base64
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import structlog
+
+from app.core.config import settings
+from app.core.database import connect, sqlite_path
+
+logger = structlog.get_logger()
+
+# Sort orders: name -> (column, descending)
+ORDERS = {
+    "date": ("plan_date", False),
+    "created": ("created_at", True),
+}
+
+
+def encode_cursor(sort_key: str, plan_id: str) -> str:
+    """Opaque cursor for the plan after which the next page starts."""
+    return base64.urlsafe_b64encode(json.dumps([sort_key, plan_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Sort key and plan ID of a cursor. Raises ValueError for malformed cursors."""
+    try:
+        sort_key, plan_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    return str(sort_key), str(plan_id)
+
+
+class PlanRepository:
+    """SQLite-backed plan storage with keyset pagination and a hot-plan cache."""
+
+    def __init__(self, path: Optional[Path] = None, cache_size: Optional[int] = None):
+        """Initialize the repository. The database is opened on first use."""
+        self.path = path or sqlite_path()
+        self.cache_size = cache_size or settings.PLAN_CACHE_SIZE
+        # plan_id -> plan, least recently used first
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # One connection per executor thread; WAL lets them read concurrently
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.stats = {
+            "saved": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "pages": 0,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect(self.path, check_same_thread=False)
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS activity_plans (
+                    plan_id TEXT PRIMARY KEY,
+                    plan_date TEXT NOT NULL,
+                    theme TEXT,
+                    created_at TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_activity_plans_date
+                    ON activity_plans (plan_date, plan_id);
+                CREATE INDEX IF NOT EXISTS idx_activity_plans_theme
+                    ON activity_plans (theme, plan_date, plan_id);
+                CREATE INDEX IF NOT EXISTS idx_activity_plans_created
+                    ON activity_plans (created_at, plan_id);
+                CREATE INDEX IF NOT EXISTS idx_activity_plans_theme_created
+                    ON activity_plans (theme, created_at, plan_id);
+            """)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _remember(self, plan: Dict[str, Any]) -> None:
+        self._cache[plan["plan_id"]] = plan
+        self._cache.move_to_end(plan["plan_id"])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _row(plan: Dict[str, Any]) -> Tuple[str, str, Optional[str], str, str]:
+        data = json.dumps(plan, ensure_ascii=False, default=str)
+        return (plan["plan_id"], str(plan["date"]), plan.get("theme"), str(plan["created_at"]), data)
+
+    def _write(self, rows: List[Tuple[str, str, Optional[str], str, str]]) -> None:
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO activity_plans (plan_id, plan_date, theme, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _read(self, plan_id: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT data FROM activity_plans WHERE plan_id = ?", (plan_id,)
+        ).fetchone()
+        return row["data"] if row else None
+
+    def _read_page(
+        self,
+        order: str,
+        limit: int,
+        after: Optional[Tuple[str, str]],
+        date_from: Optional[date],
+        date_to: Optional[date],
+        theme: Optional[str]
+    ) -> List[sqlite3.Row]:
+        column, descending = ORDERS[order]
+        conditions: List[str] = []
+        params: List[Any] = []
+        if date_from:
+            conditions.append("plan_date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            conditions.append("plan_date <= ?")
+            params.append(date_to.isoformat())
+        if theme is not None:
+            conditions.append("theme = ?")
+            params.append(theme)
+        if after:
+            conditions.append(f"({column}, plan_id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+        return self._connection().execute(
+            f"SELECT {column} AS sort_key, plan_id, data FROM activity_plans {where} "
+            f"ORDER BY {column} {direction}, plan_id {direction} LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+
+    async def save(self, plan: Dict[str, Any]) -> None:
+        """Insert or replace one plan."""
+        await self.save_many([plan])
+
+    async def save_many(self, plans: List[Dict[str, Any]]) -> None:
+        """Insert or replace several plans in one transaction."""
+        if not plans:
+            return
+        rows = [self._row(plan) for plan in plans]
+        await asyncio.to_thread(self._write, rows)
+        # Cache the stored form, so cached and loaded plans look the same
+        for row in rows:
+            self._remember(json.loads(row[4]))
+        self.stats["saved"] += len(rows)
+
+    async def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """A plan by ID, or None if it does not exist."""
+        plan = self._cache.get(plan_id)
+        if plan is not None:
+            self.stats["cache_hits"] += 1
+            self._cache.move_to_end(plan_id)
+            return plan
+        self.stats["cache_misses"] += 1
+        data = await asyncio.to_thread(self._read, plan_id)
+        if data is None:
+            return None
+        plan = json.loads(data)
+        self._remember(plan)
+        return plan
+
+    async def list_plans(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        order: str = "date",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        theme: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of plans.
+
+        Args:
+            limit: Maximum number of plans
+            cursor: next_cursor of the previous page
+            order: "date" (Heimstunde date, oldest first) or "created" (newest first)
+            date_from: Only plans on or after this date
+            date_to: Only plans on or before this date
+            theme: Only plans with exactly this theme
+
+        Returns:
+            {"plans", "next_cursor"}; next_cursor is None on the last page
+
+        Raises:
+            ValueError: Unknown order or malformed cursor
+        """
+        if order not in ORDERS:
+            raise ValueError(f"Unknown order {order!r}")
+        after = decode_cursor(cursor) if cursor else None
+        # One extra row tells whether there is a next page
+        rows = await asyncio.to_thread(self._read_page, order, limit + 1, after, date_from, date_to, theme)
+        self.stats["pages"] += 1
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["sort_key"], rows[-1]["plan_id"])
+        return {
+            "plans": [json.loads(row["data"]) for row in rows],
+            "next_cursor": next_cursor,
+        }
+
+    async def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "cached": len(self._cache),
+            **self.stats,
+        }
+
+
+# Global repository instance
+plan_repository = PlanRepository()
@@ -0,0 +1,374 @@
+"""
+Planning service for Heimstunde (troop meeting) plans.
+
+Builds the time structure of a Heimstunde (opening, main part, reflection,
+closing) and fills the main part with catalog games chosen by the plan
+optimizer. A model call is only made on request, to write an introduction.
+"""
+
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import structlog
+
+from app.core.config import settings
+from app.services.azure_openai import azure_openai_service
+from app.services.game_search import game_search_service
+from app.services.plan_optimizer import energy_level, plan_optimizer
+from app.services.plan_repository import plan_repository
+from app.services.usage_accounting import usage_accounting
+
+logger = structlog.get_logger()
+
+DEFAULT_START_TIME = "19:00"
+
+ENERGY_LABELS = {"active": "aktive Phase", "calm": "ruhige Phase", "neutral": "ausgeglichen"}
+
+
+def main_part_minutes(duration: int) -> int:
+    """Minutes available for games: 70% of what the opening leaves."""
+    return int((duration - 10 if duration >= 10 else duration) * 0.7)
+
+
+def goal_dicts(pedagogical_goals: Optional[List[Any]]) -> List[Dict[str, str]]:
+    """Goals as {"type", "description"} dicts; plain strings serve as both."""
+    return [
+        goal if isinstance(goal, dict) else {"type": str(goal), "description": str(goal)}
+        for goal in (pedagogical_goals or [])
+    ]
+
+
+def add_minutes_to_time(time_str: str, minutes: int) -> str:
+    """Add minutes to a "HH:MM" time string."""
+    time_obj = datetime.strptime(time_str, "%H:%M")
+    return (time_obj + timedelta(minutes=minutes)).strftime("%H:%M")
+
+
+class PlanningService:
+    """Service creating structured Heimstunde plans."""
+
+    async def create_heimstunde_plan(
+        self,
+        duration: int,
+        participant_count: int,
+        theme: Optional[str] = None,
+        location: str = "indoor",
+        pedagogical_goals: Optional[List[Any]] = None,
+        age_group: str = "10-13",
+        plan_date: Optional[date] = None,
+        title: Optional[str] = None,
+        start_time: str = DEFAULT_START_TIME,
+        polish: bool = False,
+        selection: Optional[Dict[str, Any]] = None,
+        save: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Create a Heimstunde plan with games from the game search.
+
+        Args:
+            duration: Total duration in minutes
+            participant_count: Number of participants
+            theme: Theme of the Heimstunde
+            location: indoor, outdoor or flexible
+            pedagogical_goals: Goals as strings or {"type", "description"} dicts
+            age_group: Age group (e.g. "10-13")
+            plan_date: Date of the Heimstunde (defaults to today)
+            title: Plan title (defaults to one derived from theme or date)
+            start_time: Start time as "HH:MM"
+            polish: Let the model write a short introduction for the leaders
+            selection: Game selection made by the caller (PlanOptimizer.select
+                result); searched and optimized here when omitted
+            save: Store the plan in the plan repository (callers creating
+                many plans store them in bulk instead)
+
+        Returns:
+            Plan dict with schedule, material list, preparation notes and
+            the optimizer's result summary
+        """
+        plan_date = plan_date or date.today()
+        goals = goal_dicts(pedagogical_goals)
+
+        schedule: List[Dict[str, Any]] = []
+        current_time = start_time
+        remaining_duration = duration
+
+        # Opening (10 minutes)
+        if remaining_duration >= 10:
+            schedule.append({
+                "start_time": current_time,
+                "duration": 10,
+                "activity_name": "Begrüßung und Eröffnung",
+                "activity_type": "opening",
+                "description": "Gemeinsame Begrüßung, kurze Runde zum Befinden",
+                "materials": ["Kluft", "eventuell Fahne"],
+            })
+            remaining_duration -= 10
+            current_time = add_minutes_to_time(current_time, 10)
+
+        # Main activities (70% of the remaining time)
+        main_activity_time = main_part_minutes(duration)
+        if main_activity_time < 15:
+            selection = None
+        elif selection is None:
+            candidates = await self.find_candidates(main_activity_time, participant_count, location, age_group)
+            selection = plan_optimizer.select(candidates, main_activity_time, goals=goals, theme=theme)
+        if selection is not None:
+            used = 0
+            for game in selection["games"]:
+                schedule.append({
+                    "start_time": current_time,
+                    "duration": game["durationMinutes"],
+                    "activity_name": game["name"],
+                    "activity_type": "game",
+                    "description": game["description"],
+                    "materials": list(game.get("materials", [])),
+                    "notes": f"{game.get('pedagogicalValue')} ({ENERGY_LABELS[energy_level(game)]})",
+                    "game_id": game["gameId"],
+                })
+                used += game["durationMinutes"]
+                current_time = add_minutes_to_time(current_time, game["durationMinutes"])
+
+            # Without any fitting game, keep a block for the leaders to fill
+            if not selection["games"]:
+                activity_name = "Teambuilding-Spiel"
+                activity_description = "Spiel zur Stärkung des Gruppengefühls"
+                if theme:
+                    activity_name = f"Aktivität zum Thema '{theme}'"
+                    activity_description = f"Kreative Aktivität passend zum Thema {theme}"
+                schedule.append({
+                    "start_time": current_time,
+                    "duration": main_activity_time - used,
+                    "activity_name": activity_name,
+                    "activity_type": "main_activity",
+                    "description": activity_description,
+                    "materials": ["Je nach gewähltem Spiel"],
+                    "notes": "Spiel an Gruppengröße anpassen",
+                })
+                current_time = add_minutes_to_time(current_time, main_activity_time - used)
+                used = main_activity_time
+            # Minutes the games leave free go to the reflection
+            remaining_duration -= used
+
+        # Reflection/discussion
+        if remaining_duration >= 10:
+            reflection_time = min(remaining_duration - 5, int(remaining_duration * 0.7))
+            schedule.append({
+                "start_time": current_time,
+                "duration": reflection_time,
+                "activity_name": "Reflexion und Gespräch",
+                "activity_type": "reflection",
+                "description": "Gemeinsame Reflexion über die Aktivitäten und Erfahrungen",
+                "materials": ["Sitzkreis"],
+            })
+            remaining_duration -= reflection_time
+            current_time = add_minutes_to_time(current_time, reflection_time)
+
+        # Closing
+        if remaining_duration >= 5:
+            schedule.append({
+                "start_time": current_time,
+                "duration": remaining_duration,
+                "activity_name": "Abschluss",
+                "activity_type": "closing",
+                "description": "Gemeinsamer Abschluss, Termine und Verabschiedung",
+                "materials": [],
+            })
+
+        # Aggregate materials, keeping the order of first use
+        material_list = list(dict.fromkeys(
+            material for item in schedule for material in item["materials"]
+        ))
+
+        preparation_notes = [
+            "Raum/Platz entsprechend der geplanten Aktivitäten vorbereiten",
+            "Alle Materialien im Voraus bereitlegen",
+            f"Aktivitäten für {participant_count} Teilnehmer anpassen",
+        ]
+        if location == "outdoor":
+            preparation_notes.append("Wetterbericht prüfen und Backup-Plan für schlechtes Wetter")
+        for goal in (selection or {}).get("uncovered_goals", []):
+            preparation_notes.append(
+                f"Ziel '{goal['description']}' deckt kein Spiel ab – in der Reflexion aufgreifen"
+            )
+
+        now = datetime.utcnow()
+        plan = {
+            "plan_id": str(uuid.uuid4()),
+            "title": title or (f"Heimstunde: {theme}" if theme else f"Heimstunde {plan_date.strftime('%d.%m.%Y')}"),
+            "date": plan_date,
+            "duration": duration,
+            "participant_count": participant_count,
+            "age_group": age_group,
+            "theme": theme,
+            "location": location,
+            "pedagogical_goals": goals,
+            "schedule": schedule,
+            "material_list": material_list,
+            "preparation_notes": preparation_notes,
+            "created_at": now,
+            "updated_at": now,
+            "introduction": None,
+            "optimization": {
+                key: value for key, value in (selection or {}).items() if key != "games"
+            } or None,
+        }
+        if polish:
+            plan["introduction"] = await self._write_introduction(plan)
+        if save:
+            await plan_repository.save(plan)
+        logger.info(
+            "Heimstunde plan created",
+            plan_id=plan["plan_id"],
+            games=sum(1 for item in schedule if item.get("game_id")),
+            duration=duration,
+            optimizer_ms=(selection or {}).get("elapsed_ms")
+        )
+        return plan
+
+    async def suggestion_games(
+        self,
+        duration: int,
+        participant_range: Tuple[int, int],
+        location: str = "indoor",
+        goal_types: Optional[List[str]] = None,
+        age_group: str = "10-13",
+        theme: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Game selection shared by a bucket of suggestion requests (see suggestion_cache).
+
+        Args:
+            duration: Shortest total duration in the bucket, in minutes
+            participant_range: Smallest and largest group size; only games
+                fitting both are chosen
+            location: "indoor", "outdoor" or "flexible"
+            goal_types: Pedagogical goal types
+            age_group: Age group of the participants
+            theme: Theme of the Heimstunde
+
+        Returns:
+            {"selection": PlanOptimizer.select result, "alternatives": up to
+            three further fitting games}
+        """
+        smallest, largest = participant_range
+        goals = [{"type": goal_type, "description": goal_type} for goal_type in goal_types or []]
+        available_minutes = main_part_minutes(duration)
+        candidates = [
+            game for game in await self.find_candidates(available_minutes, smallest, location, age_group)
+            if game["maxParticipants"] >= largest
+        ]
+        selection = plan_optimizer.select(candidates, available_minutes, goals=goals, theme=theme)
+        chosen = {game["gameId"] for game in selection["games"]}
+        alternatives = [
+            {"name": game["name"], "type": "alternative_main", "game_id": game["gameId"]}
+            for game in candidates if game["gameId"] not in chosen
+        ][:3]
+        return {"selection": selection, "alternatives": alternatives}
+
+    async def suggest_plan(
+        self,
+        games: Dict[str, Any],
+        duration: int,
+        participant_count: int,
+        location: str = "indoor",
+        pedagogical_goals: Optional[List[Any]] = None,
+        age_group: str = "10-13",
+        theme: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Plan suggestion for one request around a (cached) game selection.
+
+        Args:
+            games: suggestion_games result for the request's bucket
+            duration: Requested total duration in minutes
+            participant_count: Requested number of participants
+            location: "indoor", "outdoor" or "flexible"
+            pedagogical_goals: Goals as strings or {"type", "description"} dicts
+            age_group: Age group of the participants
+            theme: Theme of the Heimstunde
+
+        Returns:
+            Dict in the shape of the PlanSuggestion model
+        """
+        # The shared selection only knows goal types; report this request's goals
+        goals = goal_dicts(pedagogical_goals)
+        selection = games["selection"]
+        covered_types = {goal["type"] for goal in selection["covered_goals"]}
+        uncovered_types = {goal["type"] for goal in selection["uncovered_goals"]}
+        plan = await self.create_heimstunde_plan(
+            duration=duration,
+            participant_count=participant_count,
+            theme=theme,
+            location=location,
+            pedagogical_goals=goals,
+            age_group=age_group,
+            selection={
+                **selection,
+                "covered_goals": [goal for goal in goals if goal["type"] in covered_types],
+                "uncovered_goals": [goal for goal in goals if goal["type"] in uncovered_types],
+            },
+            save=False
+        )
+        alternatives = list(games["alternatives"])
+        if location == "outdoor":
+            alternatives.append({"name": "Indoor-Programm bei Schlechtwetter", "type": "weather_alternative"})
+        materials = plan["material_list"]
+        return {
+            "suggested_schedule": plan["schedule"],
+            "alternative_activities": alternatives,
+            "estimated_preparation_time": min(60, 10 + 5 * len(materials)),
+            "difficulty_level": "easy" if len(materials) <= 1 else "medium" if len(materials) <= 4 else "challenging",
+        }
+
+    async def find_candidates(
+        self,
+        available_minutes: int,
+        participant_count: int,
+        location: str,
+        age_group: str
+    ) -> List[Dict[str, Any]]:
+        """Catalog games fitting the group and the main part, for the optimizer."""
+        # Filters only; ranking is up to the optimizer
+        result = await game_search_service.search_games(
+            duration_max=available_minutes,
+            participant_count=participant_count,
+            location=location if location in ("indoor", "outdoor") else None,
+            age_group=age_group,
+            use_semantic_search=False,
+            limit=settings.PLAN_CANDIDATE_LIMIT
+        )
+        return result["games"]
+
+    async def _write_introduction(self, plan: Dict[str, Any]) -> Optional[str]:
+        """A few sentences introducing the plan, written by the model (None if unavailable)."""
+        if not azure_openai_service.is_available():
+            return None
+        outline = "\n".join(
+            f"{item['start_time']} {item['activity_name']} ({item['duration']} Min.)" for item in plan["schedule"]
+        )
+        goals = ", ".join(goal["description"] for goal in plan["pedagogical_goals"]) or "keine"
+        with usage_accounting.attribute(feature="planning"):
+            response = await azure_openai_service.chat_completion(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "Du schreibst für Pfadfinderleiter:innen eine kurze, motivierende Einleitung "
+                                   "(höchstens vier Sätze) zu einem fertigen Heimstundenplan. Erfinde keine "
+                                   "zusätzlichen Programmpunkte."
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Thema: {plan['theme'] or 'frei'}\nZiele: {goals}\n"
+                                   f"Gruppe: {plan['participant_count']} Kinder ({plan['age_group']})\n{outline}"
+                    },
+                ],
+                temperature=0.6,
+                max_tokens=settings.PLAN_INTRODUCTION_MAX_TOKENS
+            )
+        if response.get("error") or response.get("mock") or response.get("degraded"):
+            return None
+        return (response.get("message") or "").strip() or None
+
+
+# Global service instance
+planning_service = PlanningService()
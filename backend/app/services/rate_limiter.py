@@ -0,0 +1,263 @@
+"""
+Rate-limit scheduler for Azure OpenAI calls.
+
+Every deployment has two token buckets mirroring its Azure quota: requests
+per minute and tokens per minute. Calls wait in a priority queue until both
+buckets can cover them, so interactive chat and search are always served
+before background ingestion and batch planning. Throttled (429) and
+transient failures are retried with jittered exponential backoff; a
+Retry-After from the service pauses the whole deployment, not just the
+failing call.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import openai
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class Priority(IntEnum):
+    """Scheduling priority, lower values are served first."""
+
+    INTERACTIVE = 0  # chat, search, knowledge lookups
+    BATCH = 1  # ingestion, knowledge base builds, batch planning
+
+
+class TokenBucket:
+    """Continuously refilling token bucket."""
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until the bucket holds the given amount (0 if it does now)."""
+        self._refill()
+        # Requests larger than the whole bucket would never fit, cap them
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Debit (or credit, if negative) a correction after the real cost is known."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class DeploymentLimiter:
+    """Priority queue in front of the request and token buckets of one deployment."""
+
+    def __init__(self, deployment: str, requests_per_minute: int, tokens_per_minute: int):
+        self.deployment = deployment
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute)
+        # (priority, sequence, tokens, future)
+        self._queue: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.paused_until = 0.0
+        self.stats = {
+            "granted": 0,
+            "throttled": 0,
+            "retries": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    async def acquire(self, tokens: int, priority: Priority) -> None:
+        """Wait until the call may be sent."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._queue, (int(priority), next(self._sequence), tokens, future))
+        started = time.monotonic()
+        self._dispatch()
+        await future
+
+        wait_ms = (time.monotonic() - started) * 1000
+        self.stats["granted"] += 1
+        self.stats["total_wait_ms"] += wait_ms
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+
+    def _dispatch(self) -> None:
+        """Grant queued calls in priority order for as long as the budgets allow."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            _, _, tokens, future = self._queue[0]
+            if future.cancelled():
+                heapq.heappop(self._queue)
+                continue
+            wait = max(
+                self.paused_until - time.monotonic(),
+                self.requests.wait_time(1),
+                self.tokens.wait_time(tokens),
+            )
+            if wait > 0:
+                # Strict priority: nothing overtakes the head of the queue
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            future.set_result(None)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the service reported the real usage."""
+        self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Stop granting calls for a while (Retry-After from a 429)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        by_priority: Dict[str, int] = {}
+        for priority, _, _, future in self._queue:
+            if not future.done():
+                name = Priority(priority).name.lower()
+                by_priority[name] = by_priority.get(name, 0) + 1
+        granted = self.stats["granted"]
+        return {
+            "queue_depth": sum(by_priority.values()),
+            "queue_by_priority": by_priority,
+            "granted": granted,
+            "throttled": self.stats["throttled"],
+            "retries": self.stats["retries"],
+            "avg_wait_ms": round(self.stats["total_wait_ms"] / granted, 3) if granted else 0.0,
+            "max_wait_ms": round(self.stats["max_wait_ms"], 3),
+            "paused_for_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            "requests_available": round(self.requests.level, 1),
+            "tokens_available": round(self.tokens.level),
+        }
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the service via retry-after-ms or Retry-After headers."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """Per-deployment limiters plus the retry policy for Azure OpenAI calls."""
+
+    def __init__(self):
+        """Initialize the scheduler."""
+        self.limiters: Dict[str, DeploymentLimiter] = {}
+
+    def _limits(self, deployment: str) -> Tuple[int, int]:
+        if deployment == settings.AZURE_EMBEDDING_DEPLOYMENT_NAME:
+            return settings.AZURE_EMBEDDING_RPM, settings.AZURE_EMBEDDING_TPM
+        return settings.AZURE_CHAT_RPM, settings.AZURE_CHAT_TPM
+
+    def limiter(self, deployment: str) -> DeploymentLimiter:
+        if deployment not in self.limiters:
+            self.limiters[deployment] = DeploymentLimiter(deployment, *self._limits(deployment))
+        return self.limiters[deployment]
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        ceiling = min(settings.AZURE_RETRY_MAX_DELAY, settings.AZURE_RETRY_BASE_DELAY * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def execute(
+        self,
+        deployment: str,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> T:
+        """
+        Run an API call within the deployment's budgets, retrying transient failures.
+
+        Args:
+            deployment: Azure deployment name the call goes to
+            call: Zero-argument coroutine factory performing the request
+            estimated_tokens: Expected prompt plus completion tokens
+            priority: Scheduling priority
+
+        Returns:
+            The call's result; the last error is raised once retries are exhausted
+        """
+        limiter = self.limiter(deployment)
+        attempt = 0
+        while True:
+            await limiter.acquire(estimated_tokens, priority)
+            try:
+                return await call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= settings.AZURE_MAX_RETRIES:
+                    raise
+                retry_after = retry_after_seconds(e)
+                delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+                if isinstance(e, openai.RateLimitError):
+                    limiter.stats["throttled"] += 1
+                    # Everyone queued for this deployment has to wait as well
+                    limiter.pause(delay)
+                limiter.stats["retries"] += 1
+                logger.warning(
+                    "Azure OpenAI call failed, retrying",
+                    deployment=deployment,
+                    error_type=type(e).__name__,
+                    attempt=attempt + 1,
+                    delay_seconds=round(delay, 2)
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def record_usage(self, deployment: str, estimated_tokens: int, actual_tokens: int) -> None:
+        if actual_tokens:
+            self.limiter(deployment).record_usage(estimated_tokens, actual_tokens)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.get_stats() for name, limiter in self.limiters.items()}
+
+
+# Global scheduler instance
+rate_limit_scheduler = RateLimitScheduler()
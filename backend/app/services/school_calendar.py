@@ -0,0 +1,100 @@
+"""
+School holiday calendar for recurring Heimstunden.
+
+Heimstunden take place during the school year only. The holidays are read
+from a JSON file (SCHOOL_HOLIDAYS_FILE) with one entry per holiday period:
+
+    {"holidays": [{"name": "Herbstferien", "start": "2025-10-27", "end": "2025-11-02"}, ...]}
+
+Start and end are inclusive. The file is loaded on first use; a missing or
+broken file yields an empty calendar and a warning.
+"""
+
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import structlog
+
+from app.core.config import resolve_data_file, settings
+
+logger = structlog.get_logger()
+
+
+class SchoolCalendar:
+    """Holiday lookup and meeting dates for a weekly Heimstunde."""
+
+    def __init__(self):
+        """Initialize the calendar."""
+        self._holidays: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.holidays())
+
+    def holidays(self) -> List[Dict[str, Any]]:
+        """Holiday periods as {"name", "start", "end"} with dates, sorted by start."""
+        if self._holidays is None:
+            self._holidays = self._load()
+        return self._holidays
+
+    def holiday_on(self, day: date) -> Optional[str]:
+        """Name of the holiday period containing the day, if any."""
+        for holiday in self.holidays():
+            if holiday["start"] <= day <= holiday["end"]:
+                return holiday["name"]
+        return None
+
+    def meeting_dates(
+        self,
+        start: date,
+        end: date,
+        weekday: int
+    ) -> Tuple[List[date], List[Dict[str, Any]]]:
+        """
+        Weekly meeting dates in a date range, without holidays.
+
+        Args:
+            start: First possible date (inclusive)
+            end: Last possible date (inclusive)
+            weekday: Meeting weekday (0 = Monday, 4 = Friday)
+
+        Returns:
+            The meeting dates and the skipped dates as {"date", "reason"}
+        """
+        dates: List[date] = []
+        skipped: List[Dict[str, Any]] = []
+        day = start + timedelta(days=(weekday - start.weekday()) % 7)
+        while day <= end:
+            holiday = self.holiday_on(day)
+            if holiday:
+                skipped.append({"date": day, "reason": holiday})
+            else:
+                dates.append(day)
+            day += timedelta(days=7)
+        return dates, skipped
+
+    def _load(self) -> List[Dict[str, Any]]:
+        path = resolve_data_file(settings.SCHOOL_HOLIDAYS_FILE)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)["holidays"]
+            holidays = [
+                {
+                    "name": entry["name"],
+                    "start": date.fromisoformat(entry["start"]),
+                    "end": date.fromisoformat(entry["end"]),
+                }
+                for entry in entries
+            ]
+        except FileNotFoundError:
+            logger.warning("School holiday calendar not found", path=str(path))
+            return []
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            logger.warning("School holiday calendar could not be read", path=str(path), error=str(e))
+            return []
+        logger.info("School holiday calendar loaded", path=str(path), holidays=len(holidays))
+        return sorted(holidays, key=lambda holiday: holiday["start"])
+
+
+# Global calendar instance
+school_calendar = SchoolCalendar()
@@ -0,0 +1,175 @@
+"""
+Speculative game search for chat turns.
+
+For a message that looks like a game request, the model usually answers the
+first completion with a search_games call, and only then does the search
+embed its query. The prefetcher starts a semantic search with the user
+message itself while the first completion is still running; game embeddings
+are cached, so the only remote step (the query embedding) overlaps the
+completion. If the model then asks for search_games with a query taken from
+the message, its filters are applied to the prefetched ranking and the
+result is returned right away. Otherwise the prefetch is discarded.
+
+Without embeddings the search is a local text match that needs no prefetch.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+import structlog
+
+from app.core.config import settings
+from app.services.azure_openai import azure_openai_service
+from app.services.game_search import game_search_service
+from app.services.text_processing import word_stems
+
+logger = structlog.get_logger()
+
+# Words that mark a message as a game request
+GAME_REQUEST_KEYWORDS = ("spiel", "aktivität")
+
+
+def looks_like_game_request(message: str) -> bool:
+    message_lower = message.lower()
+    return any(word in message_lower for word in GAME_REQUEST_KEYWORDS)
+
+
+class PrefetchedSearch:
+    """A speculative search started for one chat turn."""
+
+    def __init__(self, message: str):
+        self.message = message
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.used = False
+        self.task = asyncio.create_task(self._run())
+        # Discarded prefetches are never awaited; retrieve their outcome to keep asyncio quiet
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _run(self) -> Dict[str, Any]:
+        try:
+            return await game_search_service.search_games(
+                query=self.message,
+                limit=settings.SEARCH_PREFETCH_POOL_SIZE
+            )
+        finally:
+            self.finished = time.perf_counter()
+
+
+class GameSearchPrefetcher:
+    """Starts, matches and discards speculative game searches."""
+
+    def __init__(self):
+        """Initialize the prefetcher."""
+        self.stats = {
+            "started": 0,
+            "used": 0,
+            "discarded": 0,
+            "failed": 0,
+            "saved_ms_sum": 0.0,
+            "saved_ms_last": 0.0,
+        }
+
+    def start(self, user_message: str) -> Optional[PrefetchedSearch]:
+        """Start a speculative search if the message looks like a game request."""
+        if (
+            not settings.ENABLE_SEARCH_PREFETCH
+            or not looks_like_game_request(user_message)
+            or not azure_openai_service.embeddings_available()
+        ):
+            return None
+        self.stats["started"] += 1
+        return PrefetchedSearch(user_message)
+
+    def matches(self, prefetch: PrefetchedSearch, query: str) -> bool:
+        """Whether the model's query is mostly taken from the prefetched message."""
+        query_terms = word_stems(query)
+        if not query_terms:
+            return False
+        overlap = len(query_terms & word_stems(prefetch.message)) / len(query_terms)
+        return overlap >= settings.SEARCH_PREFETCH_MIN_OVERLAP
+
+    async def take(
+        self,
+        prefetch: Optional[PrefetchedSearch],
+        query: str,
+        duration_max: Optional[int] = None,
+        participant_count: Optional[int] = None,
+        location: Optional[str] = None,
+        age_group: Optional[str] = None,
+        limit: int = 10
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Serve a search_games call from the prefetched ranking.
+
+        Args:
+            prefetch: Speculative search of the current turn, if any
+            query: Query requested by the model
+            duration_max, participant_count, location, age_group: Filters requested by the model
+            limit: Maximum number of results
+
+        Returns:
+            Result in the shape of GameSearchService.search_games, or None if
+            the prefetch does not apply and the search has to run normally
+        """
+        if prefetch is None or not self.matches(prefetch, query):
+            return None
+        waited_from = time.perf_counter()
+        try:
+            pool = await prefetch.task
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning("Prefetched game search failed", error=str(e))
+            return None
+        if pool["search_type"] != "semantic":
+            return None
+
+        games = game_search_service._apply_keyword_filters(
+            pool["games"],
+            duration_max=duration_max,
+            participant_count=participant_count,
+            location=location,
+            age_group=age_group
+        )[:limit]
+
+        # The normal search would have taken about as long as the prefetch did, starting now
+        saved_ms = max(0.0, ((prefetch.finished - prefetch.started) - (time.perf_counter() - waited_from)) * 1000)
+        if not prefetch.used:
+            prefetch.used = True
+            self.stats["used"] += 1
+        self.stats["saved_ms_sum"] += saved_ms
+        self.stats["saved_ms_last"] = saved_ms
+        logger.info("Prefetched game search used", query=query, saved_ms=round(saved_ms, 1))
+
+        return {
+            "games": games,
+            "total_found": len(games),
+            "search_type": "semantic_prefetched",
+            "query_processed": prefetch.message,
+            "filters_applied": {
+                "duration_max": duration_max,
+                "participant_count": participant_count,
+                "location": location,
+                "age_group": age_group,
+                "tags": None
+            }
+        }
+
+    def finish(self, prefetch: Optional[PrefetchedSearch]) -> None:
+        """End of the turn: cancel an unused prefetch."""
+        if prefetch is None or prefetch.used:
+            return
+        prefetch.task.cancel()
+        self.stats["discarded"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        used = self.stats["used"]
+        return {
+            **self.stats,
+            "hit_rate": used / self.stats["started"] if self.stats["started"] else 0.0,
+            "saved_ms_avg": self.stats["saved_ms_sum"] / used if used else 0.0,
+        }
+
+
+# Global prefetcher instance
+game_search_prefetcher = GameSearchPrefetcher()
@@ -0,0 +1,262 @@
+"""
+Semester planning: drafts for all Heimstunden in a date range.
+
+The meeting dates are the regular weekday without school holidays. The
+catalog is searched once and all weeks share that candidate list. Games are
+chosen week by week in date order, because each week depends on what the
+previous weeks used:
+
+- no game is repeated within SEMESTER_NO_REPEAT_WEEKS weeks; if the games
+  left cannot fill SEMESTER_MIN_FILL of the main part (small catalog), recent
+  games are allowed again at a cost that grows with their recency, and the
+  week reports which games it repeated,
+- the themes are worked through in order, each for a block of weeks,
+- materials used earlier in the semester are preferred.
+
+The selection takes well under a millisecond per week. Each week's plan is
+then built in a task of its own, at most SEMESTER_WORKERS at a time (the
+optional model-written introductions are the slow part), and every
+finished plan is reported as soon as it is ready. The plans are stored in
+one bulk insert at the end.
+"""
+
+import asyncio
+import time
+from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import structlog
+
+from app.core.config import settings
+from app.services.plan_optimizer import game_materials, plan_optimizer
+from app.services.plan_repository import plan_repository
+from app.services.planning_service import main_part_minutes, planning_service
+from app.services.school_calendar import school_calendar
+
+logger = structlog.get_logger()
+
+
+class SemesterPlanner:
+    """Plans all Heimstunden of a semester with cross-week constraints."""
+
+    async def plan_semester(
+        self,
+        start: date,
+        end: date,
+        participant_count: int,
+        themes: Optional[List[str]] = None,
+        location: str = "indoor",
+        pedagogical_goals: Optional[List[Dict[str, str]]] = None,
+        age_group: str = "10-13",
+        weekday: Optional[int] = None,
+        start_time: Optional[str] = None,
+        duration: Optional[int] = None,
+        no_repeat_weeks: Optional[int] = None,
+        polish: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Plan every Heimstunde in a date range.
+
+        Args:
+            start: First possible date (inclusive)
+            end: Last possible date (inclusive)
+            participant_count: Number of participants
+            themes: Themes in the order they should follow each other
+            location: "indoor", "outdoor" or "flexible"
+            pedagogical_goals: Goals as {"type", "description"} dicts, for every week
+            age_group: Age group of the participants
+            weekday: Meeting weekday (defaults to HEIMSTUNDE_WEEKDAY)
+            start_time: Start time as "HH:MM" (defaults to HEIMSTUNDE_START_TIME)
+            duration: Duration in minutes (defaults to HEIMSTUNDE_DURATION_MINUTES)
+            no_repeat_weeks: Weeks before a game may be repeated
+                (defaults to SEMESTER_NO_REPEAT_WEEKS)
+            polish: Let the model write an introduction for every plan
+
+        Yields:
+            start: {"total", "dates", "skipped", "calendar_loaded", "candidates"}, plus
+                a "warning" when no holiday calendar was found
+            plan: {"index", "date", "theme", "repeated_game_ids", "plan", "done", "total"}
+                in order of completion
+            error: {"index", "date", "message", "error"} for a plan that failed
+            done: {"total", "failed", "saved", "selection_ms", "total_ms", "weeks"}
+                with the games chosen per week, after all plans are stored
+        """
+        started = time.perf_counter()
+        weekday = settings.HEIMSTUNDE_WEEKDAY if weekday is None else weekday
+        start_time = start_time or settings.HEIMSTUNDE_START_TIME
+        duration = duration or settings.HEIMSTUNDE_DURATION_MINUTES
+        no_repeat_weeks = settings.SEMESTER_NO_REPEAT_WEEKS if no_repeat_weeks is None else no_repeat_weeks
+        goals = pedagogical_goals or []
+        themes = themes or []
+
+        dates, skipped = school_calendar.meeting_dates(start, end, weekday)
+        available_minutes = main_part_minutes(duration)
+        candidates = await planning_service.find_candidates(
+            available_minutes, participant_count, location, age_group
+        )
+        start_event = {
+            "type": "start",
+            "total": len(dates),
+            "dates": dates,
+            "skipped": skipped,
+            "calendar_loaded": school_calendar.loaded,
+            "candidates": len(candidates),
+        }
+        if not school_calendar.loaded:
+            logger.warning("Semester planned without school holiday calendar")
+            start_event["warning"] = (
+                "Kein Schulferienkalender gefunden – Ferien werden nicht übersprungen, "
+                "bitte die Termine prüfen."
+            )
+        yield start_event
+
+        # Game selection, week by week
+        weeks: List[Dict[str, Any]] = []
+        last_played: Dict[str, date] = {}
+        known_materials: Set[str] = set()
+        for index, day in enumerate(dates):
+            theme = themes[index * len(themes) // len(dates)] if themes else None
+            selection, repeated = self._select_week(
+                candidates, day, available_minutes, goals, theme, last_played, known_materials, no_repeat_weeks
+            )
+            for game in selection["games"]:
+                last_played[game["gameId"]] = day
+                known_materials |= game_materials(game)
+            weeks.append({
+                "index": index,
+                "date": day,
+                "theme": theme,
+                "repeated_game_ids": repeated,
+                "selection": selection,
+            })
+        selection_ms = (time.perf_counter() - started) * 1000
+
+        # Plan building, concurrently
+        workers = asyncio.Semaphore(settings.SEMESTER_WORKERS)
+
+        async def build(week: Dict[str, Any]) -> Dict[str, Any]:
+            async with workers:
+                try:
+                    week["plan"] = await planning_service.create_heimstunde_plan(
+                        duration=duration,
+                        participant_count=participant_count,
+                        theme=week["theme"],
+                        location=location,
+                        pedagogical_goals=goals,
+                        age_group=age_group,
+                        plan_date=week["date"],
+                        start_time=start_time,
+                        polish=polish,
+                        selection=week["selection"],
+                        save=False
+                    )
+                except Exception as e:
+                    logger.error("Semester plan failed", date=str(week["date"]), error=str(e))
+                    week["error"] = str(e)
+                return week
+
+        tasks = [asyncio.create_task(build(week)) for week in weeks]
+        done = failed = 0
+        try:
+            for next_week in asyncio.as_completed(tasks):
+                week = await next_week
+                done += 1
+                if "error" in week:
+                    failed += 1
+                    yield {
+                        "type": "error",
+                        "index": week["index"],
+                        "date": week["date"],
+                        "message": "Der Plan für diesen Termin konnte nicht erstellt werden.",
+                        "error": week["error"],
+                    }
+                    continue
+                yield {
+                    "type": "plan",
+                    "index": week["index"],
+                    "date": week["date"],
+                    "theme": week["theme"],
+                    "repeated_game_ids": week["repeated_game_ids"],
+                    "plan": week["plan"],
+                    "done": done,
+                    "total": len(weeks),
+                }
+        finally:
+            # Client gone: stop the plans still being built
+            for task in tasks:
+                task.cancel()
+
+        # One transaction for the whole semester
+        plans = [week["plan"] for week in weeks if "plan" in week]
+        await plan_repository.save_many(plans)
+
+        total_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "Semester planned",
+            weeks=len(weeks),
+            skipped=len(skipped),
+            failed=failed,
+            selection_ms=round(selection_ms, 1),
+            total_ms=round(total_ms, 1)
+        )
+        yield {
+            "type": "done",
+            "total": len(weeks),
+            "failed": failed,
+            "saved": len(plans),
+            "selection_ms": round(selection_ms, 2),
+            "total_ms": round(total_ms, 2),
+            "weeks": [
+                {
+                    "date": week["date"],
+                    "plan_id": week["plan"]["plan_id"] if "plan" in week else None,
+                    "theme": week["theme"],
+                    "game_ids": [game["gameId"] for game in week["selection"]["games"]],
+                    "repeated_game_ids": week["repeated_game_ids"],
+                }
+                for week in weeks
+            ],
+        }
+
+    @staticmethod
+    def _select_week(
+        candidates: List[Dict[str, Any]],
+        day: date,
+        available_minutes: int,
+        goals: List[Dict[str, str]],
+        theme: Optional[str],
+        last_played: Dict[str, date],
+        known_materials: Set[str],
+        no_repeat_weeks: int
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """Selection for one week and the IDs of games it had to repeat early."""
+        weeks_since = {
+            game_id: (day - played).days // 7 for game_id, played in last_played.items()
+        }
+        recent = {game_id: weeks for game_id, weeks in weeks_since.items() if weeks < no_repeat_weeks}
+        selection = plan_optimizer.select(
+            candidates,
+            available_minutes,
+            goals=goals,
+            theme=theme,
+            exclude_ids=set(recent),
+            known_materials=known_materials
+        )
+        if not recent or selection["used_minutes"] >= settings.SEMESTER_MIN_FILL * available_minutes:
+            return selection, []
+
+        # Too few games left: allow recent ones, the more recent the more expensive
+        selection = plan_optimizer.select(
+            candidates,
+            available_minutes,
+            goals=goals,
+            theme=theme,
+            known_materials=known_materials,
+            repeat_penalties={
+                game_id: 1 - weeks / no_repeat_weeks for game_id, weeks in recent.items()
+            }
+        )
+        return selection, [game["gameId"] for game in selection["games"] if game["gameId"] in recent]
+
+
+# Global planner instance
+semester_planner = SemesterPlanner()
@@ -0,0 +1,202 @@
+"""
+Cache for Heimstunde plan suggestions.
+
+Many leaders ask for suggestions with nearly the same request: 90 minutes, a
+dozen participants, indoors. Requests are therefore reduced to a canonical
+feature key (duration bucket, participant bucket, location, age group,
+sorted goal types, normalized theme). What is cached per key is the
+expensive part, the game selection: it is made for the shortest duration of
+the bucket and with games that fit every group size in it, so it fits every
+request in the bucket. The schedule around it is built per request for the
+requested duration and group size.
+
+Entries follow stale-while-revalidate. A fresh entry is served as is. An
+entry older than SUGGESTION_CACHE_TTL_SECONDS is still served immediately
+while one background task recomputes it. Only entries older than SUGGESTION_CACHE_MAX_STALE_SECONDS
+and unknown keys are computed on the request path, and concurrent requests
+for the same key share that computation.
+"""
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+DURATION_BUCKET_MINUTES = 15
+# Upper bounds of the participant buckets; larger groups are keyed exactly
+PARTICIPANT_BUCKET_BOUNDS = (5, 8, 12, 16, 24, 32, 48)
+
+
+def participant_bucket(participant_count: int) -> Tuple[int, int]:
+    """Smallest and largest group size sharing suggestions with this one."""
+    lower = 1
+    for bound in PARTICIPANT_BUCKET_BOUNDS:
+        if participant_count <= bound:
+            return lower, bound
+        lower = bound + 1
+    return participant_count, participant_count
+
+
+def duration_bucket(duration: int) -> int:
+    """Shortest duration sharing suggestions with this one."""
+    return max(DURATION_BUCKET_MINUTES, duration // DURATION_BUCKET_MINUTES * DURATION_BUCKET_MINUTES)
+
+
+def suggestion_features(
+    duration: int,
+    participant_count: int,
+    location: str,
+    age_group: str,
+    goal_types: List[str],
+    theme: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Canonical features of a planning request.
+
+    Returns:
+        Dict with duration (bucket start), participants (bucket bounds),
+        location, age_group, goal_types (sorted, deduplicated) and theme
+        (lower case, single spaces), plus the cache key built from them
+    """
+    features = {
+        "duration": duration_bucket(duration),
+        "participants": participant_bucket(participant_count),
+        "location": location.strip().lower(),
+        "age_group": age_group.strip(),
+        "goal_types": sorted({goal_type.strip().lower() for goal_type in goal_types if goal_type.strip()}),
+        "theme": re.sub(r"\s+", " ", theme.strip().lower()) if theme and theme.strip() else None,
+    }
+    features["key"] = "|".join([
+        f"d{features['duration']}",
+        "p{}-{}".format(*features["participants"]),
+        features["location"],
+        features["age_group"],
+        ",".join(features["goal_types"]),
+        features["theme"] or "",
+    ])
+    return features
+
+
+class SuggestionCache:
+    """Bounded LRU cache with stale-while-revalidate and per-key single flight."""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        max_stale_seconds: Optional[float] = None
+    ):
+        """Initialize the suggestion cache."""
+        self.max_entries = max_entries or settings.SUGGESTION_CACHE_MAX_ENTRIES
+        self.ttl = ttl_seconds if ttl_seconds is not None else settings.SUGGESTION_CACHE_TTL_SECONDS
+        self.max_stale = (
+            max_stale_seconds if max_stale_seconds is not None
+            else settings.SUGGESTION_CACHE_MAX_STALE_SECONDS
+        )
+        # key -> {"value", "computed_at"}, least recently used first
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # key -> computation in progress (request path or background refresh)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "shared": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+
+    async def get(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Cached value for a key, computing or refreshing it as needed.
+
+        Args:
+            key: Canonical feature key (see suggestion_features)
+            compute: Makes the game selection for the key's bucket
+
+        Returns:
+            The value and how it was served: "hit", "stale" or "miss"
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry["computed_at"]
+            if age < self.ttl:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry["value"], "hit"
+            if age < self.max_stale:
+                self.entries.move_to_end(key)
+                self.stats["stale_hits"] += 1
+                self._refresh(key, compute)
+                return entry["value"], "stale"
+
+        self.stats["misses"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start(key, compute)
+        else:
+            self.stats["shared"] += 1
+        # A cancelled request must not cancel the computation others wait for
+        return await asyncio.shield(task), "miss"
+
+    def _start(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> asyncio.Task:
+        task = asyncio.create_task(self._compute(key, compute))
+        # Waiters that gave up never retrieve the outcome; do it here to keep asyncio quiet
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self._inflight[key] = task
+        return task
+
+    def _refresh(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        if key in self._inflight:
+            return
+        self.stats["refreshes"] += 1
+        task = self._start(key, compute)
+        self._refreshes.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # The stale entry stays in place and is retried on the next request
+            self.stats["refresh_errors"] += 1
+            logger.warning("Suggestion refresh failed", error=str(task.exception()))
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        try:
+            value = await compute()
+            self.entries[key] = {"value": value, "computed_at": time.monotonic()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            return value
+        finally:
+            del self._inflight[key]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        served = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "refreshing": len(self._refreshes),
+            "hit_rate": round((self.stats["hits"] + self.stats["stale_hits"]) / served, 3) if served else 0.0,
+        }
+
+
+# Global cache instance
+suggestion_cache = SuggestionCache()
@@ -0,0 +1,108 @@
+"""
+Local text utilities: tokenization, token estimation and hashing embeddings.
+
+Everything here runs in-process without network calls, so it can be used on
+hot paths (prompt budgeting, cache lookups) and as an offline fallback when
+Azure OpenAI is not configured.
+"""
+
+import re
+import zlib
+from typing import List, Set
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Words, numbers and individual punctuation marks
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-ZÄÖÜ0-9„\"])")
+
+# BPE tokenizers split long German compounds into several pieces; on our
+# corpus cl100k averages about one token per 4.5 characters of a word.
+CHARS_PER_WORD_TOKEN = 4.5
+
+HASH_EMBEDDING_DIMENSIONS = 512
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens."""
+    return WORD_PATTERN.findall(text.lower())
+
+
+def word_stems(text: str, length: int = 5, min_length: int = 3) -> Set[str]:
+    """Word prefixes for rough term overlap (German inflection mostly changes endings)."""
+    return {word[:length] for word in tokenize(text) if len(word) >= min_length}
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split running text into sentences on terminal punctuation."""
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local estimate of the number of model tokens in a text.
+
+    Counts punctuation as one token each and long words as several, which
+    is close enough to the real tokenizer for budgeting decisions.
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        if len(piece) <= 4:
+            tokens += 1
+        else:
+            tokens += int(len(piece) / CHARS_PER_WORD_TOKEN + 0.99)
+    return tokens
+
+
+def estimate_message_tokens(messages: List[dict]) -> int:
+    """Estimate prompt tokens of a chat message list, including per-message overhead."""
+    total = 3  # reply priming
+    for message in messages:
+        total += 4
+        content = message.get("content")
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            total += estimate_tokens(function.get("name", ""))
+            total += estimate_tokens(function.get("arguments", ""))
+    return total
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedding of word unigrams and bigrams.
+
+    Not a semantic model, but stable across processes (CRC32 instead of the
+    salted built-in hash) and good enough for lexical similarity when no
+    Azure embedding deployment is available.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = HASH_EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        words = tokenize(text)
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dimensions] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.vstack([self.embed(text) for text in texts])
+
+
+hashing_embedder = HashingEmbedder()
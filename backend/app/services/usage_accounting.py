@@ -0,0 +1,418 @@
+"""
+Token, cost and latency accounting for Azure OpenAI calls.
+
+Every completion and embedding request is counted per conversation, user,
+feature and deployment for the current UTC day. Callers label their requests
+with ``usage_accounting.attribute(...)``; the labels travel with the asyncio
+context, so background tasks started inside a labelled block (summaries,
+prefetches) are counted for the same user. Counters live in memory and are
+added to the ``usage_daily`` table of the SQLite database periodically, off
+the request path.
+
+Optional daily token budgets per user are checked before Azure is called:
+above the soft budget requests are scheduled with batch priority, above the
+hard budget they are refused with BudgetExceededError. The hard budget is
+checked against the database plus what this process has not written yet,
+so it holds across restarts and workers; today's user counters are never
+evicted from memory.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import structlog
+
+from app.core.config import settings
+from app.core.database import connect, sqlite_path
+from app.services.rate_limiter import Priority
+
+logger = structlog.get_logger()
+
+DIMENSIONS = ("conversation", "user", "feature", "deployment")
+COUNTER_FIELDS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "latency_ms", "cost")
+
+BUDGET_EXCEEDED_MESSAGE = (
+    "Dein Tageskontingent für den Assistenten ist aufgebraucht. Bitte versuche es morgen wieder."
+)
+
+_labels: ContextVar[Dict[str, str]] = ContextVar("usage_labels", default={})
+
+
+class BudgetExceededError(Exception):
+    """A user has used up the daily hard token budget."""
+
+    def __init__(self, user: str, used: int, budget: int):
+        super().__init__(f"Daily token budget of {user} exceeded ({used}/{budget})")
+        self.user = user
+        self.used = used
+        self.budget = budget
+
+
+def _empty_counter() -> Dict[str, float]:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def _add(counter: Dict[str, float], delta: Dict[str, float]) -> None:
+    for field in COUNTER_FIELDS:
+        counter[field] += delta[field]
+
+
+class UsageAccounting:
+    """In-memory usage counters with periodic SQLite flushes and daily budgets."""
+
+    def __init__(self, path: Optional[Path] = None, flush_interval_seconds: Optional[float] = None):
+        """Initialize the accounting. The database is opened on first flush or load."""
+        self.path = path
+        if self.path is None and settings.DATABASE_URL.startswith("sqlite:///"):
+            self.path = sqlite_path()
+        self.flush_interval = (
+            flush_interval_seconds if flush_interval_seconds is not None
+            else settings.USAGE_FLUSH_INTERVAL_SECONDS
+        )
+        self.day = self._today()
+        # dimension -> key -> counter for self.day, least recently used first
+        self.counters: Dict[str, "OrderedDict[str, Dict[str, float]]"] = {
+            dimension: OrderedDict() for dimension in DIMENSIONS
+        }
+        # (day, dimension, key) -> counter not yet added to the database
+        self._deltas: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        # Deltas of the flush in progress, still counted for budgets
+        self._flushing: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.stats = {
+            "recorded": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "evicted_keys": 0,
+            "soft_budget_demotions": 0,
+            "hard_budget_rejections": 0,
+        }
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.utcnow().date().isoformat()
+
+    # Labels ----------------------------------------------------------------
+
+    @contextmanager
+    def attribute(self, **labels: Optional[str]) -> Iterator[None]:
+        """
+        Count Azure requests made inside the block for the given labels.
+
+        Args:
+            labels: conversation, user and/or feature; None values are ignored
+        """
+        token = _labels.set({**_labels.get(), **{k: v for k, v in labels.items() if v is not None}})
+        try:
+            yield
+        finally:
+            _labels.reset(token)
+
+    @staticmethod
+    def current_labels() -> Dict[str, str]:
+        return _labels.get()
+
+    # Recording -------------------------------------------------------------
+
+    def record(
+        self,
+        deployment: str,
+        prompt_tokens: int,
+        completion_tokens: int = 0,
+        latency_ms: float = 0.0,
+        feature: Optional[str] = None,
+        shared: bool = False
+    ) -> None:
+        """
+        Count one Azure request.
+
+        Args:
+            deployment: Deployment the request went to
+            prompt_tokens: Prompt (or embedding input) tokens
+            completion_tokens: Generated tokens
+            latency_ms: Time until the response was complete
+            feature: Feature to count for, defaults to the context label
+            shared: The request served several callers (batched embeddings),
+                so it is not counted for the conversation and user of the context
+        """
+        self._roll_day()
+        labels = _labels.get()
+        delta = {
+            "requests": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency_ms": latency_ms,
+            "cost": self._cost(deployment, prompt_tokens, completion_tokens),
+        }
+        keys = {
+            "conversation": None if shared else labels.get("conversation"),
+            "user": None if shared else labels.get("user"),
+            "feature": feature or labels.get("feature") or "other",
+            "deployment": deployment,
+        }
+        for dimension, key in keys.items():
+            if key is None:
+                continue
+            _add(self._counter(dimension, key), delta)
+            pending = self._deltas.setdefault((self.day, dimension, key), _empty_counter())
+            _add(pending, delta)
+        self.stats["recorded"] += 1
+
+        if self.path is not None and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    @staticmethod
+    def _cost(deployment: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prices = settings.USAGE_TOKEN_PRICES.get(deployment)
+        if not prices:
+            return 0.0
+        return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1000
+
+    def _counter(self, dimension: str, key: str) -> Dict[str, float]:
+        counters = self.counters[dimension]
+        counter = counters.get(key)
+        if counter is None:
+            counter = counters[key] = _empty_counter()
+            # User counters carry the budgets and only go at the end of the day
+            if dimension != "user" and len(counters) > settings.USAGE_MAX_KEYS:
+                # Evicted counters only remain in the database
+                counters.popitem(last=False)
+                self.stats["evicted_keys"] += 1
+        else:
+            counters.move_to_end(key)
+        return counter
+
+    def _roll_day(self) -> None:
+        today = self._today()
+        if today != self.day:
+            # Deltas keep their day, only the in-memory view starts over
+            self.day = today
+            for counters in self.counters.values():
+                counters.clear()
+
+    # Budgets ---------------------------------------------------------------
+
+    def _user_tokens(self, user: str) -> int:
+        counter = self.counters["user"].get(user)
+        return int(counter["total_tokens"]) if counter else 0
+
+    def _pending_user_tokens(self, user: str) -> int:
+        key = (self.day, "user", user)
+        return int(sum(batch[key]["total_tokens"] for batch in (self._deltas, self._flushing) if key in batch))
+
+    def _persisted_user_tokens(self, day: str, user: str) -> int:
+        row = self._connection().execute(
+            "SELECT total_tokens FROM usage_daily WHERE day = ? AND dimension = 'user' AND key = ?",
+            (day, user)
+        ).fetchone()
+        return int(row["total_tokens"]) if row else 0
+
+    async def check_budget(self) -> None:
+        """
+        Refuse the request if the context's user is over the hard budget.
+
+        Usage is what the database holds for today (all workers, before any
+        restart) plus this process's counters not yet written.
+
+        Raises:
+            BudgetExceededError: The daily hard budget is used up
+        """
+        budget = settings.USAGE_USER_HARD_BUDGET_TOKENS
+        user = _labels.get().get("user")
+        if not budget or user is None:
+            return
+        self._roll_day()
+        used = self._user_tokens(user)
+        if self.path is not None:
+            persisted = await asyncio.to_thread(self._persisted_user_tokens, self.day, user)
+            used = max(used, persisted + self._pending_user_tokens(user))
+        if used >= budget:
+            self.stats["hard_budget_rejections"] += 1
+            logger.warning("Hard token budget exceeded", user=user, used=used, budget=budget)
+            raise BudgetExceededError(user, used, budget)
+
+    def effective_priority(self, priority: Priority) -> Priority:
+        """Batch priority for users over the soft budget, so they yield to everyone else."""
+        budget = settings.USAGE_USER_SOFT_BUDGET_TOKENS
+        user = _labels.get().get("user")
+        if not budget or user is None or priority == Priority.BATCH:
+            return priority
+        if self._user_tokens(user) >= budget:
+            self.stats["soft_budget_demotions"] += 1
+            return Priority.BATCH
+        return priority
+
+    # Persistence -----------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect(self.path, check_same_thread=False)
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS usage_daily (
+                    day TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    completion_tokens INTEGER NOT NULL DEFAULT 0,
+                    total_tokens INTEGER NOT NULL DEFAULT 0,
+                    latency_ms REAL NOT NULL DEFAULT 0,
+                    cost REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, dimension, key)
+                );
+            """)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _write(self, batch: Dict[Tuple[str, str, str], Dict[str, float]]) -> None:
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO usage_daily (day, dimension, key, requests, prompt_tokens, completion_tokens, "
+                "total_tokens, latency_ms, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (day, dimension, key) DO UPDATE SET "
+                "requests = requests + excluded.requests, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "total_tokens = total_tokens + excluded.total_tokens, "
+                "latency_ms = latency_ms + excluded.latency_ms, "
+                "cost = cost + excluded.cost",
+                [
+                    (day, dimension, key, *(delta[field] for field in COUNTER_FIELDS))
+                    for (day, dimension, key), delta in batch.items()
+                ]
+            )
+
+    def _read_day(self, day: str, dimensions: Tuple[str, ...]) -> List[sqlite3.Row]:
+        placeholders = ", ".join("?" for _ in dimensions)
+        return self._connection().execute(
+            f"SELECT * FROM usage_daily WHERE day = ? AND dimension IN ({placeholders})",
+            (day, *dimensions)
+        ).fetchall()
+
+    async def load(self) -> int:
+        """
+        Seed today's user, feature and deployment counters from the database.
+
+        Call once at startup, before requests are counted; per-user budgets
+        then also cover usage from before a restart.
+
+        Returns:
+            Number of counters loaded
+        """
+        if self.path is None:
+            return 0
+        self._roll_day()
+        rows = await asyncio.to_thread(self._read_day, self.day, ("user", "feature", "deployment"))
+        for row in rows:
+            counter = self._counter(row["dimension"], row["key"])
+            _add(counter, {field: row[field] for field in COUNTER_FIELDS})
+        return len(rows)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        """Add all pending counters to the database in one transaction."""
+        if self.path is None:
+            self._deltas.clear()
+            return
+        async with self._flush_lock:
+            if not self._deltas:
+                return
+            batch, self._deltas = self._deltas, {}
+            self._flushing = batch
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                # Merge back, the next flush retries
+                for key, delta in batch.items():
+                    _add(self._deltas.setdefault(key, _empty_counter()), delta)
+                self.stats["flush_errors"] += 1
+                logger.error("Writing usage counters failed", error=str(e), counters=len(batch))
+                return
+            finally:
+                self._flushing = {}
+            self.stats["flushes"] += 1
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    # Reporting -------------------------------------------------------------
+
+    def get_report(self, dimension: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+        """
+        Today's aggregates, the biggest consumers first.
+
+        Args:
+            dimension: Only this dimension (conversation, user, feature or deployment)
+            limit: Keys per dimension
+
+        Returns:
+            Totals, per dimension the top keys by total tokens, and budget settings
+        """
+        self._roll_day()
+        dimensions = [dimension] if dimension else list(DIMENSIONS)
+        report: Dict[str, Any] = {
+            "day": self.day,
+            "totals": self._totals(),
+            "budgets": {
+                "user_soft_tokens": settings.USAGE_USER_SOFT_BUDGET_TOKENS,
+                "user_hard_tokens": settings.USAGE_USER_HARD_BUDGET_TOKENS,
+            },
+        }
+        for name in dimensions:
+            ranked = sorted(self.counters[name].items(), key=lambda item: item[1]["total_tokens"], reverse=True)
+            report[name] = [
+                {
+                    "key": key,
+                    **{field: counter[field] for field in COUNTER_FIELDS if field != "latency_ms"},
+                    "cost": round(counter["cost"], 4),
+                    "avg_latency_ms": round(counter["latency_ms"] / counter["requests"], 1) if counter["requests"] else 0.0,
+                }
+                for key, counter in ranked[:limit]
+            ]
+        return report
+
+    def _totals(self) -> Dict[str, float]:
+        totals = _empty_counter()
+        for counter in self.counters["deployment"].values():
+            _add(totals, counter)
+        totals["cost"] = round(totals["cost"], 4)
+        totals["latency_ms"] = round(totals["latency_ms"], 1)
+        return totals
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "pending_counters": len(self._deltas),
+            "tracked_keys": {dimension: len(counters) for dimension, counters in self.counters.items()},
+        }
+
+
+# Global accounting instance
+usage_accounting = UsageAccounting()
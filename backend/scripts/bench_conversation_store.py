@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chat-path latency of the conversation stores.
+
+Replays the store operations of PfadiChatService.process_message (read the
+recent history, append the exchange) for many interleaved conversations and
+reports per-turn latency for the in-memory and the SQLite store. The SQLite
+store writes behind, so its chat-path overhead should stay well below 1 ms
+at the 99th percentile; the last check re-opens the database and verifies
+that every message was persisted.
+
+Run from the backend directory:
+    python scripts/bench_conversation_store.py [--conversations 2000 --turns 5]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.conversation_store import (  # noqa: E402
+    InMemoryConversationStore,
+    SQLiteConversationStore,
+)
+
+WORDS = "Spiel Heimstunde Lager Knoten Zelt Wald Gruppe Pfadfinder Feuer Karte Kompass Lied".split()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def replay(store, conversations, turns, rng, pause_every):
+    """Per-turn latencies in ms; pauses simulate the model call between turns."""
+    latencies = []
+    schedule = [f"conversation-{i}" for i in range(conversations) for _ in range(turns)]
+    rng.shuffle(schedule)
+    for n, conversation_id in enumerate(schedule):
+        started = time.perf_counter()
+        await store.get_messages(conversation_id, limit=20)
+        await store.append_messages(conversation_id, [
+            {"role": "user", "content": " ".join(rng.choices(WORDS, k=rng.randint(5, 40)))},
+            {"role": "assistant", "content": " ".join(rng.choices(WORDS, k=rng.randint(20, 200)))},
+        ])
+        latencies.append((time.perf_counter() - started) * 1000)
+        if n % pause_every == 0:
+            # Give the write-behind task its turn, as awaiting Azure would
+            await asyncio.sleep(0)
+    return latencies
+
+
+def report(label, latencies):
+    print(f"{label:<10} p50 {statistics.median(latencies):7.3f} ms   "
+          f"p99 {percentile(latencies, 0.99):7.3f} ms   max {max(latencies):7.3f} ms")
+
+
+async def run(args):
+    rng = random.Random(7)
+    memory = InMemoryConversationStore()
+    memory_latencies = await replay(memory, args.conversations, args.turns, rng, args.pause_every)
+    report("memory", memory_latencies)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        store = SQLiteConversationStore(path=path)
+        sqlite_latencies = await replay(store, args.conversations, args.turns, rng, args.pause_every)
+        report("sqlite", sqlite_latencies)
+        await store.close()
+        print({key: value for key, value in store.get_stats().items() if key != "cache"})
+
+        reopened = SQLiteConversationStore(path=path)
+        persisted = 0
+        for i in range(args.conversations):
+            persisted += len(await reopened.get_messages(f"conversation-{i}"))
+        await reopened.close()
+        expected = args.conversations * args.turns * 2
+        print(f"Persisted {persisted}/{expected} messages")
+
+    overhead = percentile(sqlite_latencies, 0.99)
+    print(f"SQLite p99 chat-path overhead: {overhead:.3f} ms")
+    return persisted == expected and overhead < 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--pause-every", type=int, default=10)
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        sys.exit("Benchmark failed: messages missing or p99 overhead above 1 ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: packed corpus store vs. loose texts/*.txt files.
+
+Packs all crawled page texts into a temporary corpus store and compares
+read throughput for both layouts, cold (page cache dropped for the files
+involved via posix_fadvise) and warm.
+
+Run from the backend directory:
+    python scripts/bench_corpus_store.py [--web-data-dir ../data/web_data]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.corpus_store import PackedCorpusStore  # noqa: E402
+
+
+def drop_cache(paths):
+    """Best effort: evict the given files from the page cache."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def read_loose(paths):
+    total = 0
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            total += len(f.read())
+    return total
+
+
+def read_packed(store, ids):
+    total = 0
+    for doc_id in ids:
+        total += len(store.get_text(doc_id))
+    return total
+
+
+def measure(label, fn, count, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chars = fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<22} {count / best:>12,.0f} docs/s {chars / best / 1e6:>10,.1f} Mchars/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--web-data-dir",
+        type=Path,
+        default=Path(__file__).resolve().parents[2] / "data" / "web_data",
+    )
+    args = parser.parse_args()
+
+    paths = sorted(args.web_data_dir.glob("*/texts/*.txt"))
+    if not paths:
+        sys.exit(f"No texts found below {args.web_data_dir}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PackedCorpusStore(Path(tmp))
+        started = time.perf_counter()
+        store.put_many(
+            (str(i), path.read_text(encoding="utf-8", errors="replace"), None)
+            for i, path in enumerate(paths)
+        )
+        print(f"Packed {len(paths)} files in {time.perf_counter() - started:.2f}s, "
+              f"{store.get_stats()['data_bytes'] / 1e6:.1f} MB")
+        ids = [str(i) for i in range(len(paths))]
+        data_files = list(Path(tmp).glob("*.dat"))
+
+        def cold(fn, files):
+            def run():
+                drop_cache(files)
+                return fn()
+            return run
+
+        measure("loose files, cold", cold(lambda: read_loose(paths), paths), len(paths), repeat=3)
+        measure("packed mmap, cold", cold(lambda: read_packed(store, ids), data_files), len(ids), repeat=3)
+        measure("loose files, warm", lambda: read_loose(paths), len(paths))
+        measure("packed mmap, warm", lambda: read_packed(store, ids), len(ids))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: listing and reading plans from the plan repository.
+
+Fills a temporary database with weekly plans of several groups over several
+years (bulk inserts, one per group and year, as semester planning does),
+then pages through one year of plans with keyset pagination and reads single
+plans with a cold and a warm cache. Listing a year's plans should take
+single-digit milliseconds.
+
+Run from the backend directory:
+    python scripts/bench_plan_repository.py [--groups 20 --years 10]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.plan_repository import PlanRepository  # noqa: E402
+
+THEMES = ["Vertrauen", "Natur", "Kreativität", "Teamwork", "Erste Hilfe", None]
+
+
+def make_plan(day, rng):
+    """A plan of realistic size (about 2 kB of JSON)."""
+    now = datetime.utcnow()
+    return {
+        "plan_id": str(uuid.uuid4()),
+        "title": f"Heimstunde {day:%d.%m.%Y}",
+        "date": day,
+        "duration": 90,
+        "participant_count": rng.randint(6, 20),
+        "age_group": "10-13",
+        "theme": rng.choice(THEMES),
+        "location": "indoor",
+        "pedagogical_goals": [{"type": "teamwork", "description": "Zusammenarbeit stärken"}],
+        "schedule": [
+            {
+                "start_time": "18:15",
+                "duration": 15,
+                "activity_name": f"Programmpunkt {n}",
+                "activity_type": "game",
+                "description": "Beschreibung des Programmpunkts mit ein paar Sätzen Text. " * 2,
+                "materials": ["Seile", "Augenbinden"],
+                "notes": None,
+                "game_id": f"game_{n:03d}",
+            }
+            for n in range(6)
+        ],
+        "material_list": ["Seile", "Augenbinden"],
+        "preparation_notes": ["Alle Materialien im Voraus bereitlegen"],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(groups, years, pages):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "plans.db"
+        repository = PlanRepository(path=path)
+
+        first_friday = date(2020, 1, 3)
+        started = time.perf_counter()
+        total = 0
+        for _ in range(groups):
+            for year in range(years):
+                week0 = first_friday + timedelta(weeks=52 * year)
+                batch = [make_plan(week0 + timedelta(weeks=week), rng) for week in range(52)]
+                await repository.save_many(batch)
+                total += len(batch)
+        insert_s = time.perf_counter() - started
+        print(f"inserted {total} plans in {insert_s:.2f} s ({total / insert_s:.0f} plans/s, one bulk insert per group and year)")
+
+        # A year of all groups, through a fresh repository (no cached plans)
+        repository = PlanRepository(path=path)
+        year_from, year_to = date(2024, 1, 1), date(2024, 12, 31)
+        timings = []
+        for _ in range(pages):
+            started = time.perf_counter()
+            cursor, listed = None, 0
+            while True:
+                page = await repository.list_plans(
+                    limit=100, cursor=cursor, date_from=year_from, date_to=year_to
+                )
+                listed += len(page["plans"])
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+            timings.append((time.perf_counter() - started) * 1000)
+        print(
+            f"list one year ({listed} plans, pages of 100): "
+            f"median {statistics.median(timings):.2f} ms, p95 {percentile(timings, 0.95):.2f} ms"
+        )
+
+        timings = []
+        for _ in range(pages):
+            started = time.perf_counter()
+            page = await repository.list_plans(limit=20, order="created")
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"first page, newest first (20 plans): median {statistics.median(timings):.2f} ms")
+
+        plan_ids = [plan["plan_id"] for plan in page["plans"]]
+        repository = PlanRepository(path=path)
+        for label in ("cold", "warm"):
+            timings = []
+            for plan_id in plan_ids:
+                started = time.perf_counter()
+                assert await repository.get(plan_id) is not None
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"get plan ({label} cache): median {statistics.median(timings) * 1000:.1f} µs")
+        await repository.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.groups, args.years, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent chat turns with per-conversation serialization.
+
+Submits several turns per conversation at once (like double submits or
+quick follow-ups) for many conversations and runs them through
+PfadiChatService.process_message with a stubbed model call of fixed
+latency. Reports, per locking mode:
+
+- lost context: turns that did not see every earlier turn of their
+  conversation in the prompt
+- wall time: turns of different conversations should overlap completely,
+  so per-conversation locking should take about turns x latency, whereas a
+  single global lock takes conversations x turns x latency
+
+Run from the backend directory:
+    python scripts/load_test_conversation_turns.py [--conversations 200 --turns 4 --latency-ms 50]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import chat_service  # noqa: E402
+from app.services.azure_openai import azure_openai_service  # noqa: E402
+from app.services.conversation_locks import ConversationLockManager  # noqa: E402
+from app.services.conversation_store import InMemoryConversationStore  # noqa: E402
+
+
+class NoLocks:
+    """Previous behaviour: turns of one conversation interleave."""
+
+    @asynccontextmanager
+    async def hold(self, conversation_id):
+        yield
+
+
+class GlobalLock:
+    """The naive fix: one lock for all conversations."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def hold(self, conversation_id):
+        async with self.lock:
+            yield
+
+
+async def run_mode(label, locks, args):
+    chat_service.conversation_locks = locks
+    service = chat_service.PfadiChatService()
+    service.store = InMemoryConversationStore()
+    seen = {}
+
+    async def fake_response(messages, conversation_id):
+        # History seen by this turn: user messages before the current one
+        turn = int(messages[-1]["content"].rsplit(" ", 1)[1])
+        seen[(conversation_id, turn)] = sum(1 for m in messages[:-1] if m["role"] == "user")
+        await asyncio.sleep(args.latency_ms / 1000)
+        return {"message": f"Antwort {turn}"}
+
+    service._get_ai_response = fake_response
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        service.process_message(f"Frage {turn}", f"conversation-{c}")
+        for turn in range(args.turns)
+        for c in range(args.conversations)
+    ))
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    lost = sum(1 for (_, turn), history in seen.items() if history != turn)
+    reordered = 0
+    for c in range(args.conversations):
+        history = await service.store.get_messages(f"conversation-{c}")
+        questions = [m["content"] for m in history if m["role"] == "user"]
+        if questions != [f"Frage {turn}" for turn in range(args.turns)]:
+            reordered += 1
+    print(f"{label:<18} wall {wall_ms:8.0f} ms   lost context {lost:5d}/{len(seen)}   "
+          f"reordered conversations {reordered}")
+    return wall_ms, lost, reordered
+
+
+async def run(args):
+    azure_openai_service.is_available = lambda: True
+    print(f"{args.conversations} conversations x {args.turns} simultaneous turns, "
+          f"{args.latency_ms} ms per model call")
+    await run_mode("no locks", NoLocks(), args)
+    serialized_ms = args.conversations * args.turns * args.latency_ms
+    if serialized_ms <= 10000:
+        await run_mode("global lock", GlobalLock(), args)
+    else:
+        print(f"{'global lock':<18} wall ~{serialized_ms:7.0f} ms   (every turn after the other, not run)")
+    locks = ConversationLockManager()
+    wall_ms, lost, reordered = await run_mode("per conversation", locks, args)
+    print(locks.get_stats())
+    # Serialized turns plus scheduling slack; conversations must not wait for each other
+    return lost == 0 and reordered == 0 and wall_ms < args.turns * args.latency_ms * 2 and not locks._locks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+    if not asyncio.run(run(args)):
+        sys.exit("Load test failed: lost context, reordered turns, lingering locks or no parallelism")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Measure chat response sizes with full and with reference-based payloads.
+
+Runs the chat functions of typical turns (game search, Heimstunde plan, both
+in one turn) against the local services and serializes the resulting chat
+response twice: in the previous layout, where the game objects were copied
+into data and into the create_plan and search_similar actions, and in the
+current layout with game IDs plus one references table.
+
+Run from the backend directory:
+    python scripts/measure_chat_payloads.py
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.chat_service import PfadiChatService  # noqa: E402
+
+TURNS = [
+    ("Spielesuche", "Hast du Spiele für 12 Kinder?", {"search_games": {"query": "e", "participant_count": 12}}),
+    ("Spielesuche", "Ein Spiel zum Thema Vertrauen?", {"search_games": {"query": "vertrauen"}}),
+    ("Heimstunde", "Plane eine Heimstunde zu Teamwork", {
+        "create_heimstunde_plan": {"duration": 90, "participant_count": 12, "theme": "Teamwork"},
+    }),
+    ("Suche + Plan", "Spiele und ein Plan zum Thema Kreis", {
+        "search_games": {"query": "kreis"},
+        "create_heimstunde_plan": {"duration": 90, "participant_count": 10, "theme": "Kreis"},
+    }),
+]
+
+ANSWER = "Hier sind passende Vorschläge für eure Heimstunde. " * 8
+
+
+def legacy_actions(data):
+    """Suggested actions as they were built before game references."""
+    actions = []
+    if "games" in data:
+        actions += [
+            {"text": "📋 Heimstunde mit diesen Spielen planen", "action": "create_plan",
+             "data": {"suggested_games": data["games"]}},
+            {"text": "🔍 Ähnliche Spiele suchen", "action": "search_similar",
+             "data": {"reference_games": data["games"][:2]}},
+        ]
+    if "plan_id" in data:
+        actions += [
+            {"text": "📄 Plan als PDF exportieren", "action": "export_plan", "data": {"plan_id": data["plan_id"]}},
+            {"text": "✏️ Plan anpassen", "action": "modify_plan", "data": {"plan_id": data["plan_id"]}},
+        ]
+    return actions[:4]
+
+
+def size(payload):
+    return len(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+async def run():
+    service = PfadiChatService()
+    print(f"{'turn':<14} {'before':>8} {'after':>8} {'saved':>6}")
+    before_total = after_total = 0
+    for label, message, calls in TURNS:
+        function_data = {}
+        for name, arguments in calls.items():
+            function_data.update(await service._execute_function_call(
+                {"name": name, "arguments": json.dumps(arguments)}
+            ))
+        response = {"message": ANSWER, "function_data": function_data}
+
+        before = size({
+            "message": ANSWER,
+            "data": function_data,
+            "suggested_actions": legacy_actions(function_data),
+        })
+        data, references = service._reference_payload(function_data)
+        after = size({
+            "message": ANSWER,
+            "data": data,
+            "references": references,
+            "suggested_actions": service._generate_suggested_actions(response, message),
+        })
+        before_total += before
+        after_total += after
+        print(f"{label:<14} {before:>8} {after:>8} {1 - after / before:>6.0%}")
+
+    print(f"{'total':<14} {before_total:>8} {after_total:>8} {1 - after_total / before_total:>6.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Replay a long planning conversation and report prompt tokens per turn.
+
+Compares the previous prompt layout (system prompt plus the last 20 raw
+messages) with the rolling summary layout built by
+PfadiChatService._build_conversation_messages. Function schemas are sent
+with every turn in both layouts and are reported separately.
+
+With Azure OpenAI configured the summaries come from the summary
+deployment; otherwise an extractive stand-in capped at
+CONVERSATION_SUMMARY_MAX_TOKENS is used, which approximates the size (not
+the quality) of a real summary.
+
+Run from the backend directory:
+    python scripts/replay_conversation_tokens.py [--turns 40]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.services import chat_service  # noqa: E402
+from app.services.azure_openai import azure_openai_service  # noqa: E402
+from app.services.conversation_store import InMemoryConversationStore  # noqa: E402
+from app.services.conversation_summary import ConversationSummarizer  # noqa: E402
+from app.services.text_processing import estimate_message_tokens, estimate_tokens  # noqa: E402
+
+QUESTIONS = [
+    "Wir sind 14 Guides und Späher, wie könnten wir die nächste Heimstunde zum Thema Orientierung gestalten?",
+    "Kannst du mir ein Spiel für draußen vorschlagen, das ohne viel Material auskommt?",
+    "Wie lange sollte der Einstieg dauern, wenn wir insgesamt 90 Minuten haben?",
+    "Welche Materialien brauchen wir für die Kompass-Stationen?",
+    "Was machen wir, wenn es regnet?",
+    "Wie kann ich die neuen Kinder besser einbinden?",
+    "Hast du eine Idee für einen ruhigen Abschluss?",
+    "Können wir das Ganze auch als Postenlauf im Wald machen?",
+]
+
+ANSWER_SENTENCES = [
+    "Für 14 Kinder bieten sich drei Kleingruppen mit je einer Leiter:in an.",
+    "Zum Einstieg passt ein kurzes Bewegungsspiel, das alle aktiviert.",
+    "Plane für den Hauptteil etwa 45 Minuten ein und halte eine Reserveaktivität bereit.",
+    "An jeder Station sollte eine klare Aufgabe mit Karte und Kompass warten.",
+    "Bei Regen lässt sich der Postenlauf ins Heim verlegen, die Stationen werden dann zu Rätseln.",
+    "Neue Kinder profitieren von Patenschaften mit erfahrenen Guides und Spähern.",
+    "Ein ruhiger Abschluss im Kreis mit einer kurzen Reflexion rundet die Heimstunde ab.",
+    "Denk an ausreichend Material: Kompasse, laminierte Karten, Stifte und eine Pfeife.",
+    "Die Gesetze der Pfadfinder:innen können als roter Faden durch die Stationen führen.",
+]
+
+
+class ExtractiveSummarizer(ConversationSummarizer):
+    """Offline stand-in: first sentence of every message, capped like a real summary."""
+
+    def is_available(self) -> bool:
+        return settings.ENABLE_CONVERSATION_SUMMARY
+
+    async def summarize(self, messages, summary=None):
+        lines = [summary["text"]] if summary else []
+        lines += [f"- {message['content'].split('.')[0][:160]}" for message in messages]
+        text = ""
+        for line in lines:
+            if estimate_tokens(text + line) > settings.CONVERSATION_SUMMARY_MAX_TOKENS:
+                break
+            text += line + "\n"
+        return text.strip()
+
+
+async def replay(turns):
+    rng = random.Random(3)
+    service = chat_service.PfadiChatService()
+    service.store = InMemoryConversationStore()
+    if not azure_openai_service.is_available():
+        chat_service.conversation_summarizer = ExtractiveSummarizer()
+    summarizer = chat_service.conversation_summarizer
+
+    function_tokens = estimate_tokens(json.dumps(list(service.AVAILABLE_FUNCTIONS.values()), ensure_ascii=False))
+    system_tokens = estimate_message_tokens([{"role": "system", "content": service._get_system_prompt()}])
+    print(f"System prompt ~{system_tokens} tokens, function schemas ~{function_tokens} tokens (both layouts)")
+    print(f"{'turn':>4} {'raw history':>12} {'summarized':>11}")
+
+    before_total = after_total = 0
+    steady_before = steady_after = 0
+    for turn in range(1, turns + 1):
+        question = rng.choice(QUESTIONS)
+        history = await service.store.get_messages("replay", limit=settings.CONVERSATION_MAX_MESSAGES)
+        raw = [{"role": "system", "content": service._get_system_prompt()}]
+        raw += [{"role": m["role"], "content": m["content"]} for m in history[-20:]]
+        raw.append({"role": "user", "content": question})
+        summarized = await service._build_conversation_messages(question, "replay")
+
+        before, after = estimate_message_tokens(raw), estimate_message_tokens(summarized)
+        before_total += before
+        after_total += after
+        if turn > 10:
+            # The raw layout has reached its 20 message cap
+            steady_before += before
+            steady_after += after
+        if turn % 5 == 0 or turn == 1:
+            print(f"{turn:>4} {before:>12} {after:>11}")
+
+        answer = " ".join(rng.sample(ANSWER_SENTENCES, k=rng.randint(3, 6)))
+        await service._update_conversation_memory("replay", question, {"message": answer})
+        # Let the background summary finish before the next turn, as it would between user messages
+        while summarizer._tasks:
+            await asyncio.gather(*summarizer._tasks)
+
+    print(f"Average prompt tokens per turn without functions: {before_total / turns:.0f} raw, "
+          f"{after_total / turns:.0f} summarized ({1 - after_total / before_total:.0%} fewer)")
+    if steady_before:
+        print(f"After turn 10: {1 - steady_after / steady_before:.0%} fewer prompt tokens")
+    print(summarizer.get_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(replay(args.turns))
+
+
+if __name__ == "__main__":
+    main()
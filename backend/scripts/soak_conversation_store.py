@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Soak test: many short-lived chat conversations against the in-memory store.
+
+Simulates anonymous chats (a few exchanges each, then abandoned) and samples
+the process RSS along the way. Once the store has filled up to its limits,
+eviction has to keep memory flat; the script fails if RSS keeps growing.
+
+Run from the backend directory:
+    python scripts/soak_conversation_store.py [--conversations 100000]
+"""
+
+import argparse
+import asyncio
+import gc
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.conversation_store import InMemoryConversationStore  # noqa: E402
+
+WORDS = "Spiel Heimstunde Lager Knoten Zelt Wald Gruppe Pfadfinder Feuer Karte Kompass Lied".split()
+
+
+def rss_mb():
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def synthetic_message(rng, role):
+    return {"role": role, "content": " ".join(rng.choices(WORDS, k=rng.randint(5, 120)))}
+
+
+async def soak(args):
+    store = InMemoryConversationStore(
+        max_conversations=args.max_conversations,
+        max_bytes=args.max_mb * 1024 * 1024
+    )
+    rng = random.Random(42)
+    samples = []
+    started = time.perf_counter()
+
+    for i in range(args.conversations):
+        conversation_id = f"soak-{i}"
+        for _ in range(rng.randint(1, args.max_exchanges)):
+            await store.get_messages(conversation_id, limit=20)
+            await store.append_messages(conversation_id, [
+                synthetic_message(rng, "user"),
+                synthetic_message(rng, "assistant"),
+            ])
+        # Occasionally come back to a recent conversation
+        if i and rng.random() < 0.1:
+            await store.get_messages(f"soak-{rng.randint(max(0, i - 500), i - 1)}")
+
+        if (i + 1) % args.sample_every == 0:
+            gc.collect()
+            samples.append(rss_mb())
+            stats = store.get_stats()
+            print(f"{i + 1:>8} conversations  rss {samples[-1]:7.1f} MB  "
+                  f"stored {stats['conversations']:>6}  "
+                  f"~{stats['approx_bytes'] / 1e6:6.1f} MB  "
+                  f"evicted lru/bytes {stats['evicted_lru']}/{stats['evicted_bytes']}")
+
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
+    print(store.get_stats())
+
+    # Compare the second half of the run, when the store is saturated
+    steady = samples[len(samples) // 2:]
+    growth = steady[-1] - steady[0] if steady else 0.0
+    print(f"RSS growth over the second half: {growth:+.1f} MB (tolerance {args.tolerance_mb} MB)")
+    return growth <= args.tolerance_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=100_000)
+    parser.add_argument("--max-exchanges", type=int, default=6)
+    parser.add_argument("--max-conversations", type=int, default=10_000)
+    parser.add_argument("--max-mb", type=int, default=64)
+    parser.add_argument("--sample-every", type=int, default=10_000)
+    parser.add_argument("--tolerance-mb", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if not asyncio.run(soak(args)):
+        sys.exit("RSS kept growing after the store was saturated")
+
+
+if __name__ == "__main__":
+    main()
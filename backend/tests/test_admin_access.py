@@ -0,0 +1,40 @@
+"""
+Tests for the X-Admin-Key check of the admin endpoints.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.admin import require_admin
+from app.core.config import settings
+
+
+@pytest.mark.parametrize("debug", [True, False])
+def test_empty_key_keeps_admin_closed(monkeypatch, debug):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "")
+    monkeypatch.setattr(settings, "DEBUG", debug)
+
+    with pytest.raises(HTTPException) as error:
+        require_admin(x_admin_key="")
+
+    assert error.value.detail == "Admin-Zugang ist nicht konfiguriert"
+
+
+def test_unset_key_allows_debug_only(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    require_admin(x_admin_key=None)
+
+    monkeypatch.setattr(settings, "DEBUG", False)
+    with pytest.raises(HTTPException):
+        require_admin(x_admin_key=None)
+
+
+def test_configured_key_must_match(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "geheimer-schluessel")
+
+    require_admin(x_admin_key="geheimer-schluessel")
+    with pytest.raises(HTTPException) as error:
+        require_admin(x_admin_key="falsch")
+
+    assert error.value.detail == "Ungültiger Admin-Schlüssel"
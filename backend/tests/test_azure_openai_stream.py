@@ -0,0 +1,107 @@
+"""
+Tests for the streamed chat completion's circuit breaker and usage accounting.
+"""
+
+import uuid
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import azure_openai
+from app.services.azure_openai import AzureOpenAIService
+from app.services.circuit_breaker import circuit_breakers
+from app.services.usage_accounting import UsageAccounting
+
+MESSAGES = [{"role": "user", "content": "Ein Spiel für draußen?"}]
+
+
+def chunk(content=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+def fake_client(chunks, error=None):
+    async def stream():
+        for item in chunks:
+            yield item
+        if error is not None:
+            raise error
+
+    async def create(**params):
+        return stream()
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+@pytest.fixture
+async def accounting(tmp_path, monkeypatch):
+    accounting = UsageAccounting(path=tmp_path / "usage.db")
+    monkeypatch.setattr(azure_openai, "usage_accounting", accounting)
+    yield accounting
+    await accounting.close()
+
+
+@pytest.fixture
+def deployment():
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+def service_with(client):
+    service = AzureOpenAIService.__new__(AzureOpenAIService)
+    service.client = client
+    return service
+
+
+async def collect(service, deployment):
+    return [event async for event in service.chat_completion_stream(MESSAGES, model=deployment)]
+
+
+async def test_success_recorded_after_the_stream_finishes(accounting, deployment):
+    service = service_with(fake_client([chunk("Fang"), chunk("spiel", finish_reason="stop")]))
+    events = service.chat_completion_stream(MESSAGES, model=deployment)
+
+    assert (await events.__anext__())["content"] == "Fang"
+    assert circuit_breakers.breaker(deployment).stats["calls"] == 0
+
+    rest = [event async for event in events]
+
+    assert rest[-1]["type"] == "done"
+    stats = circuit_breakers.breaker(deployment).stats
+    assert stats["calls"] == 1 and stats["failures"] == 0
+    assert accounting.stats["recorded"] == 1
+
+
+async def test_service_failure_mid_stream_counts_against_the_breaker(accounting, deployment):
+    error = httpx.ReadTimeout("Zeitüberschreitung")
+    service = service_with(fake_client([chunk("Fang")], error=error))
+
+    events = await collect(service, deployment)
+
+    assert events[-1]["type"] == "error"
+    stats = circuit_breakers.breaker(deployment).stats
+    assert stats["calls"] == 1 and stats["failures"] == 1
+    # The partial output is still counted
+    assert accounting.stats["recorded"] == 1
+    assert accounting.counters["deployment"][deployment]["completion_tokens"] > 0
+
+
+async def test_client_error_mid_stream_leaves_the_breaker_alone(accounting, deployment):
+    service = service_with(fake_client([chunk("Fang")], error=ValueError("kaputter Chunk")))
+
+    events = await collect(service, deployment)
+
+    assert events[-1]["type"] == "error"
+    assert circuit_breakers.breaker(deployment).stats["calls"] == 0
+    assert accounting.stats["recorded"] == 1
+
+
+async def test_consumer_closing_early_records_partial_usage(accounting, deployment):
+    service = service_with(fake_client([chunk("Fang"), chunk("spiel"), chunk("!", finish_reason="stop")]))
+    events = service.chat_completion_stream(MESSAGES, model=deployment)
+
+    await events.__anext__()
+    await events.aclose()
+
+    assert circuit_breakers.breaker(deployment).stats["calls"] == 0
+    assert accounting.stats["recorded"] == 1
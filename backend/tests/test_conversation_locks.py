@@ -0,0 +1,97 @@
+"""
+Tests for the per-conversation turn locks.
+"""
+
+import asyncio
+
+from app.services.conversation_locks import ConversationLockManager
+
+
+async def test_turns_of_one_conversation_run_in_arrival_order():
+    locks = ConversationLockManager()
+    release_first = asyncio.Event()
+    order = []
+
+    async def turn(n: int):
+        async with locks.hold("c1"):
+            order.append(n)
+            if n == 0:
+                await release_first.wait()
+
+    tasks = [asyncio.create_task(turn(0))]
+    await asyncio.sleep(0)
+    for n in range(1, 5):
+        tasks.append(asyncio.create_task(turn(n)))
+        await asyncio.sleep(0)
+    assert order == [0]
+
+    release_first.set()
+    await asyncio.gather(*tasks)
+
+    assert order == [0, 1, 2, 3, 4]
+    assert locks.stats["contended"] == 4
+    assert locks.stats["max_queued"] == 4
+
+
+async def test_turns_do_not_overlap():
+    locks = ConversationLockManager()
+    running = 0
+    overlaps = 0
+
+    async def turn():
+        nonlocal running, overlaps
+        async with locks.hold("c1"):
+            running += 1
+            overlaps += running > 1
+            await asyncio.sleep(0.001)
+            running -= 1
+
+    await asyncio.gather(*(turn() for _ in range(10)))
+
+    assert overlaps == 0
+
+
+async def test_other_conversations_do_not_wait():
+    locks = ConversationLockManager()
+    release = asyncio.Event()
+
+    async def slow_turn():
+        async with locks.hold("c1"):
+            await release.wait()
+
+    slow = asyncio.create_task(slow_turn())
+    await asyncio.sleep(0)
+
+    async with locks.hold("c2"):
+        pass
+
+    assert locks.stats["contended"] == 0
+    release.set()
+    await slow
+
+
+async def test_lock_removed_when_idle():
+    locks = ConversationLockManager()
+
+    async with locks.hold("c1"):
+        assert locks.get_stats()["active"] == 1
+
+    assert locks.get_stats()["active"] == 0
+
+
+async def test_lock_released_when_turn_fails():
+    locks = ConversationLockManager()
+
+    try:
+        async with locks.hold("c1"):
+            raise ValueError("Modell nicht erreichbar")
+    except ValueError:
+        pass
+
+    await asyncio.wait_for(_enter(locks, "c1"), timeout=1)
+    assert locks.get_stats()["active"] == 0
+
+
+async def _enter(locks: ConversationLockManager, conversation_id: str) -> None:
+    async with locks.hold(conversation_id):
+        pass
@@ -0,0 +1,259 @@
+"""
+Tests for the conversation stores: in-memory, SQLite and Redis (through the
+in-process stand-in), including the Redis store's version-checked local cache.
+"""
+
+import pytest
+
+from app.core.redis_client import InProcessRedis
+from app.services.conversation_store import (
+    InMemoryConversationStore,
+    RedisConversationStore,
+    SQLiteConversationStore,
+)
+
+
+def exchange(n: int):
+    return [
+        {"role": "user", "content": f"Frage {n}"},
+        {"role": "assistant", "content": f"Antwort {n}"},
+    ]
+
+
+@pytest.fixture
+async def sqlite_store(tmp_path):
+    store = SQLiteConversationStore(path=tmp_path / "chat.db", flush_interval_ms=0)
+    yield store
+    await store.close()
+
+
+@pytest.fixture
+def redis_client():
+    return InProcessRedis()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+async def store(request, tmp_path, redis_client):
+    if request.param == "memory":
+        store = InMemoryConversationStore()
+    elif request.param == "sqlite":
+        store = SQLiteConversationStore(path=tmp_path / "chat.db", flush_interval_ms=0)
+    else:
+        store = RedisConversationStore(client=redis_client)
+    yield store
+    await store.close()
+
+
+# Behaviour shared by all backends ------------------------------------------
+
+
+async def test_append_and_read_in_order(store):
+    await store.append_messages("c1", exchange(1))
+    await store.append_messages("c1", exchange(2))
+
+    messages = await store.get_messages("c1")
+
+    assert [message["content"] for message in messages] == ["Frage 1", "Antwort 1", "Frage 2", "Antwort 2"]
+    assert all(message["timestamp"] for message in messages)
+
+
+async def test_limit_returns_most_recent(store):
+    for n in range(3):
+        await store.append_messages("c1", exchange(n))
+
+    messages = await store.get_messages("c1", limit=3)
+
+    assert [message["content"] for message in messages] == ["Antwort 1", "Frage 2", "Antwort 2"]
+
+
+async def test_unknown_conversation_is_empty(store):
+    assert await store.get_messages("missing") == []
+    assert await store.get_summary("missing") is None
+
+
+async def test_conversations_are_separate(store):
+    await store.append_messages("c1", exchange(1))
+    await store.append_messages("c2", exchange(2))
+
+    assert [message["content"] for message in await store.get_messages("c2")] == ["Frage 2", "Antwort 2"]
+
+
+async def test_summary_round_trip(store):
+    await store.append_messages("c1", exchange(1))
+    summary = {"text": "Es ging um Spiele.", "until": "2026-01-01T00:00:00", "until_id": "m1"}
+
+    await store.set_summary("c1", summary)
+
+    assert await store.get_summary("c1") == summary
+
+
+async def test_message_ids_survive_storage(store):
+    await store.append_messages("c1", exchange(1))
+
+    first = await store.get_messages("c1")
+    again = await store.get_messages("c1")
+
+    assert all(message["id"] for message in first)
+    assert len({message["id"] for message in first}) == 2
+    assert [message["id"] for message in again] == [message["id"] for message in first]
+
+
+async def test_delete(store):
+    await store.append_messages("c1", exchange(1))
+
+    assert await store.delete("c1") is True
+    assert await store.get_messages("c1") == []
+    assert await store.delete("c1") is False
+
+
+# In-memory store -------------------------------------------------------------
+
+
+async def test_memory_evicts_least_recently_used():
+    store = InMemoryConversationStore(max_conversations=2)
+    await store.append_messages("c1", exchange(1))
+    await store.append_messages("c2", exchange(2))
+    # Reading c1 makes c2 the least recently used
+    await store.get_messages("c1")
+    await store.append_messages("c3", exchange(3))
+
+    assert store.contains("c1") and store.contains("c3")
+    assert not store.contains("c2")
+    assert store.stats["evicted_lru"] == 1
+
+
+async def test_memory_keeps_only_recent_messages():
+    store = InMemoryConversationStore(max_messages=3)
+    for n in range(3):
+        await store.append_messages("c1", exchange(n))
+
+    messages = await store.get_messages("c1")
+
+    assert [message["content"] for message in messages] == ["Antwort 1", "Frage 2", "Antwort 2"]
+    assert store.total_bytes == sum(
+        conversation["bytes"] for conversation in store.conversations.values()
+    )
+
+
+async def test_memory_byte_budget_spares_the_conversation_just_written():
+    store = InMemoryConversationStore(max_bytes=1000)
+    await store.append_messages("c1", exchange(1))
+    await store.append_messages("c2", [{"role": "user", "content": "x" * 2000}])
+
+    assert not store.contains("c1")
+    assert store.contains("c2")
+    assert store.stats["evicted_bytes"] == 1
+
+
+async def test_memory_drops_idle_conversations():
+    store = InMemoryConversationStore(idle_ttl_seconds=60)
+    await store.append_messages("c1", exchange(1))
+    store.conversations["c1"]["last_access"] -= 61
+
+    assert await store.get_messages("c1") == []
+    assert store.stats["evicted_idle"] == 1
+
+
+# SQLite store ----------------------------------------------------------------
+
+
+async def test_sqlite_persists_across_instances(tmp_path):
+    path = tmp_path / "chat.db"
+    store = SQLiteConversationStore(path=path, flush_interval_ms=0)
+    await store.append_messages("c1", exchange(1))
+    await store.set_summary("c1", {"text": "Kurz", "until": "2026-01-01T00:00:00"})
+    await store.close()
+
+    reopened = SQLiteConversationStore(path=path, flush_interval_ms=0)
+    try:
+        messages = await reopened.get_messages("c1", limit=10)
+        assert [message["content"] for message in messages] == ["Frage 1", "Antwort 1"]
+        assert (await reopened.get_summary("c1"))["text"] == "Kurz"
+        assert reopened.stats["cache_misses"] == 1
+    finally:
+        await reopened.close()
+
+
+async def test_sqlite_full_history_includes_unflushed_messages(sqlite_store):
+    await sqlite_store.append_messages("c1", exchange(1))
+    assert sqlite_store.get_stats()["pending_writes"] == 2
+
+    # Full histories bypass the cache and read the database after a flush
+    messages = await sqlite_store.get_messages("c1")
+
+    assert [message["content"] for message in messages] == ["Frage 1", "Antwort 1"]
+    assert sqlite_store.get_stats()["pending_writes"] == 0
+
+
+async def test_sqlite_serves_recent_messages_from_cache(sqlite_store):
+    await sqlite_store.append_messages("c1", exchange(1))
+    await sqlite_store.flush()
+    misses = sqlite_store.stats["cache_misses"]
+
+    await sqlite_store.get_messages("c1", limit=2)
+
+    assert sqlite_store.stats["cache_misses"] == misses
+
+
+# Redis store: version-checked local cache ------------------------------------
+
+
+async def test_redis_cache_hit_while_version_unchanged(redis_client):
+    store = RedisConversationStore(client=redis_client)
+    await store.append_messages("c1", exchange(1))
+    await store.get_messages("c1")
+    hits = store.stats["cache_hits"]
+
+    await store.get_messages("c1")
+
+    assert store.stats["cache_hits"] == hits + 1
+
+
+async def test_redis_own_append_extends_cache(redis_client):
+    store = RedisConversationStore(client=redis_client)
+    await store.append_messages("c1", exchange(1))
+    await store.get_messages("c1")
+    await store.append_messages("c1", exchange(2))
+    misses = store.stats["cache_misses"]
+
+    messages = await store.get_messages("c1")
+
+    assert len(messages) == 4
+    assert store.stats["cache_misses"] == misses
+
+
+async def test_redis_cache_invalidated_by_other_worker(redis_client):
+    worker_a = RedisConversationStore(client=redis_client)
+    worker_b = RedisConversationStore(client=redis_client)
+    await worker_a.append_messages("c1", exchange(1))
+    await worker_a.get_messages("c1")
+
+    await worker_b.append_messages("c1", exchange(2))
+    misses = worker_a.stats["cache_misses"]
+    messages = await worker_a.get_messages("c1")
+
+    assert [message["content"] for message in messages][-2:] == ["Frage 2", "Antwort 2"]
+    assert worker_a.stats["cache_misses"] == misses + 1
+
+
+async def test_redis_delete_seen_by_other_worker(redis_client):
+    worker_a = RedisConversationStore(client=redis_client)
+    worker_b = RedisConversationStore(client=redis_client)
+    await worker_a.append_messages("c1", exchange(1))
+    await worker_a.get_messages("c1")
+
+    await worker_b.delete("c1")
+
+    assert await worker_a.get_messages("c1") == []
+
+
+async def test_redis_caps_messages(redis_client):
+    store = RedisConversationStore(client=redis_client)
+    store.max_messages = 3
+    for n in range(3):
+        await store.append_messages("c1", exchange(n))
+
+    fresh = RedisConversationStore(client=redis_client)
+    for reader in (store, fresh):
+        messages = await reader.get_messages("c1")
+        assert [message["content"] for message in messages] == ["Antwort 1", "Frage 2", "Antwort 2"]
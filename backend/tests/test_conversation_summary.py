@@ -0,0 +1,47 @@
+"""
+Tests for cutting a conversation's history at its rolling summary.
+"""
+
+from app.services.conversation_store import stamp_messages
+from app.services.conversation_summary import split_history
+
+
+def history():
+    return stamp_messages([
+        {"role": "user", "content": "Frage 1", "timestamp": "2026-01-01T10:00:00"},
+        {"role": "assistant", "content": "Antwort 1", "timestamp": "2026-01-01T10:00:05"},
+        # Queued follow-up: received before the previous reply was written
+        {"role": "user", "content": "Frage 2", "timestamp": "2026-01-01T10:00:03"},
+        {"role": "assistant", "content": "Antwort 2", "timestamp": "2026-01-01T10:00:09"},
+    ])
+
+
+def test_no_summary_keeps_everything():
+    messages = history()
+
+    assert split_history(messages, None) == messages
+
+
+def test_cut_by_position_keeps_earlier_stamped_follow_up():
+    messages = history()
+    summary = {"text": "Kurz", "until": messages[1]["timestamp"], "until_id": messages[1]["id"]}
+
+    recent = split_history(messages, summary)
+
+    assert [message["content"] for message in recent] == ["Frage 2", "Antwort 2"]
+
+
+def test_summarized_message_trimmed_from_window_keeps_everything():
+    messages = history()
+    summary = {"text": "Kurz", "until": "2026-01-01T09:00:00", "until_id": "trimmed"}
+
+    assert split_history(messages[2:], summary) == messages[2:]
+
+
+def test_summary_without_id_falls_back_to_timestamps():
+    messages = history()
+    summary = {"text": "Kurz", "until": messages[1]["timestamp"]}
+
+    recent = split_history(messages, summary)
+
+    assert [message["content"] for message in recent] == ["Antwort 2"]
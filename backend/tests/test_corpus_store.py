@@ -0,0 +1,90 @@
+"""
+Tests for the packed corpus store, with two instances on one directory
+standing in for two processes.
+"""
+
+import pytest
+
+from app.services.corpus_store import PackedCorpusStore
+
+
+@pytest.fixture
+def stores(tmp_path):
+    writer = PackedCorpusStore(tmp_path)
+    reader = PackedCorpusStore(tmp_path)
+    yield writer, reader
+    writer.close()
+    reader.close()
+
+
+def test_round_trip(stores):
+    writer, _ = stores
+    writer.put("d1", "Schnitzeljagd im Wald", {"title": "Schnitzeljagd"})
+
+    assert writer.get_text("d1") == "Schnitzeljagd im Wald"
+    assert writer.get_meta("d1") == {"title": "Schnitzeljagd"}
+
+
+def test_reader_sees_later_writes(stores):
+    writer, reader = stores
+    writer.put("d1", "Erster Text")
+    assert reader.get_text("d1") == "Erster Text"
+
+    writer.put("d2", "Zweiter Text", {"title": "Zwei"})
+    writer.put("d1", "Erster Text, überarbeitet")
+
+    assert reader.get_meta("d2") == {"title": "Zwei"}
+    assert reader.get_text("d1") == "Erster Text, überarbeitet"
+    assert sorted(reader.ids()) == ["d1", "d2"]
+
+
+def test_reader_sees_deletes(stores):
+    writer, reader = stores
+    writer.put("d1", "Text")
+    assert "d1" in reader
+
+    writer.delete("d1")
+
+    assert "d1" not in reader
+    assert reader.get_text("d1") is None
+
+
+def test_reader_follows_compaction(stores):
+    writer, reader = stores
+    writer.put("d1", "alt")
+    writer.put("d1", "neu")
+    writer.put("d2", "bleibt")
+    assert reader.get_text("d2") == "bleibt"
+
+    writer.compact()
+
+    assert reader.get_stats()["generation"] == 1
+    assert reader.get_text("d1") == "neu"
+    assert reader.get_text("d2") == "bleibt"
+
+
+def test_record_being_written_is_read_once_complete(stores, tmp_path):
+    writer, reader = stores
+    writer.put("d1", "Text")
+    index = tmp_path / "corpus-0.idx"
+    line = index.read_bytes().replace(b'"d1"', b'"d9"')
+
+    with open(index, "ab") as f:
+        f.write(line[:10])
+    assert reader.ids() == ["d1"]
+
+    with open(index, "ab") as f:
+        f.write(line[10:])
+    assert sorted(reader.ids()) == ["d1", "d9"]
+
+
+def test_writer_truncates_half_written_record(stores, tmp_path):
+    writer, reader = stores
+    writer.put("d1", "Text")
+    with open(tmp_path / "corpus-0.idx", "ab") as f:
+        f.write(b'{"id": "kaputt')
+
+    writer.put("d2", "Noch ein Text")
+
+    assert sorted(reader.ids()) == ["d1", "d2"]
+    assert reader.get_text("d2") == "Noch ein Text"
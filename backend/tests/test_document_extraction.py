@@ -0,0 +1,81 @@
+"""
+Tests for the concurrent extraction loop: ordering, early stops and the
+per-format throughput figures.
+"""
+
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.document_extraction import DocumentExtractionService
+
+DELAY = 0.05
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = DocumentExtractionService(max_workers=2)
+    started = []
+    cancelled = []
+
+    async def extract_one(path):
+        started.append(path.name)
+        try:
+            # Files listed later take longer
+            await asyncio.sleep(DELAY * (1 + int(path.stem.split("-")[1]) % 4))
+        except asyncio.CancelledError:
+            cancelled.append(path.name)
+            raise
+        return {
+            "path": str(path),
+            "format": path.suffix.lstrip("."),
+            "text": "Text",
+            "pages": 2,
+            "title": None,
+            "error": None,
+            "duration_seconds": 0.1,
+        }
+
+    monkeypatch.setattr(service, "_extract_one", extract_one)
+    service.started = started
+    service.cancelled = cancelled
+    return service
+
+
+def files(count):
+    return [Path(f"heft-{n}.pdf") for n in range(count)]
+
+
+async def test_files_start_in_order(service):
+    results = [result async for result in service.extract_files(files(6))]
+
+    assert len(results) == 6
+    assert service.started == [f"heft-{n}.pdf" for n in range(6)]
+
+
+async def test_seconds_are_wall_clock_time(service):
+    started = time.perf_counter()
+    async for _ in service.extract_files(files(8)):
+        pass
+    elapsed = time.perf_counter() - started
+
+    stats = service.get_stats()["pdf"]
+    # Four files run at a time, their worker times add up to more than the run took
+    assert stats["worker_seconds"] == pytest.approx(8 * 0.1)
+    assert stats["seconds"] <= elapsed + 0.001
+    assert stats["seconds"] < stats["worker_seconds"]
+    assert stats["pages_per_second"] == pytest.approx(16 / stats["seconds"], rel=0.01)
+
+
+async def test_stopping_early_cancels_files_in_flight(service):
+    results = service.extract_files(files(10))
+
+    await results.__anext__()
+    await results.aclose()
+    await asyncio.sleep(0)
+
+    assert service.started == ["heft-0.pdf", "heft-1.pdf", "heft-2.pdf", "heft-3.pdf"]
+    assert service.cancelled == ["heft-1.pdf", "heft-2.pdf", "heft-3.pdf"]
+    assert service._busy == {}
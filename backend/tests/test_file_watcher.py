@@ -0,0 +1,49 @@
+"""
+Tests for the file watcher's debounced flushes.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from app.services.file_watcher import FileWatcherService
+from app.services.ingestion import ingestion_service
+
+
+@pytest.fixture
+def watcher():
+    watcher = FileWatcherService(poll_interval_seconds=1, debounce_seconds=1)
+    watcher._changed = {Path("a.pdf"), Path("b.docx")}
+    watcher._removed = {Path("c.txt")}
+    return watcher
+
+
+async def test_flush_ingests_pending_files(watcher, monkeypatch):
+    calls = []
+
+    async def ingest(changed, removed):
+        calls.append((changed, removed))
+        return {"indexed": len(changed)}
+
+    monkeypatch.setattr(ingestion_service, "ingest_local_changes", ingest)
+
+    assert await watcher.flush() == {"indexed": 2}
+    assert calls == [([Path("a.pdf"), Path("b.docx")], [Path("c.txt")])]
+    assert watcher.get_status()["pending_changes"] == 0
+
+
+async def test_failed_flush_keeps_files_pending(watcher, monkeypatch):
+    async def ingest(changed, removed):
+        # A file removed while the run was in flight must stay removed
+        watcher._removed.add(Path("a.pdf"))
+        raise RuntimeError("Index nicht erreichbar")
+
+    monkeypatch.setattr(ingestion_service, "ingest_local_changes", ingest)
+
+    with pytest.raises(RuntimeError):
+        await watcher.flush()
+
+    assert watcher._changed == {Path("b.docx")}
+    assert watcher._removed == {Path("a.pdf"), Path("c.txt")}
+    assert watcher._last_change_at is not None
+    assert watcher.runs == 0
@@ -0,0 +1,74 @@
+"""
+Tests for the image asset pipeline: linking thumbnails to catalog games.
+"""
+
+import pytest
+
+from app.core.config import settings
+from app.services.game_search import game_search_service
+from app.services.image_assets import ImageAssetService
+from app.services.ingestion import make_document_id
+
+pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+PAGE_URL = "https://wiki.example.org/spiele/vertrauenskreis"
+
+
+@pytest.fixture
+def web_data(tmp_path, monkeypatch):
+    web_dir = tmp_path / "web_data"
+    images = web_dir / "crawl" / "images"
+    images.mkdir(parents=True)
+    Image.linear_gradient("L").convert("RGB").save(images / "kreis.png")
+    monkeypatch.setattr(settings, "WEB_DATA_DIR", web_dir)
+    return web_dir
+
+
+@pytest.fixture
+async def service(tmp_path, web_data):
+    service = ImageAssetService(cache_dir=tmp_path / "thumbnails")
+    yield service
+    await service.close()
+
+
+@pytest.fixture
+def game(monkeypatch):
+    game = {**game_search_service.mock_games[0], "sourceUrl": PAGE_URL}
+    monkeypatch.setattr(game_search_service, "mock_games", [game])
+    return game
+
+
+async def test_game_gets_thumbnails_of_its_source_page(service, game):
+    document_id = make_document_id("web", PAGE_URL)
+    await service.process_images(
+        service.discover_images(),
+        {document_id: ["/crawler/output/crawl/images/kreis.png"]}
+    )
+
+    assert service.attach_to_games() == 1
+    assert len(game["thumbnails"]) == 1
+    assert game["thumbnails"][0].endswith(".webp")
+    assert service.get_thumbnail_path(game["thumbnails"][0].rsplit("/", 1)[1]) is not None
+
+
+async def test_document_id_takes_precedence_over_source_url(service, game):
+    game["documentId"] = "local_0123456789abcdef"
+    await service.process_images(
+        service.discover_images(),
+        {"local_0123456789abcdef": ["/crawler/output/crawl/images/kreis.png"]}
+    )
+
+    assert service.attach_to_games() == 1
+    assert game["thumbnails"]
+
+
+async def test_game_without_source_gets_no_thumbnails(service, game):
+    game["sourceUrl"] = None
+    await service.process_images(
+        service.discover_images(),
+        {make_document_id("web", PAGE_URL): ["/crawler/output/crawl/images/kreis.png"]}
+    )
+
+    assert service.attach_to_games() == 0
+    assert game["thumbnails"] == []
@@ -0,0 +1,78 @@
+"""
+Tests for the beam search that picks the games of a Heimstunde.
+"""
+
+from app.services.plan_optimizer import PlanOptimizer, energy_level
+
+
+def game(game_id, minutes, tags=(), description="", rating=4.0):
+    return {
+        "gameId": game_id,
+        "name": game_id,
+        "description": description,
+        "pedagogicalValue": "",
+        "tags": list(tags),
+        "durationMinutes": minutes,
+        "rating": rating,
+        "materials": [],
+    }
+
+
+def test_time_budget_is_respected():
+    games = [game(f"g{n}", minutes) for n, minutes in enumerate([25, 20, 15, 10, 40])]
+
+    result = PlanOptimizer().select(games, available_minutes=45)
+
+    assert result["used_minutes"] <= 45
+    assert sum(g["durationMinutes"] for g in result["games"]) == result["used_minutes"]
+    # 25 + 20, 20 + 15 + 10 or similar fill the budget completely
+    assert result["used_minutes"] == 45
+
+
+def test_excluded_games_are_never_chosen():
+    games = [game("lieblingsspiel", 30, rating=5.0), game("anderes", 20), game("drittes", 10)]
+
+    result = PlanOptimizer().select(games, available_minutes=30, exclude_ids={"lieblingsspiel"})
+
+    assert "lieblingsspiel" not in [g["gameId"] for g in result["games"]]
+    assert result["used_minutes"] == 30
+
+
+def test_goal_coverage_is_reported():
+    goals = [
+        {"type": "teamwork", "description": "Zusammenarbeit stärken"},
+        {"type": "kreativität", "description": "Fantasie anregen"},
+        {"type": "orientierung", "description": "Kartenlesen üben"},
+    ]
+    games = [
+        game("brücke", 20, description="Gemeinsam eine Brücke bauen, Zusammenarbeit ist gefragt"),
+        game("geschichten", 20, description="Eine Geschichte mit viel Fantasie erfinden"),
+    ]
+
+    result = PlanOptimizer().select(games, available_minutes=40, goals=goals)
+
+    assert result["covered_goals"] == goals[:2]
+    assert result["uncovered_goals"] == [goals[2]]
+
+
+def test_active_and_calm_games_alternate():
+    games = [
+        game("fangen", 15, tags=["bewegung"]),
+        game("staffel", 15, tags=["wettkampf"]),
+        game("malen", 15, tags=["basteln"]),
+        game("zuhören", 15, tags=["ruhig"]),
+    ]
+
+    result = PlanOptimizer().select(games, available_minutes=60, max_games=4)
+
+    energies = [energy_level(g) for g in result["games"]]
+    assert energies == ["active", "calm", "active", "calm"]
+
+
+def test_no_candidates_give_an_empty_selection():
+    result = PlanOptimizer().select([], available_minutes=60, goals=[{"type": "teamwork", "description": "Team"}])
+
+    assert result["games"] == []
+    assert result["used_minutes"] == 0
+    assert result["covered_goals"] == []
+    assert result["uncovered_goals"] == [{"type": "teamwork", "description": "Team"}]
@@ -0,0 +1,108 @@
+"""
+Tests for the plan repository's keyset pagination.
+"""
+
+from datetime import date
+
+import pytest
+
+from app.services.plan_repository import PlanRepository
+
+
+def plan(n, plan_date, theme=None, created_at=None):
+    return {
+        "plan_id": f"plan-{n:02d}",
+        "date": plan_date,
+        "theme": theme,
+        "created_at": created_at or f"2026-09-01T10:{n:02d}:00",
+        "title": f"Heimstunde {n}",
+    }
+
+
+@pytest.fixture
+async def repository(tmp_path):
+    repository = PlanRepository(path=tmp_path / "plans.db")
+    yield repository
+    await repository.close()
+
+
+async def all_pages(repository, **kwargs):
+    pages = []
+    cursor = None
+    while True:
+        page = await repository.list_plans(cursor=cursor, **kwargs)
+        pages.append([p["plan_id"] for p in page["plans"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_pages_are_stable_across_equal_dates(repository):
+    # Five plans on one date: the plan ID breaks the tie
+    await repository.save_many([plan(n, "2026-10-03") for n in (4, 2, 5, 1, 3)])
+
+    pages = await all_pages(repository, limit=2)
+
+    assert pages == [["plan-01", "plan-02"], ["plan-03", "plan-04"], ["plan-05"]]
+
+
+async def test_created_order_is_newest_first(repository):
+    await repository.save_many([
+        plan(1, "2026-10-03", created_at="2026-09-01T10:00:00"),
+        plan(2, "2026-10-10", created_at="2026-09-03T10:00:00"),
+        plan(3, "2026-10-17", created_at="2026-09-02T10:00:00"),
+        plan(4, "2026-10-24", created_at="2026-09-03T10:00:00"),
+    ])
+
+    pages = await all_pages(repository, limit=3, order="created")
+
+    assert pages == [["plan-04", "plan-02", "plan-03"], ["plan-01"]]
+
+
+async def test_date_and_theme_filters_combine(repository):
+    await repository.save_many([
+        plan(1, "2026-10-03", theme="Wald"),
+        plan(2, "2026-10-10", theme="Wasser"),
+        plan(3, "2026-10-17", theme="Wald"),
+        plan(4, "2026-10-24", theme="Wald"),
+        plan(5, "2026-11-07", theme="Wald"),
+    ])
+
+    pages = await all_pages(
+        repository, limit=1, theme="Wald", date_from=date(2026, 10, 10), date_to=date(2026, 10, 31)
+    )
+
+    assert pages == [["plan-03"], ["plan-04"]]
+
+
+async def test_last_page_has_no_cursor(repository):
+    await repository.save_many([plan(n, "2026-10-03") for n in range(3)])
+
+    page = await repository.list_plans(limit=3)
+
+    assert len(page["plans"]) == 3
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.parametrize("cursor", ["kein-cursor", "bnVsbA==", "WzFd"])
+async def test_invalid_cursor_raises(repository, cursor):
+    with pytest.raises(ValueError):
+        await repository.list_plans(cursor=cursor)
+
+
+async def test_unknown_order_raises(repository):
+    with pytest.raises(ValueError):
+        await repository.list_plans(order="title")
+
+
+async def test_theme_filter_by_creation_uses_an_index(repository):
+    details = " ".join(
+        row["detail"] for row in repository._connection().execute(
+            "EXPLAIN QUERY PLAN SELECT plan_id FROM activity_plans WHERE theme = ? "
+            "ORDER BY created_at DESC, plan_id DESC LIMIT 20",
+            ("Wald",)
+        )
+    )
+
+    assert "idx_activity_plans_theme_created" in details
+    assert "TEMP B-TREE" not in details
@@ -0,0 +1,39 @@
+"""
+Tests for plan suggestions built around a shared game selection.
+"""
+
+from app.services.planning_service import PlanningService
+
+
+async def test_suggestion_notes_use_the_requests_goal_descriptions(monkeypatch):
+    service = PlanningService()
+    goals = [
+        {"type": "teamwork", "description": "Die Gruppe wächst zusammen"},
+        {"type": "natur", "description": "Bäume am Heimweg erkennen"},
+    ]
+    selection = {
+        "games": [],
+        "used_minutes": 0,
+        # As cached by suggestion_games, which only knows the goal types
+        "covered_goals": [{"type": "teamwork", "description": "teamwork"}],
+        "uncovered_goals": [{"type": "natur", "description": "natur"}],
+    }
+    games = {"selection": selection, "alternatives": []}
+    plans = []
+    create = service.create_heimstunde_plan
+
+    async def capture(**kwargs):
+        plan = await create(**kwargs)
+        plans.append(plan)
+        return plan
+
+    monkeypatch.setattr(service, "create_heimstunde_plan", capture)
+
+    await service.suggest_plan(games, duration=90, participant_count=12, pedagogical_goals=goals)
+
+    notes = plans[0]["preparation_notes"]
+    assert "Ziel 'Bäume am Heimweg erkennen' deckt kein Spiel ab – in der Reflexion aufgreifen" in notes
+    assert not any("'natur'" in note for note in notes)
+    assert plans[0]["optimization"]["covered_goals"] == [goals[0]]
+    # The cached selection is shared with other requests and stays as it was
+    assert selection["uncovered_goals"] == [{"type": "natur", "description": "natur"}]
@@ -0,0 +1,55 @@
+"""
+Tests for locating the school holiday calendar and reporting a missing one.
+"""
+
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from app.core.config import resolve_data_file, settings
+from app.services import semester_planning
+from app.services.school_calendar import SchoolCalendar
+
+CALENDAR = Path("data") / "calendar" / "schulferien_wien_noe.json"
+
+
+@pytest.fixture
+def calendar(monkeypatch):
+    calendar = SchoolCalendar()
+    monkeypatch.setattr(semester_planning, "school_calendar", calendar)
+    return calendar
+
+
+def test_relative_path_found_at_the_repository_root(monkeypatch, tmp_path):
+    # Neither the working directory nor backend/ has data/calendar
+    monkeypatch.chdir(tmp_path)
+
+    path = resolve_data_file(CALENDAR)
+
+    assert path.is_absolute() and path.exists()
+
+
+def test_missing_file_keeps_the_configured_path(tmp_path):
+    assert resolve_data_file(Path("data/calendar/fehlt.json")) == Path("data/calendar/fehlt.json")
+    assert resolve_data_file(tmp_path / "fehlt.json") == tmp_path / "fehlt.json"
+
+
+def test_calendar_loads_with_the_default_path(calendar, monkeypatch):
+    monkeypatch.setattr(settings, "SCHOOL_HOLIDAYS_FILE", CALENDAR)
+
+    assert calendar.loaded
+
+
+async def test_semester_warns_without_calendar(calendar, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SCHOOL_HOLIDAYS_FILE", tmp_path / "fehlt.json")
+
+    events = semester_planning.semester_planner.plan_semester(
+        start=date(2026, 9, 7), end=date(2026, 9, 20), participant_count=12
+    )
+    start = await events.__anext__()
+    await events.aclose()
+
+    assert start["type"] == "start"
+    assert start["calendar_loaded"] is False
+    assert "Schulferienkalender" in start["warning"]